@@ -0,0 +1,134 @@
+"""
+Strumenti da riga di comando - Campi Flegrei Monitor
+Operazioni batch sull'archivio locale condiviso con la dashboard.
+
+Uso:
+    python campi_flegrei_cli.py backfill --start 2000-01-01 --workers 4 --rate 2
+    python campi_flegrei_cli.py export --start 2024-05-01 --end 2024-06-01 --format parquet -o maggio.parquet
+    python campi_flegrei_cli.py report --start 2024-05-01 --end 2024-05-31 --periods 1 7 --format html png -o report/
+    python campi_flegrei_cli.py replay --start 2024-05-01 --end 2024-06-01 --factor 3600
+"""
+
+import argparse
+import logging
+import sys
+
+import pandas as pd
+
+import campi_flegrei_fixed as monitor
+
+logger = logging.getLogger(__name__)
+
+def parse_utc_date(value):
+    """Interpreta una data/ora ISO come istante UTC"""
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+def run_backfill(args):
+    """Scarica un intervallo storico nell'archivio, riprendendo dai blocchi già completati"""
+    end = parse_utc_date(args.end) if args.end else monitor.utc_now()
+
+    def progress(summary):
+        handled = summary['skipped'] + summary['done'] + summary['failed']
+        print(f"\r{handled}/{summary['chunks']} blocchi, {summary['events']} eventi", end='', flush=True)
+
+    summary = monitor.run_backfill(
+        parse_utc_date(args.start), end,
+        chunk_days=args.chunk_days, workers=args.workers, rate=args.rate, progress=progress
+    )
+    print()
+    print(f"{summary['done']} blocchi scaricati, {summary['skipped']} già presenti, {summary['failed']} falliti")
+    return 1 if summary['failed'] else 0
+
+def run_export(args):
+    """Esporta un intervallo dell'archivio su file, a blocchi"""
+    with open(args.output, 'wb') as sink:
+        rows = monitor.export_catalog(
+            args.format, sink,
+            parse_utc_date(args.start), parse_utc_date(args.end),
+            args.min_magnitude, args.max_depth, args.max_distance,
+            (monitor.REGIONS[args.region]['lat'], monitor.REGIONS[args.region]['lon'])
+        )
+    print(f"{rows} eventi esportati in {args.output}")
+
+def run_report(args):
+    """Genera report statici giornalieri dall'archivio locale con un pool di processi"""
+    if 'png' in args.format:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            sys.exit("Il formato PNG richiede il pacchetto 'kaleido' (pip install kaleido)")
+
+    def progress(summary):
+        handled = summary['done'] + summary['failed']
+        print(f"\r{handled}/{summary['reports']} report", end='', flush=True)
+
+    summary = monitor.run_report_batch(
+        parse_utc_date(args.start), parse_utc_date(args.end) if args.end else parse_utc_date(args.start),
+        periods=args.periods, output_dir=args.output, formats=args.format,
+        workers=args.workers, region_key=args.region, progress=progress
+    )
+    print()
+    print(f"{summary['done']} report ({summary['files']} file) in {args.output}, {summary['failed']} falliti")
+    return 1 if summary['failed'] else 0
+
+def run_replay(args):
+    """Riproduce un intervallo dell'archivio nel percorso di ingestione alla massima velocità"""
+    start = parse_utc_date(args.start)
+    end = parse_utc_date(args.end)
+    catalog = monitor.normalize_catalog(monitor.get_catalog_archive().load(start, end))
+    summary = monitor.run_replay_load(catalog, start, end, args.factor, args.tick)
+    print(f"{summary['events']} eventi in {summary['ticks']} tick ({args.factor:g}×), "
+          f"{summary['seconds']:.2f} s, {summary['events_per_second']:.0f} eventi/s")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Strumenti batch per Campi Flegrei Monitor")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    backfill = subparsers.add_parser('backfill', help="scarica il catalogo storico nell'archivio locale")
+    backfill.add_argument('--start', required=True, help="inizio intervallo (ISO, UTC)")
+    backfill.add_argument('--end', help="fine intervallo (ISO, UTC, default: adesso)")
+    backfill.add_argument('--chunk-days', type=int, default=monitor.BACKFILL_CHUNK_DAYS)
+    backfill.add_argument('--workers', type=int, default=monitor.BACKFILL_WORKERS)
+    backfill.add_argument('--rate', type=float, default=monitor.BACKFILL_RATE, help="richieste al secondo verso INGV")
+    backfill.set_defaults(func=run_backfill)
+
+    export = subparsers.add_parser('export', help="esporta l'archivio locale in CSV, Parquet, Arrow o QuakeML")
+    export.add_argument('--start', required=True, help="inizio intervallo (ISO, UTC)")
+    export.add_argument('--end', required=True, help="fine intervallo (ISO, UTC)")
+    export.add_argument('--format', choices=['csv.gz', 'parquet', 'arrow', 'xml'], default='csv.gz')
+    export.add_argument('--min-magnitude', type=float)
+    export.add_argument('--max-depth', type=float)
+    export.add_argument('--max-distance', type=float)
+    export.add_argument('--region', choices=list(monitor.REGIONS), default=monitor.DEFAULT_REGION,
+                        help="regione da cui misurare la distanza")
+    export.add_argument('-o', '--output', required=True, help="file di destinazione")
+    export.set_defaults(func=run_export)
+
+    report = subparsers.add_parser('report', help="genera report HTML/PNG giornalieri (mappa, grafici, allerta) dall'archivio")
+    report.add_argument('--start', required=True, help="primo giorno (ISO, UTC)")
+    report.add_argument('--end', help="ultimo giorno incluso (ISO, UTC, default: solo il primo)")
+    report.add_argument('--periods', type=int, nargs='+', default=monitor.REPORT_PERIODS,
+                        help="periodi in giorni che terminano con ogni giorno")
+    report.add_argument('--format', nargs='+', choices=monitor.REPORT_FORMATS, default=['html'])
+    report.add_argument('--workers', type=int, default=monitor.REPORT_WORKERS, help="processi di rendering")
+    report.add_argument('--region', choices=list(monitor.REGIONS), default=monitor.DEFAULT_REGION)
+    report.add_argument('-o', '--output', default='report', help="cartella di destinazione")
+    report.set_defaults(func=run_report)
+
+    replay = subparsers.add_parser('replay', help="riproduce l'archivio nel percorso di ingestione e ne misura il throughput")
+    replay.add_argument('--start', required=True, help="inizio intervallo (ISO, UTC)")
+    replay.add_argument('--end', required=True, help="fine intervallo (ISO, UTC)")
+    replay.add_argument('--factor', type=float, default=3600, help="fattore di accelerazione del tempo")
+    replay.add_argument('--tick', type=float, default=1.0, help="secondi reali per tick")
+    replay.set_defaults(func=run_replay)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
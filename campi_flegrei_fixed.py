@@ -6,17 +6,33 @@ Versione: 3.1 Fixed Themes
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
 import requests
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+import plotly.io as pio
+from plotly.subplots import make_subplots
+from plotly.offline import get_plotlyjs
 import time
 import numpy as np
 from collections import deque
 import math
 import logging
 import hashlib
+import gzip
+import json
+import os
+import re
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import threading
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # Configurazione logging
 logging.basicConfig(level=logging.INFO)
@@ -35,15 +51,447 @@ CAMPI_FLEGREI_LAT = 40.827
 CAMPI_FLEGREI_LON = 14.139
 RADIUS_KM = 15
 
+# Aree monitorate: centro, riquadro di query (gradi), raggio e soglie di allerta
+REGIONS = {
+    'campi_flegrei': {
+        'name': "Campi Flegrei", 'emoji': "🌋",
+        'lat': CAMPI_FLEGREI_LAT, 'lon': CAMPI_FLEGREI_LON, 'box_deg': 0.3, 'radius_km': RADIUS_KM,
+        'alert': {'high_score': 120, 'medium_score': 60, 'high_magnitude': 4.0, 'medium_magnitude': 3.0},
+        'landmarks': [("Pozzuoli", 40.8236, 14.1219)]
+    },
+    'vesuvio': {
+        'name': "Vesuvio", 'emoji': "🗻",
+        'lat': 40.821, 'lon': 14.426, 'box_deg': 0.15, 'radius_km': 10,
+        'alert': {'high_score': 90, 'medium_score': 45, 'high_magnitude': 3.5, 'medium_magnitude': 2.5},
+        'landmarks': [("Ercolano", 40.806, 14.348), ("Torre del Greco", 40.786, 14.369)]
+    },
+    'ischia': {
+        'name': "Ischia", 'emoji': "🏝️",
+        'lat': 40.730, 'lon': 13.900, 'box_deg': 0.12, 'radius_km': 10,
+        'alert': {'high_score': 90, 'medium_score': 45, 'high_magnitude': 3.5, 'medium_magnitude': 2.5},
+        'landmarks': [("Casamicciola", 40.746, 13.908)]
+    }
+}
+DEFAULT_REGION = 'campi_flegrei'
+INGV_EVENT_URL = os.environ.get('CF_FDSN_URL', 'http://webservices.ingv.it/fdsnws/event/1/query')
+
+# Timeout I/O (secondi): le richieste della pagina partono insieme e condividono il budget
+API_PROBE_TIMEOUT = 5
+API_STATUS_MAX_AGE = 60
+CATALOG_FETCH_TIMEOUT = 15
+PAGE_IO_TIMEOUT = 15
+PAGE_IO_WORKERS = 8
+
+# Archivio locale e replay
+ARCHIVE_DB_PATH = os.environ.get('CF_ARCHIVE_DB', 'campi_flegrei_archive.db')
+CATALOG_COLUMNS = ['time', 'magnitude', 'depth', 'latitude', 'longitude', 'place', 'event_id']
+EVENT_HISTORY_MAX_REVISIONS = 10
+COMPACT_DTYPES = {
+    'magnitude': 'float32',
+    'depth': 'float32',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'distance_km': 'float32',
+    'place': 'category',
+    'event_id': 'string[pyarrow]',
+    'moment': 'float32',
+    'energy': 'float32',
+    'cum_moment': 'float64',
+    'cum_benioff': 'float64'
+}
+REPLAY_FACTORS = [1, 10, 60, 600, 3600, 21600, 86400]
+
+# Scheduler di refresh: cadenze (secondi) per livello di attività
+REFRESH_PROFILES = {
+    'swarm': {'label': "🔴 Sciame", 'seismo': 0.5, 'page': 30},
+    'active': {'label': "🟡 Attività", 'seismo': 1.0, 'page': 60},
+    'quiet': {'label': "🟢 Quiete", 'seismo': 2.0, 'page': 300},
+    'idle': {'label': "💤 Inattivo", 'seismo': 15.0, 'page': 900},
+}
+SWARM_EVENTS_PER_HOUR = 5
+ACTIVE_EVENTS_PER_DAY = 10
+IDLE_AFTER_SECONDS = 600
+
+# Sismografo: campionamento regolare e trigger STA/LTA ricorsivo
+SEISMO_SAMPLE_RATE = 20
+SEISMO_WINDOW_SECONDS = 40
+SEISMO_FILTER_BLOCK = 32
+SEISMO_BLOCK_SECONDS = 0.5
+SEISMO_EVENT_RATE = 1 / 180
+SEISMO_EVENT_DECAY = 2.5
+STA_LTA_DEFAULTS = {'sta': 1.0, 'lta': 20.0, 'on': 3.5, 'off': 1.5}
+# Trigger condiviso da tutte le sessioni: configurato dal server (es. CF_STA_LTA_ON=4.0), modificabile solo con CF_STA_LTA_ADMIN=1
+STA_LTA_SETTINGS = {key: float(os.environ.get(f'CF_STA_LTA_{key.upper()}', value)) for key, value in STA_LTA_DEFAULTS.items()}
+STA_LTA_ADMIN = os.environ.get('CF_STA_LTA_ADMIN', '') == '1'
+STA_LTA_MAX_TRIGGERS = 50
+
+# Spettrogramma: STFT incrementale sui campioni del sismografo
+SPECTROGRAM_FRAME = 64
+SPECTROGRAM_HOP = 16
+SPECTROGRAM_HISTORY_SECONDS = 120
+
+# Backfill storico
+BACKFILL_MIN_DATE = pd.Timestamp('1980-01-01', tz='UTC')
+BACKFILL_CHUNK_DAYS = 30
+BACKFILL_QUERY_LIMIT = 10000
+BACKFILL_WORKERS = 4
+BACKFILL_RATE = 2.0
+CATALOG_QUERY_LIMIT = 10000
+
+# Cache warming delle viste standard (periodi in giorni)
+WARM_PERIODS = [1, 3, 7, 30]
+WARM_INTERVAL_SECONDS = 240
+
+# Ultimo catalogo valido su disco, servito mentre si aggiorna in background
+SNAPSHOT_DIR = os.environ.get('CF_SNAPSHOT_DIR', 'campi_flegrei_snapshots')
+SNAPSHOT_MAX_AGE_SECONDS = WARM_INTERVAL_SECONDS
+SNAPSHOT_STALE_WARNING_SECONDS = 3 * WARM_INTERVAL_SECONDS
+# Istante del download (ns UTC) salvato nei metadati Parquet della copia
+SNAPSHOT_FETCHED_AT_KEY = b'cf_fetched_at_ns'
+
+# Costruzione parallela delle figure dei pannelli
+FIGURE_WORKERS = 4
+FIGURE_BUDGET_SECONDS = 5.0
+
+# Fogli di stile e blocchi fissi della pagina serviti da Streamlit come file statici (server.enableStaticServing)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_BLOCK_HEIGHTS = {'page_header': 190, 'page_footer': 320}
+
+# Vista 3D degli ipocentri
+HYPOCENTER_MAX_POINTS = 5000
+HYPOCENTER_VOXEL_KM = 0.1
+
+# Declustering
+DECLUSTER_METHODS = {
+    "Nessuno": None,
+    "Gardner–Knopoff": 'gardner_knopoff',
+    "Reasenberg": 'reasenberg'
+}
+CLUSTER_ROLES = {
+    'mainshock': ("Principale", '#ff6b6b'),
+    'foreshock': ("Precursore", '#feca57'),
+    'aftershock': ("Replica", '#48dbfb'),
+    'swarm': ("Sciame", '#ff9ff3'),
+    'isolated': ("Isolato", '#a4b0be')
+}
+CLUSTER_COLOR_MAP = {label: color for label, color in CLUSTER_ROLES.values()}
+CLUSTER_FILTERS = {
+    "Tutti gli eventi": None,
+    "Catalogo declusterizzato": 'independent',
+    "Solo sequenze": ('mainshock', 'foreshock', 'aftershock'),
+    "Solo sciami": ('swarm',)
+}
+SWARM_MIN_EVENTS = 5
+SWARM_MAGNITUDE_GAP = 0.5
+REASENBERG_RFACT = 10
+REASENBERG_XMEFF = 1.5
+REASENBERG_TAU_MIN_DAYS = 1.0
+REASENBERG_TAU_MAX_DAYS = 10.0
+LOCATION_ERROR_KM = 0.5
+DECLUSTER_PAIR_BLOCK = 2_000_000
+
+# Previsione ETAS (Ogata 1988, solo tempo) con nucleo di Omori troncato
+ETAS_MIN_MAGNITUDE = 1.0
+ETAS_FIT_DAYS = 365
+ETAS_KERNEL_DAYS = 10.0
+ETAS_MAX_PAIRS = 2_000_000
+# Distanza minima (in larghezze di cella) fra un figlio e le celle aggregate del campo lontano
+ETAS_NEAR_CELLS = 4
+ETAS_MIN_EVENTS = 50
+ETAS_MAX_ITERATIONS = 100
+ETAS_HORIZON_HOURS = 24
+ETAS_FORECAST_MAGNITUDES = [2.0, 3.0, 4.0]
+# Limiti dei parametri trasformati: log μ, log K, α, log c, log(p - 1)
+ETAS_BOUNDS = np.array([[-12.0, 8.0], [-15.0, 5.0], [0.0, 5.0], [-12.0, 1.0], [-7.0, 1.0]])
+
+# Rilevamento online degli aumenti di tasso (CUSUM sui tempi di interarrivo)
+CHANGEPOINT_MIN_MAGNITUDE = ETAS_MIN_MAGNITUDE
+CHANGEPOINT_RATE_RATIO = 2.0
+CHANGEPOINT_THRESHOLD = 8.0
+CHANGEPOINT_EXCURSION_EVENTS = 1000
+CHANGEPOINT_WARMUP_EVENTS = 30
+CHANGEPOINT_BASELINE_EVENTS = 500
+CHANGEPOINT_HISTORY_DAYS = 30
+# Finestra di riordino: gli eventi in ritardo entro questo margine si inseriscono senza ricostruire i rilevatori
+CHANGEPOINT_REORDER_SECONDS = 3600
+CHANGEPOINT_MAX_EPISODES = 50
+
+# Export
+EXPORT_CHUNK_SIZE = 10000
+EXPORT_FORMATS = {
+    "CSV compresso (.csv.gz)": ('csv.gz', 'application/gzip'),
+    "Parquet (.parquet)": ('parquet', 'application/vnd.apache.parquet'),
+    "Arrow IPC (.arrow)": ('arrow', 'application/vnd.apache.arrow.file'),
+    "QuakeML (.xml)": ('xml', 'application/xml')
+}
+EXPORT_COLUMNS = ['time', 'magnitude', 'depth', 'latitude', 'longitude', 'distance_km', 'place', 'event_id']
+# I file esportati sono serviti in streaming da app/static/exports e rimossi dopo un'ora
+EXPORT_DIR = os.path.join(STATIC_DIR, 'exports')
+EXPORT_MAX_AGE_SECONDS = 3600
+EXPORT_STATIC_MAX_BYTES = 200 * 1024 * 1024
+
+# Report batch (HTML/PNG) generati dall'archivio senza la dashboard
+REPORT_PERIODS = [1, 7]
+REPORT_WORKERS = 4
+REPORT_FIGURES = ['map', 'histogram', 'scatter', 'timeline', 'release']
+REPORT_FORMATS = ['html', 'png']
+
+# Tabella paginata
+TABLE_PAGE_SIZES = [25, 50, 100, 250]
+TABLE_SORT_OPTIONS = {
+    "🕐 Data/Ora": 'time',
+    "📊 Magnitudine": 'magnitude',
+    "📏 Profondità": 'depth',
+    "📍 Distanza": 'distance_km'
+}
+TABLE_SORT_SQL = {
+    'time': 'time_ns',
+    'magnitude': 'magnitude',
+    'depth': 'depth',
+    'distance_km': 'distance_km'
+}
+
+# Metriche di performance
+METRICS_PORT = int(os.environ.get('CF_METRICS_PORT', '0') or 0)
+METRICS_PREFIX = "campi_flegrei"
+METRICS_WINDOW = 512
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+# Formato delle date nelle query FDSN (sempre UTC)
+FDSN_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+class SystemClock:
+    """Orologio di sistema: istante corrente UTC in nanosecondi int64"""
+
+    def now_ns(self):
+        return time.time_ns()
+
+class FixedClock:
+    """Orologio fermo, spostabile a mano: rende riproducibili test e simulazioni"""
+
+    def __init__(self, now):
+        self.value = to_utc_ns(now)
+
+    def now_ns(self):
+        return self.value
+
+    def advance(self, seconds):
+        self.value += int(round(seconds * 1e9))
+        return self.value
+
+# Orologio condiviso da fetch, archivio, filtri, allerte e replay
+_clock = SystemClock()
+
+def get_clock():
+    return _clock
+
+def set_clock(clock):
+    """Sostituisce l'orologio dell'app e restituisce il precedente"""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+def utc_now_ns():
+    """Istante corrente dell'orologio dell'app, in ns UTC"""
+    return _clock.now_ns()
+
+def utc_now():
+    """Istante corrente dell'orologio dell'app come Timestamp UTC"""
+    return pd.Timestamp(utc_now_ns(), tz='UTC')
+
+def to_utc_ns(value):
+    """Converte un istante in ns UTC; gli istanti senza fuso sono considerati già in UTC"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC')
+    return int(timestamp.as_unit('ns').value)
+
+def fdsn_time(value):
+    """Formatta un istante per i parametri starttime/endtime del servizio FDSN"""
+    return pd.Timestamp(to_utc_ns(value), tz='UTC').strftime(FDSN_TIME_FORMAT)
+
+class RuntimeMetrics:
+    """Registro process-wide di timer per fase e contatori"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.recent = {}
+        self.buckets = {}
+        self.totals = {}
+        self.counts = {}
+        self.last = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, stage, seconds):
+        """Registra la durata di una fase"""
+        with self.lock:
+            if stage not in self.recent:
+                self.recent[stage] = deque(maxlen=METRICS_WINDOW)
+                self.buckets[stage] = [0] * len(METRICS_BUCKETS)
+                self.totals[stage] = 0.0
+                self.counts[stage] = 0
+            self.recent[stage].append(seconds)
+            for i, bound in enumerate(METRICS_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[stage][i] += 1
+            self.totals[stage] += seconds
+            self.counts[stage] += 1
+            self.last[stage] = seconds
+
+    def increment(self, name, value=1):
+        """Incrementa un contatore"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Imposta il valore corrente di un indicatore"""
+        with self.lock:
+            self.gauges[name] = value
+
+    def stage_summary(self):
+        """Restituisce ultimo valore, p50 e p99 per ogni fase"""
+        with self.lock:
+            recent = {stage: np.array(values) for stage, values in self.recent.items()}
+            last = dict(self.last)
+            counts = dict(self.counts)
+        return {
+            stage: {
+                'last': last[stage],
+                'p50': float(np.percentile(values, 50)),
+                'p99': float(np.percentile(values, 99)),
+                'count': counts[stage]
+            }
+            for stage, values in recent.items()
+        }
+
+    def render_prometheus(self):
+        """Esporta le metriche nel formato testuale di Prometheus"""
+        with self.lock:
+            buckets = {stage: list(values) for stage, values in self.buckets.items()}
+            totals = dict(self.totals)
+            counts = dict(self.counts)
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+
+        lines = [
+            f"# HELP {METRICS_PREFIX}_stage_duration_seconds Durata delle fasi del rerun",
+            f"# TYPE {METRICS_PREFIX}_stage_duration_seconds histogram"
+        ]
+        for stage in sorted(buckets):
+            for bound, count in zip(METRICS_BUCKETS, buckets[stage]):
+                lines.append(f'{METRICS_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{METRICS_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {counts[stage]}')
+            lines.append(f'{METRICS_PREFIX}_stage_duration_seconds_sum{{stage="{stage}"}} {totals[stage]:.6f}')
+            lines.append(f'{METRICS_PREFIX}_stage_duration_seconds_count{{stage="{stage}"}} {counts[stage]}')
+
+        for name in sorted(counters):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} counter")
+            lines.append(f"{METRICS_PREFIX}_{name} {counters[name]}")
+
+        for name in sorted(gauges):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} gauge")
+            lines.append(f"{METRICS_PREFIX}_{name} {gauges[name]}")
+
+        return "\n".join(lines) + "\n"
+
+@st.cache_resource(show_spinner=False)
+def get_runtime_metrics():
+    """Restituisce il registro metriche condiviso dal processo"""
+    return RuntimeMetrics()
+
+@contextmanager
+def stage_timer(stage):
+    """Misura la durata di una fase e la registra nelle metriche"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_runtime_metrics().observe(stage, time.perf_counter() - start)
+
+def count_metric(name, value=1):
+    """Incrementa un contatore delle metriche"""
+    get_runtime_metrics().increment(name, value)
+
+def set_gauge_metric(name, value):
+    """Imposta un indicatore delle metriche"""
+    get_runtime_metrics().set_gauge(name, value)
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_exporter(port):
+    """Avvia un endpoint HTTP /metrics per Prometheus (una volta per processo)"""
+    metrics = get_runtime_metrics()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    except OSError as e:
+        logger.error(f"Metrics exporter not started on port {port}: {e}")
+        return None
+
+    thread = threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True)
+    thread.start()
+    logger.info(f"Prometheus metrics exported on port {port}")
+    return server
+
+def render_debug_panel():
+    """Mostra nella sidebar i tempi per fase e i contatori"""
+    metrics = get_runtime_metrics()
+    summary = metrics.stage_summary()
+
+    with st.sidebar.expander("🐞 Debug Prestazioni", expanded=True):
+        if summary:
+            stage_df = pd.DataFrame([
+                {
+                    'fase': stage,
+                    'ultimo (ms)': values['last'] * 1000,
+                    'p50 (ms)': values['p50'] * 1000,
+                    'p99 (ms)': values['p99'] * 1000,
+                    'n': values['count']
+                }
+                for stage, values in sorted(summary.items())
+            ])
+            st.dataframe(stage_df.round(1), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Nessuna misura ancora disponibile")
+
+        with metrics.lock:
+            values = {**metrics.counters, **metrics.gauges}
+        for name, value in sorted(values.items()):
+            st.caption(f"**{name}:** {value:,}")
+
+        st.download_button(
+            label="📥 Metriche Prometheus",
+            data=metrics.render_prometheus(),
+            file_name="campi_flegrei_metrics.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+
 def initialize_session_state():
     """Inizializza lo stato della sessione"""
     if 'dark_mode' not in st.session_state:
         st.session_state.dark_mode = True  # Default dark mode
     
-    if 'seismo_data' not in st.session_state:
-        st.session_state.seismo_data = deque(maxlen=200)
-        st.session_state.seismo_time = deque(maxlen=200)
-        st.session_state.last_seismo_update = time.time()
+    # Il flusso del sismografo è condiviso: la sessione tiene solo il cursore di lettura
+    if 'seismo_cursor' not in st.session_state:
+        st.session_state.seismo_cursor = 0
         st.session_state.seismo_running = False
     
     if 'current_period' not in st.session_state:
@@ -51,369 +499,47 @@ def initialize_session_state():
     
     if 'last_period_change' not in st.session_state:
         st.session_state.last_period_change = time.time()
+    
+    if 'last_interaction' not in st.session_state:
+        st.session_state.last_interaction = time.time()
+
+@st.cache_data(show_spinner=False)
+def load_static_block(name):
+    """Markup di un blocco statico della pagina (il contenuto di <main>), per quando i file non sono serviti"""
+    with open(os.path.join(STATIC_DIR, f"{name}.html"), encoding='utf-8') as f:
+        page = f.read()
+    return page.split('<main>', 1)[1].split('</main>', 1)[0]
+
+def render_static_block(name):
+    """Intestazione e piè di pagina: con il serving statico il browser li tiene in cache, a ogni rerun viaggia solo l'iframe"""
+    if st.get_option("server.enableStaticServing"):
+        mode = 'dark' if st.session_state.dark_mode else 'light'
+        # URL assoluto: st.iframe tratta le stringhe senza '/' iniziale come HTML da incorporare
+        base = st.get_option("server.baseUrlPath").strip('/')
+        src = f"/{base + '/' if base else ''}app/static/{name}.html?theme={mode}"
+        if hasattr(st, 'iframe'):
+            st.iframe(src, height=STATIC_BLOCK_HEIGHTS[name])
+        else:
+            # Versioni di Streamlit senza st.iframe
+            components.iframe(src, height=STATIC_BLOCK_HEIGHTS[name])
+    else:
+        st.markdown(load_static_block(name), unsafe_allow_html=True)
+
+@st.cache_data(show_spinner=False)
+def load_theme_css(mode):
+    """Legge una volta il foglio di stile del tema dalla cartella static"""
+    with open(os.path.join(STATIC_DIR, f"theme_{mode}.css"), encoding='utf-8') as f:
+        return f.read()
 
 def apply_dynamic_theme():
     """Applica il tema dinamicamente in base alla modalità"""
+    mode = 'dark' if st.session_state.dark_mode else 'light'
     
-    if st.session_state.dark_mode:
-        # DARK MODE - Colori chiari su sfondo scuro
-        st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-        
-        /* DARK MODE THEME */
-        .main {
-            background-color: #0e1117 !important;
-            color: #ffffff !important;
-        }
-        
-        .stApp {
-            background-color: #0e1117 !important;
-        }
-        
-        /* Header Dark */
-        .modern-header {
-            background: linear-gradient(90deg, #ff6b6b, #feca57);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-            font-size: clamp(2.5rem, 5vw, 4rem);
-            font-weight: 700;
-            text-align: center;
-            margin-bottom: 1rem;
-            font-family: 'Inter', sans-serif;
-        }
-        
-        /* Author Badge Dark */
-        .author-badge {
-            background: rgba(255, 255, 255, 0.1);
-            backdrop-filter: blur(20px);
-            border: 1px solid rgba(255, 255, 255, 0.2);
-            color: #ffffff;
-            padding: 0.75rem 1.5rem;
-            border-radius: 50px;
-            margin: 0 auto 2rem auto;
-            width: fit-content;
-            font-weight: 600;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-        }
-        
-        /* Metric Cards Dark */
-        .metric-card {
-            background: rgba(30, 30, 40, 0.8);
-            backdrop-filter: blur(20px);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            padding: 2rem;
-            border-radius: 20px;
-            color: #ffffff;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.4);
-            margin: 0.5rem 0;
-            transition: all 0.3s ease;
-        }
-        
-        .metric-card::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            height: 3px;
-            background: linear-gradient(90deg, #ff6b6b, #feca57);
-        }
-        
-        .metric-card h3 {
-            color: #b0b0b0;
-            font-size: 0.9rem;
-            font-weight: 500;
-            margin-bottom: 0.5rem;
-        }
-        
-        .metric-card h1 {
-            color: #ffffff;
-            font-size: 2.5rem;
-            font-weight: 700;
-            margin: 0;
-        }
-        
-        .metric-card small {
-            color: #888888;
-            font-size: 0.75rem;
-        }
-        
-        /* Seismograph Dark */
-        .seismo-container {
-            background: rgba(10, 15, 25, 0.9);
-            backdrop-filter: blur(20px);
-            border: 2px solid #00ff88;
-            border-radius: 20px;
-            padding: 2rem;
-            margin: 2rem 0;
-            box-shadow: 0 8px 32px rgba(0, 255, 136, 0.2);
-        }
-        
-        .seismo-container h3 {
-            color: #00ff88;
-        }
-        
-        /* Status Indicators Dark */
-        .status-indicator {
-            background: rgba(40, 40, 50, 0.8);
-            backdrop-filter: blur(10px);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            color: #ffffff;
-            padding: 0.5rem 1rem;
-            border-radius: 25px;
-            font-weight: 500;
-            display: inline-block;
-            margin: 0.25rem;
-        }
-        
-        /* Alerts Dark */
-        .alert-high {
-            background: linear-gradient(135deg, #dc3545, #c82333);
-            color: #ffffff;
-            border-radius: 15px;
-            padding: 2rem;
-            margin: 1rem 0;
-            box-shadow: 0 8px 32px rgba(220, 53, 69, 0.3);
-        }
-        
-        .alert-medium {
-            background: linear-gradient(135deg, #fd7e14, #e55100);
-            color: #ffffff;
-            border-radius: 15px;
-            padding: 2rem;
-            margin: 1rem 0;
-            box-shadow: 0 8px 32px rgba(253, 126, 20, 0.3);
-        }
-        
-        .alert-low {
-            background: linear-gradient(135deg, #28a745, #1e7e34);
-            color: #ffffff;
-            border-radius: 15px;
-            padding: 2rem;
-            margin: 1rem 0;
-            box-shadow: 0 8px 32px rgba(40, 167, 69, 0.3);
-        }
-        
-        /* Period Indicator Dark */
-        .period-indicator {
-            background: linear-gradient(135deg, #ff6b6b, #feca57);
-            color: #ffffff;
-            padding: 0.75rem 1.5rem;
-            border-radius: 25px;
-            font-weight: 600;
-            text-align: center;
-            box-shadow: 0 4px 15px rgba(255, 107, 107, 0.3);
-        }
-        
-        /* Footer Dark */
-        .footer-author {
-            background: linear-gradient(135deg, #495057, #6c757d);
-            color: #ffffff;
-            padding: 2rem;
-            border-radius: 20px;
-            text-align: center;
-            margin: 3rem 0;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-        }
-        
-        /* Sidebar Dark */
-        .css-1d391kg {
-            background: #1a1d23 !important;
-        }
-        
-        /* Text colors Dark */
-        .stMarkdown, .stText, p, div {
-            color: #ffffff !important;
-        }
-        
-        h1, h2, h3, h4, h5, h6 {
-            color: #ffffff !important;
-        }
-        
-        </style>
-        """, unsafe_allow_html=True)
-    
+    # Con il serving statico il browser scarica e mette in cache il CSS: a ogni rerun viaggia solo l'@import
+    if st.get_option("server.enableStaticServing"):
+        st.markdown(f"<style>@import url('app/static/theme_{mode}.css');</style>", unsafe_allow_html=True)
     else:
-        # LIGHT MODE - Colori scuri su sfondo chiaro
-        st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-        
-        /* LIGHT MODE THEME */
-        .main {
-            background-color: #ffffff !important;
-            color: #2c3e50 !important;
-        }
-        
-        .stApp {
-            background-color: #f8f9fa !important;
-        }
-        
-        /* Header Light */
-        .modern-header {
-            background: linear-gradient(90deg, #667eea, #764ba2);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-            font-size: clamp(2.5rem, 5vw, 4rem);
-            font-weight: 700;
-            text-align: center;
-            margin-bottom: 1rem;
-            font-family: 'Inter', sans-serif;
-        }
-        
-        /* Author Badge Light */
-        .author-badge {
-            background: rgba(102, 126, 234, 0.1);
-            backdrop-filter: blur(20px);
-            border: 1px solid rgba(102, 126, 234, 0.3);
-            color: #2c3e50;
-            padding: 0.75rem 1.5rem;
-            border-radius: 50px;
-            margin: 0 auto 2rem auto;
-            width: fit-content;
-            font-weight: 600;
-            box-shadow: 0 8px 32px rgba(102, 126, 234, 0.2);
-        }
-        
-        /* Metric Cards Light */
-        .metric-card {
-            background: #ffffff;
-            border: 1px solid rgba(102, 126, 234, 0.2);
-            padding: 2rem;
-            border-radius: 20px;
-            color: #2c3e50;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-            margin: 0.5rem 0;
-            transition: all 0.3s ease;
-        }
-        
-        .metric-card::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            height: 3px;
-            background: linear-gradient(90deg, #667eea, #764ba2);
-        }
-        
-        .metric-card h3 {
-            color: #6c757d;
-            font-size: 0.9rem;
-            font-weight: 500;
-            margin-bottom: 0.5rem;
-        }
-        
-        .metric-card h1 {
-            color: #2c3e50;
-            font-size: 2.5rem;
-            font-weight: 700;
-            margin: 0;
-        }
-        
-        .metric-card small {
-            color: #6c757d;
-            font-size: 0.75rem;
-        }
-        
-        /* Seismograph Light */
-        .seismo-container {
-            background: rgba(248, 249, 250, 0.9);
-            backdrop-filter: blur(20px);
-            border: 2px solid #667eea;
-            border-radius: 20px;
-            padding: 2rem;
-            margin: 2rem 0;
-            box-shadow: 0 8px 32px rgba(102, 126, 234, 0.2);
-        }
-        
-        .seismo-container h3 {
-            color: #667eea;
-        }
-        
-        /* Status Indicators Light */
-        .status-indicator {
-            background: rgba(248, 249, 250, 0.9);
-            backdrop-filter: blur(10px);
-            border: 1px solid rgba(0, 0, 0, 0.1);
-            color: #2c3e50;
-            padding: 0.5rem 1rem;
-            border-radius: 25px;
-            font-weight: 500;
-            display: inline-block;
-            margin: 0.25rem;
-        }
-        
-        /* Alerts Light */
-        .alert-high {
-            background: linear-gradient(135deg, #ff416c, #ff4b2b);
-            color: #ffffff;
-            border-radius: 15px;
-            padding: 2rem;
-            margin: 1rem 0;
-            box-shadow: 0 8px 32px rgba(255, 65, 108, 0.3);
-        }
-        
-        .alert-medium {
-            background: linear-gradient(135deg, #f7971e, #ffd200);
-            color: #ffffff;
-            border-radius: 15px;
-            padding: 2rem;
-            margin: 1rem 0;
-            box-shadow: 0 8px 32px rgba(247, 151, 30, 0.3);
-        }
-        
-        .alert-low {
-            background: linear-gradient(135deg, #56ab2f, #a8e6cf);
-            color: #ffffff;
-            border-radius: 15px;
-            padding: 2rem;
-            margin: 1rem 0;
-            box-shadow: 0 8px 32px rgba(86, 171, 47, 0.3);
-        }
-        
-        /* Period Indicator Light */
-        .period-indicator {
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: #ffffff;
-            padding: 0.75rem 1.5rem;
-            border-radius: 25px;
-            font-weight: 600;
-            text-align: center;
-            box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
-        }
-        
-        /* Footer Light */
-        .footer-author {
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: #ffffff;
-            padding: 2rem;
-            border-radius: 20px;
-            text-align: center;
-            margin: 3rem 0;
-            box-shadow: 0 8px 32px rgba(102, 126, 234, 0.3);
-        }
-        
-        /* Sidebar Light */
-        .css-1d391kg {
-            background: #ffffff !important;
-            border-right: 1px solid rgba(0, 0, 0, 0.1) !important;
-        }
-        
-        /* Text colors Light */
-        .stMarkdown, .stText, p, div {
-            color: #2c3e50 !important;
-        }
-        
-        h1, h2, h3, h4, h5, h6 {
-            color: #2c3e50 !important;
-        }
-        
-        </style>
-        """, unsafe_allow_html=True)
+        st.markdown(f"<style>\n{load_theme_css(mode)}</style>", unsafe_allow_html=True)
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calcola distanza tra due punti geografici usando Haversine"""
@@ -428,10 +554,57 @@ def calculate_distance(lat1, lon1, lat2, lon2):
         logger.error(f"Errore nel calcolo distanza: {e}")
         return 0.0
 
-def test_api_connection():
+def calculate_distances(latitudes, longitudes, lat0=CAMPI_FLEGREI_LAT, lon0=CAMPI_FLEGREI_LON):
+    """Versione vettoriale di calculate_distance su array di coordinate (anche lat0/lon0 possono essere array)"""
+    lat1 = np.radians(np.asarray(lat0, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon0, dtype=np.float64))
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * np.arcsin(np.sqrt(a)) * 6371
+
+def region_query_box(region):
+    """Riquadro (min_lat, max_lat, min_lon, max_lon) di una regione"""
+    return (
+        region['lat'] - region['box_deg'], region['lat'] + region['box_deg'],
+        region['lon'] - region['box_deg'], region['lon'] + region['box_deg']
+    )
+
+def merge_query_boxes(boxes):
+    """Unisce i riquadri che si sovrappongono, così ogni zona è richiesta una sola volta"""
+    merged = [tuple(box) for box in boxes]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if a[0] <= b[1] and b[0] <= a[1] and a[2] <= b[3] and b[2] <= a[3]:
+                    merged[i] = (min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3]))
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return sorted(merged)
+
+def get_ingestion_boxes():
+    """Riquadri di query condivisi da tutte le regioni configurate"""
+    return merge_query_boxes(region_query_box(region) for region in REGIONS.values())
+
+def box_params(box):
+    """Parametri FDSN per un riquadro"""
+    return {
+        'minlatitude': round(box[0], 4),
+        'maxlatitude': round(box[1], 4),
+        'minlongitude': round(box[2], 4),
+        'maxlongitude': round(box[3], 4)
+    }
+
+def test_api_connection(timeout=API_PROBE_TIMEOUT):
     """Testa la connessione all'API INGV"""
     try:
-        url = "http://webservices.ingv.it/fdsnws/event/1/query"
+        url = INGV_EVENT_URL
         params = {
             'format': 'geojson',
             'limit': 1,
@@ -440,127 +613,2377 @@ def test_api_connection():
             'minlongitude': CAMPI_FLEGREI_LON - 0.1,
             'maxlongitude': CAMPI_FLEGREI_LON + 0.1,
         }
-        response = requests.get(url, params=params, timeout=5)
+        with stage_timer("api_probe"):
+            response = requests.get(url, params=params, timeout=timeout)
+        count_metric("http_requests_total")
+        count_metric("http_response_bytes_total", len(response.content))
         return response.status_code == 200
     except:
+        count_metric("http_errors_total")
         return False
 
-def create_cache_key(days_back, timestamp_hour):
-    """Crea una chiave di cache unica basata sul periodo e sull'ora corrente"""
-    cache_string = f"earthquake_data_{days_back}_{timestamp_hour}"
-    return hashlib.md5(cache_string.encode()).hexdigest()
+# Stato per thread usato per distinguere cache hit e miss
+_fetch_state = threading.local()
+
+def fetch_earthquake_data(days_back, box):
+    """Recupera dati terremoti dall'API INGV; gli errori vengono propagati, mai scambiati per zero eventi"""
+    try:
+        end_ns = utc_now_ns()
+        start_date = fdsn_time(end_ns - int(days_back * 86400 * 1e9))
+        end_date = fdsn_time(end_ns)
+        
+        url = INGV_EVENT_URL
+        params = {
+            'format': 'geojson',
+            'starttime': start_date,
+            'endtime': end_date,
+            **box_params(box),
+            'minmagnitude': 0.0,
+            'limit': CATALOG_QUERY_LIMIT
+        }
+        
+        logger.info(f"Fetching earthquake data for {days_back} days in box {box}")
+        with stage_timer("http_fetch"):
+            response = requests.get(url, params=params, timeout=CATALOG_FETCH_TIMEOUT)
+        count_metric("http_requests_total")
+        count_metric("http_response_bytes_total", len(response.content))
+        response.raise_for_status()
+        
+        with stage_timer("json_decode"):
+            data = response.json()
+        
+        if not data.get('features'):
+            return compact_catalog(normalize_catalog(pd.DataFrame()))
+        
+        with stage_timer("parse"):
+            parsed = parse_earthquake_features(data['features'])
+        return ingest_catalog(parsed)
+    
+    except Exception as e:
+        count_metric("http_errors_total")
+        logger.error(f"API error: {e}")
+        raise
+
+class CatalogSnapshotStore:
+    """Ultimo catalogo valido per periodo e riquadro, in memoria e su disco (stale-while-revalidate)"""
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.pending = {}
+        self.api = None
+        self.executor = ThreadPoolExecutor(max_workers=len(WARM_PERIODS) + 1, thread_name_prefix="catalog-refresh")
+
+    def path(self, days_back, box):
+        digest = hashlib.md5(repr((days_back, box)).encode()).hexdigest()[:12]
+        return os.path.join(self.directory, f"catalog_{days_back}d_{digest}.parquet")
+
+    def load(self, days_back, box):
+        """Copia in memoria o, dopo un riavvio, l'ultima salvata su disco"""
+        with self.lock:
+            entry = self.entries.get((days_back, box))
+        if entry is not None:
+            return entry
+        path = self.path(days_back, box)
+        if not os.path.exists(path):
+            return None
+        import pyarrow.parquet as pq
+        try:
+            with stage_timer("snapshot_load"):
+                table = pq.read_table(path)
+                fetched_at_ns = (table.schema.metadata or {}).get(SNAPSHOT_FETCHED_AT_KEY)
+                if fetched_at_ns is None:
+                    logger.warning(f"Catalog snapshot {path} has no fetch time, ignoring it")
+                    return None
+                df = compact_catalog(table.to_pandas())
+        except Exception as e:
+            logger.warning(f"Unreadable catalog snapshot {path}: {e}")
+            return None
+        # L'età si misura con l'istante del download, non con l'mtime del file
+        entry = {'catalog': df, 'fetched_at': pd.Timestamp(int(fetched_at_ns), tz='UTC'), 'error': None}
+        with self.lock:
+            return self.entries.setdefault((days_back, box), entry)
+
+    def save(self, days_back, box, entry):
+        """Scrittura atomica: un file temporaneo rinominato sopra la copia precedente"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            table = pa.Table.from_pandas(entry['catalog'], preserve_index=False)
+            metadata = {**(table.schema.metadata or {}), SNAPSHOT_FETCHED_AT_KEY: str(to_utc_ns(entry['fetched_at'])).encode()}
+            pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+            os.replace(tmp_path, self.path(days_back, box))
+        except Exception as e:
+            logger.warning(f"Could not write catalog snapshot: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def refresh(self, days_back, box):
+        """Scarica il catalogo; se INGV fallisce resta servita la copia precedente, marcata con l'errore"""
+        try:
+            df = fetch_earthquake_data(days_back, box)
+        except Exception as e:
+            count_metric("snapshot_refresh_failures_total")
+            with self.lock:
+                entry = self.entries.get((days_back, box))
+                if entry is not None:
+                    self.entries[(days_back, box)] = {**entry, 'error': str(e)}
+            raise
+        entry = {'catalog': df, 'fetched_at': utc_now(), 'error': None}
+        with self.lock:
+            self.entries[(days_back, box)] = entry
+        self.save(days_back, box, entry)
+        return entry
+
+    def revalidate(self, days_back, box):
+        """Aggiornamento in background, al più uno in corso per chiave"""
+        with self.lock:
+            future = self.pending.get((days_back, box))
+            if future is None or future.done():
+                future = self.executor.submit(self.refresh, days_back, box)
+                self.pending[(days_back, box)] = future
+        return future
+
+    def probe_api(self):
+        status = {'ok': test_api_connection(), 'checked_at': time.time()}
+        with self.lock:
+            self.api = status
+        return status
+
+    def api_status(self, max_age=API_STATUS_MAX_AGE):
+        """Ultimo esito noto della sonda INGV (None se mai verificato); la verifica gira in background"""
+        with self.lock:
+            status = self.api
+            future = self.pending.get('api_probe')
+            if (status is None or time.time() - status['checked_at'] > max_age) and (future is None or future.done()):
+                self.pending['api_probe'] = self.executor.submit(self.probe_api)
+        return None if status is None else status['ok']
+
+    def get(self, days_back, box, max_age=SNAPSHOT_MAX_AGE_SECONDS):
+        """Restituisce subito la copia disponibile, avviando l'aggiornamento se è vecchia"""
+        entry = self.load(days_back, box)
+        if entry is None:
+            # Primo avvio senza copie: si attende il download, condiviso fra le sessioni
+            count_metric("catalog_cache_misses_total")
+            try:
+                return self.revalidate(days_back, box).result()
+            except Exception as e:
+                # Senza copie da servire l'errore arriva alla pagina, distinto da un timeout
+                return {'catalog': None, 'fetched_at': None, 'error': str(e)}
+        if (utc_now() - entry['fetched_at']).total_seconds() > max_age:
+            count_metric("catalog_stale_served_total")
+            self.revalidate(days_back, box)
+        else:
+            count_metric("catalog_cache_hits_total")
+        return entry
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store():
+    """Copie dei cataloghi condivise dal processo"""
+    return CatalogSnapshotStore()
+
+def parse_earthquake_features(features):
+    """Converte le feature GeoJSON FDSN in un DataFrame di terremoti"""
+    earthquakes = []
+    for feature in features:
+        try:
+            props = feature['properties']
+            coords = feature['geometry']['coordinates']
+            
+            if not all(k in props for k in ['time', 'mag']) or len(coords) < 2:
+                continue
+            
+            earthquakes.append({
+                'time': props['time'],
+                'magnitude': float(props.get('mag', 0)),
+                'depth': float(coords[2]) if len(coords) > 2 else 0.0,
+                'latitude': float(coords[1]),
+                'longitude': float(coords[0]),
+                'place': str(props.get('place', 'N/A')),
+                'event_id': props.get('eventId')
+            })
+                
+        except Exception as e:
+            logger.warning(f"Error parsing earthquake feature: {e}")
+            continue
+    
+    df = pd.DataFrame(earthquakes, columns=CATALOG_COLUMNS)
+    # Un'unica conversione vettoriale dei tempi in nanosecondi UTC ('mixed': ogni stringa col suo fuso, senza fuso è UTC)
+    df['time'] = pd.to_datetime(df['time'], utc=True, format='mixed', errors='coerce').dt.as_unit('ns')
+    invalid_time = df['time'].isna()
+    if invalid_time.any():
+        logger.warning(f"Dropped {int(invalid_time.sum())} earthquake features with invalid time")
+    df = df[~invalid_time & df['latitude'].between(-90, 90) & df['longitude'].between(-180, 180)].reset_index(drop=True)
+    
+    missing_id = df['event_id'].isna()
+    if missing_id.any():
+        df.loc[missing_id, 'event_id'] = [stable_event_id(*row) for row in df.loc[missing_id, ['time', 'latitude', 'longitude']].itertuples(index=False)]
+    df['event_id'] = df['event_id'].astype(str)
+    
+    logger.info(f"Successfully parsed {len(df)} earthquakes")
+    return df
+
+def stable_event_id(event_time, latitude, longitude):
+    """Id stabile per eventi senza eventId: hash di tempo (al secondo) e posizione (0.01°)"""
+    event_time = pd.Timestamp(event_time)
+    event_time = event_time.tz_localize('UTC') if event_time.tzinfo is None else event_time.tz_convert('UTC')
+    key = f"{event_time.floor('s').isoformat()}|{latitude:.2f}|{longitude:.2f}"
+    return 'h' + hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def normalize_catalog(df):
+    """Uniforma il catalogo: colonne standard, tempi UTC, eventi unici ordinati per tempo"""
+    if df.empty:
+        return pd.DataFrame({
+            'time': pd.Series(dtype='datetime64[ns, UTC]'),
+            'magnitude': pd.Series(dtype='float64'),
+            'depth': pd.Series(dtype='float64'),
+            'latitude': pd.Series(dtype='float64'),
+            'longitude': pd.Series(dtype='float64'),
+            'place': pd.Series(dtype='object'),
+            'event_id': pd.Series(dtype='object')
+        })
+    
+    df = df[[col for col in CATALOG_COLUMNS if col in df.columns]].copy()
+    if 'place' not in df.columns:
+        df['place'] = 'N/A'
+    if 'event_id' not in df.columns:
+        df['event_id'] = None
+    
+    df['time'] = pd.to_datetime(df['time'], utc=True, format='ISO8601').dt.as_unit('ns')
+    for col in ['magnitude', 'depth', 'latitude', 'longitude']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['depth'] = df['depth'].fillna(0.0)
+    df['place'] = df['place'].astype(str)
+    
+    df = df.dropna(subset=['time', 'magnitude', 'latitude', 'longitude'])
+    df = df[df['latitude'].between(-90, 90) & df['longitude'].between(-180, 180)]
+    missing = df['event_id'].isna()
+    if missing.any():
+        df.loc[missing, 'event_id'] = [
+            stable_event_id(t, lat, lon)
+            for t, lat, lon in zip(df.loc[missing, 'time'], df.loc[missing, 'latitude'], df.loc[missing, 'longitude'])
+        ]
+    df['event_id'] = df['event_id'].astype(str)
+    df = df.drop_duplicates(subset='event_id', keep='last')
+    return df.sort_values('time', kind='stable').reset_index(drop=True)[CATALOG_COLUMNS]
+
+class CatalogArchive:
+    """Archivio locale SQLite degli eventi, indicizzato per tempo"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    event_id TEXT PRIMARY KEY,
+                    time_ns INTEGER NOT NULL,
+                    magnitude REAL,
+                    depth REAL,
+                    latitude REAL,
+                    longitude REAL,
+                    place TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_time ON events(time_ns)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_magnitude ON events(magnitude)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_depth ON events(depth)")
+            # Revisioni: colonne aggiunte anche agli archivi creati da versioni precedenti
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(events)")}
+            for column in ['revision INTEGER NOT NULL DEFAULT 0', 'updated_ns INTEGER', 'version INTEGER NOT NULL DEFAULT 0']:
+                if column.split()[0] not in columns:
+                    self.conn.execute(f"ALTER TABLE events ADD COLUMN {column}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_version ON events(version)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS event_revisions (
+                    event_id TEXT NOT NULL,
+                    revision INTEGER NOT NULL,
+                    updated_ns INTEGER,
+                    time_ns INTEGER NOT NULL,
+                    magnitude REAL,
+                    depth REAL,
+                    latitude REAL,
+                    longitude REAL,
+                    place TEXT,
+                    PRIMARY KEY (event_id, revision)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS change_sets (
+                    version INTEGER PRIMARY KEY,
+                    created_ns INTEGER NOT NULL,
+                    inserted INTEGER NOT NULL,
+                    updated INTEGER NOT NULL,
+                    min_time_ns INTEGER NOT NULL,
+                    max_time_ns INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS backfill_chunks (
+                    start_ns INTEGER NOT NULL,
+                    end_ns INTEGER NOT NULL,
+                    events INTEGER NOT NULL,
+                    completed_ns INTEGER NOT NULL,
+                    PRIMARY KEY (start_ns, end_ns)
+                )
+            """)
+            self.conn.commit()
+
+    # Una riga in arrivo è cambiata se differisce in tempo, valori o località
+    CHANGED_CLAUSE = """
+        e.event_id IS NULL OR e.time_ns != i.time_ns
+        OR abs(e.magnitude - i.magnitude) > 1e-9 OR abs(e.depth - i.depth) > 1e-9
+        OR abs(e.latitude - i.latitude) > 1e-9 OR abs(e.longitude - i.longitude) > 1e-9
+        OR e.place IS NOT i.place
+    """
+
+    def upsert(self, df):
+        """Applica solo gli eventi nuovi o revisionati e restituisce il change set"""
+        change_set = {'version': None, 'inserted': [], 'updated': [], 'unchanged': 0, 'start': None, 'end': None}
+        if df.empty:
+            return change_set
+        rows = zip(
+            df['event_id'],
+            df['time'].array.asi8.tolist(),
+            df['magnitude'].tolist(),
+            df['depth'].tolist(),
+            df['latitude'].tolist(),
+            df['longitude'].tolist(),
+            df['place']
+        )
+        now_ns = utc_now_ns()
+        with self.lock:
+            conn = self.conn
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS incoming (
+                    event_id TEXT PRIMARY KEY, time_ns INTEGER, magnitude REAL, depth REAL,
+                    latitude REAL, longitude REAL, place TEXT
+                )
+            """)
+            conn.execute("DELETE FROM incoming")
+            conn.executemany("INSERT OR REPLACE INTO incoming VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            
+            changed = conn.execute(f"""
+                SELECT i.event_id, e.event_id IS NULL, MIN(i.time_ns, COALESCE(e.time_ns, i.time_ns)),
+                       MAX(i.time_ns, COALESCE(e.time_ns, i.time_ns))
+                FROM incoming i LEFT JOIN events e ON e.event_id = i.event_id
+                WHERE {self.CHANGED_CLAUSE}
+            """).fetchall()
+            change_set['unchanged'] = len(df) - len(changed)
+            if not changed:
+                conn.commit()
+                return change_set
+            
+            version = conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM change_sets").fetchone()[0]
+            # Storico compatto: si conserva la versione precedente solo degli eventi cambiati
+            conn.execute(f"""
+                INSERT OR REPLACE INTO event_revisions
+                SELECT e.event_id, e.revision, e.updated_ns, e.time_ns, e.magnitude, e.depth,
+                       e.latitude, e.longitude, e.place
+                FROM incoming i JOIN events e ON e.event_id = i.event_id
+                WHERE {self.CHANGED_CLAUSE}
+            """)
+            conn.execute(f"""
+                INSERT INTO events (event_id, time_ns, magnitude, depth, latitude, longitude, place,
+                                    revision, updated_ns, version)
+                SELECT i.event_id, i.time_ns, i.magnitude, i.depth, i.latitude, i.longitude, i.place, 0, ?, ?
+                FROM incoming i LEFT JOIN events e ON e.event_id = i.event_id
+                WHERE {self.CHANGED_CLAUSE}
+                ON CONFLICT(event_id) DO UPDATE SET
+                    time_ns = excluded.time_ns, magnitude = excluded.magnitude, depth = excluded.depth,
+                    latitude = excluded.latitude, longitude = excluded.longitude, place = excluded.place,
+                    revision = events.revision + 1, updated_ns = excluded.updated_ns, version = excluded.version
+            """, (now_ns, version))
+            conn.execute("""
+                DELETE FROM event_revisions WHERE event_id IN (SELECT event_id FROM incoming)
+                AND revision < (SELECT revision FROM events WHERE events.event_id = event_revisions.event_id) - ?
+            """, (EVENT_HISTORY_MAX_REVISIONS,))
+            
+            change_set['inserted'] = [event_id for event_id, is_new, _, _ in changed if is_new]
+            change_set['updated'] = [event_id for event_id, is_new, _, _ in changed if not is_new]
+            change_set['start'] = pd.Timestamp(min(row[2] for row in changed), tz='UTC')
+            change_set['end'] = pd.Timestamp(max(row[3] for row in changed), tz='UTC')
+            change_set['version'] = version
+            conn.execute(
+                "INSERT INTO change_sets VALUES (?, ?, ?, ?, ?, ?)",
+                (version, now_ns, len(change_set['inserted']), len(change_set['updated']),
+                 change_set['start'].value, change_set['end'].value)
+            )
+            conn.commit()
+        
+        count_metric("events_inserted_total", len(change_set['inserted']))
+        count_metric("events_revised_total", len(change_set['updated']))
+        return change_set
+
+    def version(self, start=None, end=None):
+        """Ultimo change set dell'archivio, o solo di quelli che toccano [start, end]"""
+        query = "SELECT COALESCE(MAX(version), 0) FROM change_sets"
+        params = ()
+        if start is not None and end is not None:
+            query += " WHERE max_time_ns >= ? AND min_time_ns <= ?"
+            params = (to_utc_ns(start), to_utc_ns(end))
+        with self.lock:
+            return self.conn.execute(query, params).fetchone()[0]
+
+    def changes_since(self, version):
+        """Eventi inseriti o revisionati dopo la versione indicata"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT event_id, revision, version FROM events WHERE version > ? ORDER BY version",
+                (version,)
+            ).fetchall()
+        return pd.DataFrame(rows, columns=['event_id', 'revision', 'version'])
+
+    def event_history(self, event_id):
+        """Revisioni precedenti e stato attuale di un evento, dalla più vecchia"""
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT revision, updated_ns, time_ns, magnitude, depth, latitude, longitude, place
+                FROM event_revisions WHERE event_id = ?
+                UNION ALL
+                SELECT revision, updated_ns, time_ns, magnitude, depth, latitude, longitude, place
+                FROM events WHERE event_id = ?
+                ORDER BY revision
+                """,
+                (event_id, event_id)
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=['revision', 'updated', 'time', 'magnitude', 'depth', 'latitude', 'longitude', 'place'])
+        df['updated'] = pd.to_datetime(df['updated'], unit='ns', utc=True)
+        df['time'] = pd.to_datetime(df['time'], unit='ns', utc=True)
+        return df
+
+    def mark_backfill_chunk(self, start, end, events):
+        """Registra il checkpoint di un blocco di backfill completato"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO backfill_chunks VALUES (?, ?, ?, ?)",
+                (to_utc_ns(start), to_utc_ns(end), events, utc_now_ns())
+            )
+            self.conn.commit()
+
+    def completed_backfill_chunks(self):
+        """Insieme dei blocchi (start_ns, end_ns) già scaricati"""
+        with self.lock:
+            rows = self.conn.execute("SELECT start_ns, end_ns FROM backfill_chunks").fetchall()
+        return set(rows)
+
+    def load(self, start=None, end=None):
+        """Legge gli eventi nell'intervallo [start, end] come catalogo normalizzato"""
+        start_ns = to_utc_ns(start) if start is not None else np.iinfo(np.int64).min
+        end_ns = to_utc_ns(end) if end is not None else np.iinfo(np.int64).max
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT time_ns, magnitude, depth, latitude, longitude, place, event_id
+                FROM events WHERE time_ns BETWEEN ? AND ? ORDER BY time_ns
+                """,
+                (start_ns, end_ns)
+            ).fetchall()
+        
+        if not rows:
+            return pd.DataFrame(columns=CATALOG_COLUMNS)
+        df = pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+        df['time'] = pd.to_datetime(df['time'], unit='ns', utc=True)
+        return df
+
+    def open_reader(self):
+        """Apre una connessione di sola lettura dedicata (letture lunghe non bloccano l'ingestione)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.create_function("distance_km", 4, calculate_distance, deterministic=True)
+        return conn
+
+    @staticmethod
+    def build_filter(start, end, min_magnitude=None, max_depth=None, max_distance=None,
+                     center=(CAMPI_FLEGREI_LAT, CAMPI_FLEGREI_LON), search=None):
+        """Costruisce la clausola WHERE e i parametri per i filtri della dashboard"""
+        clause = "time_ns BETWEEN ? AND ?"
+        params = [to_utc_ns(start), to_utc_ns(end)]
+        if min_magnitude is not None:
+            clause += " AND magnitude >= ?"
+            params.append(min_magnitude)
+        if max_depth is not None:
+            clause += " AND depth <= ?"
+            params.append(max_depth)
+        if max_distance is not None:
+            # Prefiltro a riquadro prima del calcolo Haversine riga per riga
+            dlat = max_distance / 111.0
+            dlon = max_distance / (111.0 * max(math.cos(math.radians(center[0])), 0.01))
+            clause += " AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?"
+            params += [center[0] - dlat, center[0] + dlat, center[1] - dlon, center[1] + dlon]
+            clause += " AND distance_km(?, ?, latitude, longitude) <= ?"
+            params += [center[0], center[1], max_distance]
+        if search:
+            clause += " AND (place LIKE ? OR event_id = ?)"
+            params += [f"%{search}%", search]
+        return clause, params
+
+    @staticmethod
+    def rows_to_frame(rows):
+        """Converte le righe SQL (con distanza) in DataFrame tipizzato, anche se vuoto"""
+        df = pd.DataFrame(rows, columns=EXPORT_COLUMNS)
+        df['time'] = pd.to_datetime(df['time'].astype('int64'), unit='ns', utc=True)
+        for col in ['magnitude', 'depth', 'latitude', 'longitude', 'distance_km']:
+            df[col] = df[col].astype(float)
+        return df
+
+    def iter_chunks(self, start, end, min_magnitude=None, max_depth=None, max_distance=None,
+                    center=(CAMPI_FLEGREI_LAT, CAMPI_FLEGREI_LON), chunk_size=EXPORT_CHUNK_SIZE):
+        """Legge a blocchi gli eventi filtrati, in ordine di tempo, con memoria costante"""
+        conn = self.open_reader()
+        try:
+            clause, params = self.build_filter(start, end, min_magnitude, max_depth, max_distance, center)
+            query = f"""
+                SELECT time_ns, magnitude, depth, latitude, longitude,
+                       distance_km(?, ?, latitude, longitude) AS distance_km, place, event_id
+                FROM events WHERE {clause} ORDER BY time_ns
+            """
+            cursor = conn.execute(query, [center[0], center[1]] + params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield self.rows_to_frame(rows)
+        finally:
+            conn.close()
+
+    def query_page(self, start, end, min_magnitude=None, max_depth=None, max_distance=None,
+                   sort_by='time', ascending=False, search=None, page=0, page_size=50,
+                   center=(CAMPI_FLEGREI_LAT, CAMPI_FLEGREI_LON)):
+        """Restituisce (pagina ordinata, totale eventi) con ordinamento e ricerca eseguiti da SQLite"""
+        clause, params = self.build_filter(start, end, min_magnitude, max_depth, max_distance, center, search)
+        order = f"{TABLE_SORT_SQL[sort_by]} {'ASC' if ascending else 'DESC'}, time_ns DESC"
+        conn = self.open_reader()
+        try:
+            total = conn.execute(f"SELECT COUNT(*) FROM events WHERE {clause}", params).fetchone()[0]
+            rows = conn.execute(
+                f"""
+                SELECT time_ns, magnitude, depth, latitude, longitude,
+                       distance_km(?, ?, latitude, longitude) AS distance_km, place, event_id
+                FROM events WHERE {clause} ORDER BY {order} LIMIT ? OFFSET ?
+                """,
+                [center[0], center[1]] + params + [page_size, page * page_size]
+            ).fetchall()
+        finally:
+            conn.close()
+        
+        return self.rows_to_frame(rows), total
+
+    def time_range(self):
+        """Restituisce il primo e l'ultimo istante archiviati (o None)"""
+        with self.lock:
+            first_ns, last_ns = self.conn.execute("SELECT MIN(time_ns), MAX(time_ns) FROM events").fetchone()
+        if first_ns is None:
+            return None
+        return pd.Timestamp(first_ns, tz='UTC'), pd.Timestamp(last_ns, tz='UTC')
+
+@st.cache_resource(show_spinner=False)
+def get_catalog_archive(db_path=ARCHIVE_DB_PATH):
+    """Restituisce l'archivio locale condiviso dal processo"""
+    return CatalogArchive(db_path)
+
+def magnitude_to_moment(magnitudes):
+    """Momento sismico M0 (N·m) da magnitudo, relazione di Hanks–Kanamori"""
+    return 10 ** (1.5 * np.asarray(magnitudes, dtype=np.float64) + 9.1)
+
+def magnitude_to_energy(magnitudes):
+    """Energia irradiata (J) da magnitudo, relazione di Gutenberg–Richter log E = 1.5 M + 4.8"""
+    return 10 ** (1.5 * np.asarray(magnitudes, dtype=np.float64) + 4.8)
+
+def moment_to_magnitude(moment):
+    """Magnitudo momento equivalente a un momento sismico (N·m)"""
+    return (np.log10(moment) - 9.1) / 1.5 if moment > 0 else 0.0
+
+def add_release_prefix(df, moment_offset=0.0, benioff_offset=0.0):
+    """Somme prefisse di momento e strain di Benioff su un catalogo ordinato per tempo"""
+    moment = df['moment'].to_numpy(dtype=np.float64)
+    benioff = np.sqrt(df['energy'].to_numpy(dtype=np.float64))
+    return df.assign(
+        cum_moment=moment_offset + np.cumsum(moment),
+        cum_benioff=benioff_offset + np.cumsum(benioff)
+    )
+
+def compact_catalog(df):
+    """Rappresentazione compatta: stringhe a dizionario, float32, tempi int64 ns UTC"""
+    if 'distance_km' not in df.columns:
+        df = df.assign(distance_km=calculate_distances(df['latitude'], df['longitude']))
+    if 'moment' not in df.columns:
+        df = df.assign(moment=magnitude_to_moment(df['magnitude']), energy=magnitude_to_energy(df['magnitude']))
+    if 'cum_moment' not in df.columns:
+        df = add_release_prefix(df)
+    return df.astype(COMPACT_DTYPES)
+
+def append_catalog(df, batch):
+    """Accoda eventi più recenti proseguendo le somme prefisse invece di ricalcolarle"""
+    if batch.empty:
+        return df
+    if df.empty:
+        return batch.reset_index(drop=True).astype(COMPACT_DTYPES)
+    batch = add_release_prefix(batch, df['cum_moment'].iloc[-1], df['cum_benioff'].iloc[-1])
+    return pd.concat([df, batch], ignore_index=True).astype(COMPACT_DTYPES)
+
+def release_between(df, start, end):
+    """Momento e strain di Benioff rilasciati in [start, end] dagli eventi del catalogo dato (anche filtrato)"""
+    # Le somme prefisse valgono solo sul catalogo completo: sul sottoinsieme filtrato si somma la finestra
+    window = catalog_window(df, start, end)
+    return {
+        'events': len(window),
+        'moment': float(window['moment'].to_numpy(dtype=np.float64).sum()),
+        'benioff': float(np.sqrt(window['energy'].to_numpy(dtype=np.float64)).sum())
+    }
+
+def release_curves(df):
+    """Curve cumulative di momento e strain di Benioff per il catalogo mostrato"""
+    return pd.DataFrame({
+        'time': df['time'],
+        'cum_moment': np.cumsum(df['moment'].to_numpy(dtype=np.float64)),
+        'cum_benioff': np.cumsum(np.sqrt(df['energy'].to_numpy(dtype=np.float64)))
+    })
+
+def catalog_window(df, start, end=None):
+    """Restituisce la finestra temporale di un catalogo ordinato come slice, senza copia"""
+    times_ns = df['time'].array.asi8
+    first = int(np.searchsorted(times_ns, to_utc_ns(start), side='left'))
+    last = len(df) if end is None else int(np.searchsorted(times_ns, to_utc_ns(end), side='right'))
+    return df.iloc[first:last]
+
+def catalog_memory_bytes(df):
+    """Memoria occupata da un catalogo, incluse le stringhe"""
+    return int(df.memory_usage(deep=True).sum())
+
+def ingest_catalog(df, archive=True):
+    """Percorso di ingestione comune a dati live e replay"""
+    with stage_timer("ingest"):
+        df = normalize_catalog(df)
+        if archive and not df.empty:
+            try:
+                change_set = get_catalog_archive().upsert(df)
+                if change_set['version'] is not None:
+                    logger.info(
+                        f"Archive v{change_set['version']}: {len(change_set['inserted'])} new, "
+                        f"{len(change_set['updated'])} revised, {change_set['unchanged']} unchanged"
+                    )
+            except Exception as e:
+                logger.error(f"Archive write failed: {e}")
+                change_set = None
+            if change_set and change_set['inserted']:
+                try:
+                    get_rate_change_monitor().observe(df[df['event_id'].isin(change_set['inserted'])])
+                except Exception as e:
+                    logger.error(f"Rate change detection failed: {e}")
+        df = compact_catalog(df)
+    count_metric("events_ingested_total", len(df))
+    return df
+
+def gardner_knopoff_windows(magnitudes):
+    """Finestre di Gardner–Knopoff (1974): durata in giorni e raggio in km per magnitudo"""
+    magnitudes = np.asarray(magnitudes, dtype=np.float64)
+    days = np.where(
+        magnitudes >= 6.5,
+        10 ** (0.032 * magnitudes + 2.7389),
+        10 ** (0.5409 * magnitudes - 0.547)
+    )
+    km = 10 ** (0.1238 * magnitudes + 0.983)
+    return days, km
+
+def decluster_gardner_knopoff(times, magnitudes, latitudes, longitudes):
+    """Cluster di Gardner–Knopoff: ogni evento non assegnato, dal più forte, apre una finestra spazio-temporale"""
+    n = len(times)
+    cluster_ids = np.full(n, -1, dtype=np.int64)
+    window_days, window_km = gardner_knopoff_windows(magnitudes)
+    
+    # Indice temporale: gli eventi sono ordinati per tempo, le finestre sono slice via searchsorted
+    lo = np.searchsorted(times, times - window_days, side='left')
+    hi = np.searchsorted(times, times + window_days, side='right')
+    for i in np.argsort(-magnitudes, kind='stable'):
+        if cluster_ids[i] >= 0:
+            continue
+        candidates = np.arange(lo[i], hi[i])
+        candidates = candidates[cluster_ids[candidates] < 0]
+        distances = calculate_distances(latitudes[candidates], longitudes[candidates], latitudes[i], longitudes[i])
+        cluster_ids[candidates[distances <= window_km[i]]] = i
+        cluster_ids[i] = i
+    return cluster_ids
+
+def _find_root(parents, i):
+    """Radice union-find con path halving"""
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def decluster_reasenberg(times, magnitudes, latitudes, longitudes):
+    """Collegamento in stile Reasenberg (1985): coppie entro il tempo di attesa e il raggio di interazione"""
+    n = len(times)
+    tau = np.clip(
+        REASENBERG_TAU_MIN_DAYS * 10 ** (2 / 3 * (magnitudes - REASENBERG_XMEFF)),
+        REASENBERG_TAU_MIN_DAYS, REASENBERG_TAU_MAX_DAYS
+    )
+    # Raggio di frattura (Kanamori–Anderson) moltiplicato per rfact, più l'errore di localizzazione
+    radius = REASENBERG_RFACT * 0.011 * 10 ** (0.4 * magnitudes)
+    
+    # Indice temporale: per ogni evento, i successivi entro tau sono una slice contigua
+    hi = np.searchsorted(times, times + tau, side='right')
+    counts = hi - np.arange(n) - 1
+    parents = np.arange(n)
+    
+    # Le coppie candidate sono generate a blocchi per limitare la memoria
+    start = 0
+    cumulative = np.cumsum(counts)
+    while start < n:
+        base = cumulative[start - 1] if start else 0
+        stop = max(int(np.searchsorted(cumulative, base + DECLUSTER_PAIR_BLOCK, side='right')), start + 1)
+        block_counts = counts[start:stop]
+        total = int(block_counts.sum())
+        if total:
+            first = np.repeat(np.arange(start, stop), block_counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(block_counts) - block_counts, block_counts)
+            second = first + 1 + offsets
+            distances = calculate_distances(latitudes[second], longitudes[second], latitudes[first], longitudes[first])
+            linked = distances <= np.maximum(radius[first], radius[second]) + LOCATION_ERROR_KM
+            for i, j in zip(first[linked].tolist(), second[linked].tolist()):
+                root_i, root_j = _find_root(parents, i), _find_root(parents, j)
+                if root_i != root_j:
+                    parents[max(root_i, root_j)] = min(root_i, root_j)
+        start = stop
+    return np.array([_find_root(parents, i) for i in range(n)], dtype=np.int64)
+
+def assign_cluster_roles(times, magnitudes, cluster_ids):
+    """Ruolo di ogni evento nel suo cluster e flag dell'evento più forte (rappresentante indipendente)"""
+    frame = pd.DataFrame({'time': times, 'magnitude': magnitudes, 'cluster': cluster_ids})
+    size = frame.groupby('cluster')['magnitude'].transform('size').to_numpy()
+    
+    # Evento principale (primo a magnitudo massima) e secondo più forte, per il gap di magnitudo
+    ranked = frame.sort_values(['cluster', 'magnitude', 'time'], ascending=[True, False, True], kind='stable')
+    leaders = ranked.groupby('cluster').head(1).set_index('cluster')
+    runners_up = ranked.groupby('cluster').nth(1).set_index('cluster')
+    main_time = frame['cluster'].map(leaders['time']).to_numpy()
+    gap = (frame['cluster'].map(leaders['magnitude']) - frame['cluster'].map(runners_up['magnitude'])).to_numpy()
+    is_main = np.zeros(len(frame), dtype=bool)
+    is_main[ranked.groupby('cluster').head(1).index.to_numpy()] = True
+    
+    swarm = (size >= SWARM_MIN_EVENTS) & (gap < SWARM_MAGNITUDE_GAP)
+    roles = np.where(times < main_time, 'foreshock', 'aftershock').astype(object)
+    roles[is_main] = 'mainshock'
+    roles[swarm] = 'swarm'
+    roles[size == 1] = 'isolated'
+    return roles, is_main
+
+def decluster_catalog(df, method):
+    """Aggiunge cluster_id, cluster_role e independent al catalogo (ordinato per tempo)"""
+    if df.empty or method is None:
+        return df
+    times = df['time'].array.asi8 / 86400e9
+    magnitudes = df['magnitude'].to_numpy(dtype=np.float64)
+    latitudes = df['latitude'].to_numpy(dtype=np.float64)
+    longitudes = df['longitude'].to_numpy(dtype=np.float64)
+    
+    if method == 'gardner_knopoff':
+        cluster_ids = decluster_gardner_knopoff(times, magnitudes, latitudes, longitudes)
+    else:
+        cluster_ids = decluster_reasenberg(times, magnitudes, latitudes, longitudes)
+    # Numerazione compatta dei cluster in ordine di comparsa
+    cluster_ids = pd.factorize(cluster_ids)[0].astype(np.int32)
+    roles, independent = assign_cluster_roles(times, magnitudes, cluster_ids)
+    return df.assign(
+        cluster_id=cluster_ids,
+        cluster_role=pd.Categorical(roles, categories=list(CLUSTER_ROLES)),
+        independent=independent
+    )
+
+def cluster_role_labels(df):
+    """Etichette italiane del ruolo nel cluster, per legende e tooltip"""
+    return df['cluster_role'].map({role: label for role, (label, _) in CLUSTER_ROLES.items()}).astype(str)
+
+def catalog_fingerprint(df):
+    """Impronta del contenuto di un catalogo, usata come chiave di cache"""
+    if df.empty:
+        return (0, 0)
+    hashes = pd.util.hash_pandas_object(df[['event_id', 'time', 'magnitude']], index=False)
+    return (len(df), int(hashes.sum()))
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _decluster_cached(_df, fingerprint, method):
+    with stage_timer("decluster"):
+        return decluster_catalog(_df, method)
+
+def get_declustered_catalog(df, method):
+    """Declustering del catalogo, ricalcolato solo quando cambiano dati o metodo"""
+    if method is None or df.empty:
+        return df
+    return _decluster_cached(df, catalog_fingerprint(df), method)
+
+def cluster_mask(df, cluster_filter):
+    """Maschera degli eventi con il ruolo nel cluster richiesto (None se non si filtra)"""
+    if cluster_filter is None or 'cluster_role' not in df.columns:
+        return None
+    if cluster_filter == 'independent':
+        return df['independent'].to_numpy(dtype=bool)
+    return df['cluster_role'].isin(cluster_filter).to_numpy()
+
+def expand_ranges(starts, counts):
+    """Espande gli intervalli [start, start + count) in coppie (proprietario, indice)"""
+    owners = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(starts, counts) + offsets
+
+def etas_far_field(times, kernel_days, width):
+    """Campo lontano del nucleo per celle aggregate, larghe 'width' giorni e raddoppiate a ogni livello"""
+    # Ogni cella dista dal figlio almeno ETAS_NEAR_CELLS volte la sua larghezza: il nucleo vi varia poco
+    n = len(times)
+    levels = []
+    pairs = []
+    bins = 0
+    
+    def add_cells(level, owners, candidates):
+        """Aggiunge le coppie (figlio, cella) per le celle occupate del livello"""
+        occupied, means, offset = levels[level]
+        position = np.minimum(np.searchsorted(occupied, candidates), len(occupied) - 1)
+        found = occupied[position] == candidates
+        pairs.append((owners[found], offset + position[found]))
+    
+    children = np.arange(n)
+    first = np.floor(times / width).astype(np.int64) - ETAS_NEAR_CELLS
+    straddling = []
+    while len(children):
+        level = len(levels)
+        level_width = width * 2 ** level
+        occupied, member = np.unique(np.floor(times / level_width).astype(np.int64), return_inverse=True)
+        levels.append((occupied, np.bincount(member, weights=times) / np.bincount(member), bins))
+        bins += len(occupied)
+        # Celle [lo, first) del livello; lo è pari perché il livello successivo riprenda da lo / 2
+        lo = first - ETAS_NEAR_CELLS
+        lo -= lo % 2
+        owners, candidates = expand_ranges(lo, first - lo)
+        owners = children[owners]
+        boundary = times[owners] - kernel_days
+        inside = candidates * level_width >= boundary
+        add_cells(level, owners[inside], candidates[inside])
+        # La cella tagliata dal troncamento viene raffinata sotto, per non spostare il bordo del nucleo
+        cut = ~inside & ((candidates + 1) * level_width > boundary)
+        straddling.append((owners[cut], candidates[cut]))
+        first = lo // 2
+        active = times[children] - first * 2 * level_width < kernel_days
+        children, first = children[active], first[active]
+    
+    # Discesa dei livelli: la metà interna al nucleo si aggiunge intera, quella tagliata si divide ancora
+    owners = np.empty(0, dtype=np.int64)
+    cells = np.empty(0, dtype=np.int64)
+    for level in range(len(levels) - 1, -1, -1):
+        if level < len(levels) - 1:
+            boundary = times[owners] - kernel_days
+            upper = 2 * cells + 1
+            upper_inside = upper * width * 2 ** level >= boundary
+            add_cells(level, owners[upper_inside], upper[upper_inside])
+            cells = np.where(upper_inside, 2 * cells, upper)
+        owners = np.concatenate([owners, straddling[level][0]])
+        cells = np.concatenate([cells, straddling[level][1]])
+    # Alla risoluzione più fine la cella di bordo conta se il suo baricentro cade nel nucleo
+    occupied, means, _ = levels[0]
+    position = np.minimum(np.searchsorted(occupied, cells), len(occupied) - 1)
+    within = times[owners] - means[position] <= kernel_days
+    add_cells(0, owners[within], cells[within])
+    
+    pair_children = np.concatenate([pair[0] for pair in pairs])
+    return {
+        'children': pair_children,
+        'child_times': times[pair_children],
+        'bins': np.concatenate([pair[1] for pair in pairs]),
+        'members': np.tile(np.arange(n), len(levels)),
+        'member_times': np.tile(times, len(levels)),
+        'member_bins': np.concatenate([
+            offset + np.searchsorted(occupied, np.floor(times / (width * 2 ** level)).astype(np.int64))
+            for level, (occupied, _, offset) in enumerate(levels)
+        ]),
+        'n_bins': bins
+    }
+
+def etas_pairs(times, kernel_days=ETAS_KERNEL_DAYS, max_pairs=ETAS_MAX_PAIRS):
+    """Coppie (genitore, figlio, ritardo) del nucleo troncato; oltre il budget il campo lontano è aggregato per celle"""
+    n = len(times)
+    indices = np.arange(n)
+    starts = np.searchsorted(times, times - kernel_days, side='left')
+    far, width = None, None
+    if (indices - starts).sum() > max_pairs:
+        # Campo vicino esatto (celle [c - ETAS_NEAR_CELLS, c] del figlio) entro metà budget, per bisezione sulla larghezza
+        def near_starts(width):
+            edges = (np.floor(times / width) - ETAS_NEAR_CELLS) * width
+            return np.searchsorted(times, edges, side='left')
+        
+        low, high = 0.0, kernel_days / (ETAS_NEAR_CELLS + 1)
+        for _ in range(30):
+            middle = (low + high) / 2
+            low, high = (middle, high) if (indices - near_starts(middle)).sum() <= max_pairs // 2 else (low, middle)
+        width = low or high / 2 ** 30
+        starts = near_starts(width)
+        far = etas_far_field(times, kernel_days, width)
+    children, parents = expand_ranges(starts, indices - starts)
+    delays = times[children] - times[parents]
+    # Eventi simultanei non si innescano a vicenda
+    keep = (delays > 0) & (delays <= kernel_days)
+    return {
+        'parents': parents[keep],
+        'children': children[keep],
+        'delays': delays[keep],
+        'far': far,
+        'far_field_days': None if width is None else ETAS_NEAR_CELLS * width
+    }
+
+def etas_objective(x, data):
+    """Log-verosimiglianza ETAS negata e suo gradiente nei parametri trasformati"""
+    if np.any(x < ETAS_BOUNDS[:, 0]) or np.any(x > ETAS_BOUNDS[:, 1]):
+        return np.inf, np.full_like(x, np.nan)
+    log_mu, log_k, alpha, log_c, log_q = x
+    mu, c, q = np.exp(log_mu), np.exp(log_c), np.exp(log_q)
+    p = 1 + q
+    productivity = np.exp(log_k + alpha * data['excess'])
+    
+    # Produttività per coppia (log) e derivata in α del log-contributo
+    pair_log_productivity = alpha * data['parent_excess']
+    pair_excess = data['parent_excess']
+    delays = data['delays']
+    far = data['far']
+    if far is not None:
+        # Ogni cella del campo lontano agisce come un solo genitore nel baricentro pesato dei suoi eventi,
+        # con la correzione del secondo ordine (varianza dei tempi) sul nucleo di Omori
+        cells, member_bins = far['bins'], far['member_bins']
+        member_weights = productivity[far['members']]
+        member_excess = data['excess'][far['members']]
+        
+        def cell_mean(values):
+            return np.bincount(member_bins, weights=member_weights * values, minlength=far['n_bins']) / sums
+        
+        sums = np.bincount(member_bins, weights=member_weights, minlength=far['n_bins'])
+        mean_excess, centroids = cell_mean(member_excess), cell_mean(far['member_times'])
+        offsets = far['member_times'] - centroids[member_bins]
+        # Derivate in α: il baricentro si sposta della covarianza fra eccesso e tempo, la varianza di quella con lo scarto²
+        covariance, variance = cell_mean(member_excess * offsets)[cells], cell_mean(offsets ** 2)[cells]
+        variance_slope = cell_mean(member_excess * offsets ** 2)[cells] - mean_excess[cells] * variance
+        far_base = c + far['child_times'] - centroids[cells]
+        correction = p * (p + 1) * variance / (2 * far_base ** 2)
+        delays = np.concatenate([delays, far_base - c])
+        pair_log_productivity = np.concatenate([pair_log_productivity, (np.log(sums) - log_k)[cells] + np.log1p(correction)])
+        pair_excess = np.concatenate([pair_excess, mean_excess[cells] + p * covariance / far_base + (
+            p * (p + 1) * variance_slope / (2 * far_base ** 2) + 2 * correction * covariance / far_base
+        ) / (1 + correction)])
+    
+    # Intensità negli istanti degli eventi: fondo più contributi dei genitori entro il nucleo (un solo exp per coppia)
+    log_base = np.log(c + delays)
+    contributions = np.exp(log_k + pair_log_productivity - p * log_base)
+    intensity = mu + np.bincount(data['children'], weights=contributions, minlength=data['n'])
+    inverse = 1 / intensity
+    weights = contributions * inverse[data['children']]
+    
+    # Integrale dell'intensità: il nucleo troncato si integra in forma chiusa su [0, min(T - t_i, troncamento)]
+    tail = c + data['spans']
+    head_term, tail_term = c ** -q, tail ** -q
+    integrals = (head_term - tail_term) / q
+    expected = productivity * integrals
+    
+    log_likelihood = np.log(intensity).sum() - mu * data['duration'] - expected.sum()
+    gradient = np.array([
+        mu * inverse.sum() - mu * data['duration'],
+        weights.sum() - expected.sum(),
+        weights @ pair_excess - expected @ data['excess'],
+        -p * c * (weights @ np.exp(-log_base)) - c * (productivity @ (tail ** -p - c ** -p)),
+        -q * (weights @ log_base) - productivity @ (np.log(tail) * tail_term - log_c * head_term - integrals)
+    ])
+    if far is not None:
+        # Derivate della correzione del secondo ordine in log c e log(p - 1)
+        far_weights = weights[len(data['parent_excess']):] / (1 + correction)
+        gradient[3] -= far_weights @ (2 * c * correction / far_base)
+        gradient[4] += far_weights @ (q * (2 * p + 1) * variance / (2 * far_base ** 2))
+    return -log_likelihood, -gradient
+
+def _minimize_bfgs(objective, x, max_iterations=ETAS_MAX_ITERATIONS, tolerance=1e-6):
+    """BFGS con ricerca lineare a backtracking (pochi parametri, gradiente analitico)"""
+    value, gradient = objective(x)
+    inverse_hessian = np.eye(len(x))
+    for iteration in range(max_iterations):
+        direction = -inverse_hessian @ gradient
+        slope = gradient @ direction
+        if slope >= 0:
+            inverse_hessian = np.eye(len(x))
+            direction, slope = -gradient, -(gradient @ gradient)
+        step = 1.0
+        while step > 1e-10:
+            candidate = x + step * direction
+            candidate_value, candidate_gradient = objective(candidate)
+            if np.isfinite(candidate_value) and candidate_value <= value + 1e-4 * step * slope:
+                break
+            step /= 2
+        else:
+            break
+        s, y = candidate - x, candidate_gradient - gradient
+        improvement = value - candidate_value
+        x, value, gradient = candidate, candidate_value, candidate_gradient
+        if s @ y > 1e-12:
+            rho = 1 / (s @ y)
+            identity = np.eye(len(x))
+            inverse_hessian = (identity - rho * np.outer(s, y)) @ inverse_hessian @ (identity - rho * np.outer(y, s)) + rho * np.outer(s, s)
+        if improvement <= 0 or np.abs(gradient).max() <= tolerance * (1 + abs(value)):
+            break
+    return x, value, iteration + 1
+
+def gutenberg_richter_b(magnitudes, min_magnitude, bin_width=0.1):
+    """b-value di Gutenberg–Richter a massima verosimiglianza (Aki–Utsu) sopra la magnitudo minima"""
+    return math.log10(math.e) / (float(np.mean(magnitudes)) - (min_magnitude - bin_width / 2))
+
+def fit_etas(times, magnitudes, duration, min_magnitude=ETAS_MIN_MAGNITUDE, kernel_days=ETAS_KERNEL_DAYS):
+    """Stima ETAS a massima verosimiglianza; tempi in giorni dall'inizio della finestra di durata 'duration'"""
+    times = np.asarray(times, dtype=np.float64)
+    magnitudes = np.asarray(magnitudes, dtype=np.float64)
+    if len(times) < ETAS_MIN_EVENTS:
+        return None
+    pairs = etas_pairs(times, kernel_days)
+    far = pairs['far']
+    data = {
+        'n': len(times),
+        'excess': magnitudes - min_magnitude,
+        'parent_excess': magnitudes[pairs['parents']] - min_magnitude,
+        'children': pairs['children'] if far is None else np.concatenate([pairs['children'], far['children']]),
+        'delays': pairs['delays'],
+        'far': far,
+        'spans': np.minimum(duration - times, kernel_days),
+        'duration': duration
+    }
+    if far is not None:
+        logger.info(
+            f"ETAS kernel beyond {pairs['far_field_days'] * 24:.1f} h aggregated in {far['n_bins']} cells "
+            f"({len(pairs['parents'])} exact + {len(far['children'])} cell pairs)"
+        )
+    
+    # Partenza: metà degli eventi dal fondo, rapporto di ramificazione 0.5, Omori con c = 0.01 giorni e p = 1.1
+    c, p, alpha = 0.01, 1.1, 1.0
+    omori_integral = (c ** (1 - p) - (c + kernel_days) ** (1 - p)) / (p - 1)
+    k = 0.5 / (omori_integral * np.mean(np.exp(alpha * data['excess'])))
+    start = np.array([math.log(0.5 * len(times) / duration), math.log(k), alpha, math.log(c), math.log(p - 1)])
+    start = np.clip(start, ETAS_BOUNDS[:, 0], ETAS_BOUNDS[:, 1])
+    
+    x, value, iterations = _minimize_bfgs(lambda x: etas_objective(x, data), start)
+    mu, k, alpha, c, p = math.exp(x[0]), math.exp(x[1]), float(x[2]), math.exp(x[3]), 1 + math.exp(x[4])
+    omori_integral = (c ** (1 - p) - (c + kernel_days) ** (1 - p)) / (p - 1)
+    return {
+        'mu': mu,
+        'k': k,
+        'alpha': alpha,
+        'c': c,
+        'p': p,
+        'kernel_days': kernel_days,
+        'far_field_days': pairs['far_field_days'],
+        'min_magnitude': min_magnitude,
+        'b_value': gutenberg_richter_b(magnitudes, min_magnitude),
+        'mean_productivity': float(k * np.mean(np.exp(alpha * data['excess']))),
+        'branching_ratio': float(k * np.mean(np.exp(alpha * data['excess'])) * omori_integral),
+        'log_likelihood': -float(value),
+        'events': len(times),
+        'duration': float(duration),
+        'pairs': len(data['children']),
+        'iterations': iterations
+    }
+
+def etas_omori_integral(model, delays):
+    """Integrale del nucleo di Omori troncato da 0 ai ritardi dati (giorni)"""
+    c, q = model['c'], model['p'] - 1
+    delays = np.minimum(delays, model['kernel_days'])
+    return (c ** -q - (c + delays) ** -q) / q
+
+def etas_forecast(model, times, magnitudes, horizon_hours=ETAS_HORIZON_HOURS, steps_per_hour=12):
+    """Eventi attesi ora per ora nelle prossime ore; 'times' in giorni prima di adesso (negativi)
+
+    Oltre agli eventi passati conta anche le repliche degli eventi attesi nell'orizzonte,
+    risolvendo l'equazione di rinnovo su passi di pochi minuti.
+    """
+    step = 1 / (24 * steps_per_hour)
+    edges = np.arange(horizon_hours * steps_per_hour + 1) * step
+    productivity = model['k'] * np.exp(model['alpha'] * (np.asarray(magnitudes, dtype=np.float64) - model['min_magnitude']))
+    
+    # Fondo più repliche degli eventi già avvenuti, per passo
+    cumulative = productivity @ etas_omori_integral(model, edges[None, :] - np.asarray(times, dtype=np.float64)[:, None])
+    direct = model['mu'] * step + np.diff(cumulative)
+    
+    # Repliche attese degli eventi futuri: gli eventi di un passo sono posti al suo centro
+    lags = etas_omori_integral(model, (np.arange(len(direct)) + 0.5) * step)
+    weights = model['mean_productivity'] * np.diff(lags, prepend=0.0)
+    expected = np.zeros(len(direct))
+    for i in range(len(direct)):
+        expected[i] = (direct[i] + expected[:i][::-1] @ weights[1:i + 1]) / (1 - min(weights[0], 0.99))
+    return expected.reshape(horizon_hours, steps_per_hour).sum(axis=1)
+
+def summarize_etas_forecast(model, hourly):
+    """Totale atteso e probabilità di superare le magnitudo di riferimento (Gutenberg–Richter)"""
+    expected = float(hourly.sum())
+    exceedance = {}
+    for magnitude in ETAS_FORECAST_MAGNITUDES:
+        rate = expected * 10 ** (-model['b_value'] * (magnitude - model['min_magnitude']))
+        exceedance[magnitude] = 1 - math.exp(-rate)
+    return {'expected': expected, 'exceedance': exceedance}
+
+def load_etas_catalog(region, start, end, min_magnitude=ETAS_MIN_MAGNITUDE):
+    """Eventi dell'archivio nella regione sopra la magnitudo minima, in ordine di tempo"""
+    frames = list(get_catalog_archive().iter_chunks(
+        start, end, min_magnitude=min_magnitude, max_distance=region['radius_km'],
+        center=(region['lat'], region['lon'])
+    ))
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _etas_model_cached(region_key, fit_end_ns):
+    fit_end = pd.Timestamp(fit_end_ns, tz='UTC')
+    time_range = get_catalog_archive().time_range()
+    if time_range is None:
+        return None
+    # La finestra non può iniziare prima della copertura dell'archivio, o il fondo risulterebbe sottostimato
+    fit_start = max(fit_end - pd.Timedelta(days=ETAS_FIT_DAYS), time_range[0])
+    df = load_etas_catalog(REGIONS[region_key], fit_start, fit_end)
+    if df is None:
+        return None
+    with stage_timer("etas_fit"):
+        times = (df['time'].array.asi8 - fit_start.value) / 86400e9
+        model = fit_etas(times, df['magnitude'].to_numpy(), (fit_end - fit_start) / pd.Timedelta(days=1))
+    if model is not None:
+        logger.info(
+            f"ETAS fit for {region_key}: {model['events']} events, {model['pairs']} pairs, "
+            f"{model['iterations']} iterations, branching ratio {model['branching_ratio']:.2f}"
+        )
+    return model
+
+def get_etas_model(region_key, now):
+    """Parametri ETAS della regione, ristimati una volta al giorno sull'anno precedente (o quanto coperto dall'archivio)"""
+    return _etas_model_cached(region_key, pd.Timestamp(now).floor('D').value)
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _etas_forecast_cached(region_key, now_ns, archive_version, _model):
+    now = pd.Timestamp(now_ns, tz='UTC')
+    df = load_etas_catalog(REGIONS[region_key], now - pd.Timedelta(days=_model['kernel_days']), now)
+    times = (df['time'].array.asi8 - now_ns) / 86400e9 if df is not None else np.empty(0)
+    magnitudes = df['magnitude'].to_numpy() if df is not None else np.empty(0)
+    hourly = etas_forecast(_model, times, magnitudes)
+    return {'hourly': hourly, **summarize_etas_forecast(_model, hourly)}
+
+def get_etas_forecast(region_key, now):
+    """Previsione ETAS delle prossime 24 ore, aggiornata al minuto o quando cambia l'archivio"""
+    model = get_etas_model(region_key, now)
+    if model is None:
+        return None, None
+    now = pd.Timestamp(now).floor('min')
+    archive_version = get_catalog_archive().version(now - pd.Timedelta(days=model['kernel_days']), now)
+    return model, _etas_forecast_cached(region_key, now.value, archive_version, model)
+
+class RateChangeDetector:
+    """CUSUM di Page sui tempi di interarrivo: O(1) per evento, segnala quando il tasso supera il fondo"""
+
+    def __init__(self):
+        self.last_time = None
+        self.events = 0
+        self.mean_interval = None
+        self.statistic = 0.0
+        self.excursion = deque(maxlen=CHANGEPOINT_EXCURSION_EVENTS)
+        self.episode = None
+        self.episodes = deque(maxlen=CHANGEPOINT_MAX_EPISODES)
+
+    def baseline_rate(self):
+        """Tasso di fondo in eventi al giorno (None durante il riscaldamento)"""
+        if self.events <= CHANGEPOINT_WARMUP_EVENTS or not self.mean_interval:
+            return None
+        return 1 / self.mean_interval
+
+    def episode_rate(self, time_ns):
+        """Tasso medio (eventi al giorno) dall'inizio dell'episodio in corso"""
+        return self.episode['events'] / max((time_ns - self.episode['onset']) / 86400e9, 1 / 1440)
+
+    def absorb_excursion(self):
+        """Aggiorna lentamente il fondo con gli intervalli dell'escursione chiusa (fermo mentre la statistica è positiva)"""
+        times = list(self.excursion)
+        for previous, current in zip(times, times[1:]):
+            self.mean_interval += ((current - previous) / 86400e9 - self.mean_interval) / CHANGEPOINT_BASELINE_EVENTS
+        self.excursion.clear()
+
+    def estimate_onset(self, baseline):
+        """Inizio più verosimile dell'aumento tra i tempi dell'escursione (GLR con tasso dopo il cambio stimato)"""
+        times = np.fromiter(self.excursion, dtype=np.int64)
+        detected = times[-1]
+        events = np.arange(len(times) - 1, 0, -1)
+        spans = np.maximum((detected - times[:-1]) / 86400e9, 1e-9)
+        rates = np.maximum(events / spans, baseline)
+        glr = events * np.log(rates / baseline) - (rates - baseline) * spans
+        # A parità di verosimiglianza si preferisce l'inizio più recente
+        best = len(glr) - 1 - int(np.argmax(glr[::-1]))
+        return int(times[best]), int(events[best])
+
+    def update(self, time_ns):
+        """Aggiorna la statistica con un nuovo evento; restituisce l'episodio se viene appena rilevato"""
+        previous, self.last_time = self.last_time, time_ns
+        self.events += 1
+        if previous is None:
+            return None
+        interval = (time_ns - previous) / 86400e9
+        baseline = self.baseline_rate()
+        if baseline is None:
+            # Media semplice degli intervalli finché il fondo non è stimato
+            self.mean_interval = interval if self.mean_interval is None else self.mean_interval + (interval - self.mean_interval) / (self.events - 1)
+            return None
+        
+        # Log-rapporto di verosimiglianza esponenziale: tasso moltiplicato per CHANGEPOINT_RATE_RATIO contro il fondo
+        ratio = CHANGEPOINT_RATE_RATIO
+        if self.episode is None:
+            if self.statistic == 0:
+                # Escursione chiusa senza allarme: i suoi intervalli entrano nel fondo, l'eventuale aumento parte da qui
+                self.absorb_excursion()
+                self.excursion.append(previous)
+            self.excursion.append(time_ns)
+        self.statistic = max(0.0, self.statistic + math.log(ratio) - (ratio - 1) * baseline * interval)
+        
+        if self.episode is not None:
+            self.episode['events'] += 1
+            self.episode['rate'] = self.episode_rate(time_ns)
+            # Limite superiore: la fine dell'episodio si vede presto quando il tasso rientra
+            self.statistic = min(self.statistic, CHANGEPOINT_THRESHOLD)
+            if self.statistic == 0:
+                self.episode['end'] = time_ns
+                self.episode = None
+            return None
+        
+        if self.statistic >= CHANGEPOINT_THRESHOLD:
+            onset, events = self.estimate_onset(baseline)
+            # Gli intervalli dell'episodio non entrano nel fondo
+            self.excursion.clear()
+            self.episode = {'onset': onset, 'detected': time_ns, 'end': None, 'baseline_rate': baseline, 'events': events}
+            self.episode['rate'] = self.episode_rate(time_ns)
+            self.episodes.append(self.episode)
+            return self.episode
+        return None
+
+class RateChangeMonitor:
+    """Rilevatori di cambio di tasso per regione, alimentati dal percorso di ingestione"""
+
+    def __init__(self, archive=None, reorder_seconds=CHANGEPOINT_REORDER_SECONDS):
+        self.lock = threading.Lock()
+        self.archive = archive
+        self.reorder_ns = int(reorder_seconds * 1e9)
+        self.detectors = {key: RateChangeDetector() for key in REGIONS}
+        self.cursor = None
+        self.latest = None
+        self.pending = None
+        if archive is not None:
+            with self.lock:
+                self.rebuild()
+
+    def feed(self, df):
+        """Passa gli eventi (in ordine di tempo) ai rilevatori delle regioni che li contengono"""
+        detections = []
+        df = df[df['magnitude'] >= CHANGEPOINT_MIN_MAGNITUDE]
+        if df.empty:
+            return detections
+        times = df['time'].array.asi8
+        latitudes = df['latitude'].to_numpy(dtype=np.float64)
+        longitudes = df['longitude'].to_numpy(dtype=np.float64)
+        for key, region in REGIONS.items():
+            inside = calculate_distances(latitudes, longitudes, region['lat'], region['lon']) <= region['radius_km']
+            detector = self.detectors[key]
+            for time_ns in times[inside].tolist():
+                episode = detector.update(time_ns)
+                if episode is not None:
+                    detections.append((key, dict(episode)))
+        self.cursor = int(times[-1]) if self.cursor is None else max(self.cursor, int(times[-1]))
+        return detections
+
+    def release(self, df):
+        """Accoda gli eventi nel buffer di riordino e passa ai rilevatori, in ordine, quelli usciti dalla finestra"""
+        if self.pending is not None:
+            df = pd.concat([self.pending, df], ignore_index=True)
+        if df.empty:
+            return []
+        df = df.sort_values('time', kind='stable')
+        times = df['time'].array.asi8
+        self.latest = int(times[-1]) if self.latest is None else max(self.latest, int(times[-1]))
+        ready = int(np.searchsorted(times, self.latest - self.reorder_ns, side='right'))
+        self.pending = df.iloc[ready:]
+        return self.feed(df.iloc[:ready])
+
+    def rebuild(self):
+        """Riparte dalla storia recente dell'archivio (avvio, eventi oltre la finestra di riordino o backfill)"""
+        time_range = self.archive.time_range()
+        self.detectors = {key: RateChangeDetector() for key in REGIONS}
+        self.cursor = None
+        self.latest = None
+        self.pending = None
+        if time_range is None:
+            return
+        history = self.archive.load(time_range[1] - pd.Timedelta(days=CHANGEPOINT_HISTORY_DAYS), time_range[1])
+        self.release(history[history['magnitude'] >= CHANGEPOINT_MIN_MAGNITUDE])
+        logger.info(f"Rate change detectors rebuilt from {len(history)} archived events")
+
+    def episode_spans(self):
+        """Intervalli (inizio, fine) degli episodi noti per regione; fine None se ancora in corso"""
+        return {key: [(e['onset'], e['end']) for e in detector.episodes] for key, detector in self.detectors.items()}
+
+    def new_episodes(self, known):
+        """Episodi dei rilevatori che non si sovrappongono a nessuno di quelli già noti"""
+        new = []
+        for key, detector in self.detectors.items():
+            for episode in detector.episodes:
+                end = math.inf if episode['end'] is None else episode['end']
+                if not any(onset <= end and (old_end is None or episode['onset'] <= old_end) for onset, old_end in known[key]):
+                    new.append((key, dict(episode)))
+        return new
+
+    def observe(self, df):
+        """Aggiorna i rilevatori con gli eventi nuovi: O(1) per evento, anche in ritardo entro la finestra di riordino"""
+        df = df[df['magnitude'] >= CHANGEPOINT_MIN_MAGNITUDE]
+        if df.empty:
+            return []
+        with self.lock:
+            if self.cursor is not None and df['time'].array.asi8.min() < self.cursor:
+                if self.archive is not None:
+                    # Più vecchio della finestra di riordino: cambia intervalli già visti, si riparte dall'archivio
+                    known = self.episode_spans()
+                    count_metric("rate_change_rebuilds_total")
+                    logger.info(f"Rate change detectors: event older than the {self.reorder_ns / 1e9:.0f}s reorder window")
+                    self.rebuild()
+                    detections = self.new_episodes(known)
+                else:
+                    detections = self.release(df[df['time'].array.asi8 >= self.cursor])
+            else:
+                detections = self.release(df)
+        for key, episode in detections:
+            count_metric("rate_changes_detected_total")
+            logger.warning(
+                f"Rate increase in {key} since {pd.Timestamp(episode['onset'], tz='UTC')}: "
+                f"baseline {episode['baseline_rate']:.2f} events/day"
+            )
+        return detections
+
+    def status(self, region_key):
+        """Stato del rilevatore di una regione, copiato per l'uso fuori dal lock"""
+        with self.lock:
+            detector = self.detectors[region_key]
+            return {
+                'statistic': detector.statistic,
+                'baseline_rate': detector.baseline_rate(),
+                'active': dict(detector.episode) if detector.episode is not None else None,
+                'episodes': [dict(episode) for episode in detector.episodes]
+            }
+
+    def markers(self, region_key):
+        """Episodi come tuple (inizio, rilevamento, fine) in ns, usabili come chiave di cache"""
+        return tuple((e['onset'], e['detected'], e['end']) for e in self.status(region_key)['episodes'])
+
+@st.cache_resource(show_spinner=False)
+def get_rate_change_monitor():
+    """Rilevatori di cambio di tasso dei dati live, condivisi dal processo"""
+    return RateChangeMonitor(get_catalog_archive())
+
+def get_active_rate_monitor():
+    """Rilevatori della sessione: quelli del replay se attivo, altrimenti quelli live"""
+    replay = st.session_state.get('replay')
+    if replay is not None:
+        return replay['rate_changes']
+    return get_rate_change_monitor()
+
+def add_rate_change_markers(fig, markers, start, end):
+    """Evidenzia sulla timeline gli episodi di aumento del tasso nella finestra mostrata"""
+    for onset, detected, finished in markers:
+        onset = pd.Timestamp(onset, tz='UTC')
+        finished = pd.Timestamp(finished, tz='UTC') if finished is not None else end
+        if finished < start or onset > end:
+            continue
+        fig.add_vrect(
+            x0=max(onset, start), x1=finished,
+            fillcolor='rgba(255, 107, 107, 0.15)', layer="below", line_width=0,
+            annotation_text="📈 aumento tasso", annotation_position="top left"
+        )
+        if detected is not None and start <= pd.Timestamp(detected, tz='UTC') <= end:
+            fig.add_vline(x=pd.Timestamp(detected, tz='UTC'), line_dash="dot", line_color='#ff6b6b', line_width=1)
+    return fig
+
+def render_etas_forecast(region_key, now):
+    """Tassi attesi ETAS per le prossime 24 ore, sotto il sistema di allerta"""
+    try:
+        model, forecast = get_etas_forecast(region_key, now)
+    except Exception as e:
+        logger.error(f"ETAS forecast failed: {e}")
+        st.error(f"Errore previsione ETAS: {str(e)}")
+        return
+    if forecast is None:
+        st.info(
+            f"📈 Previsione ETAS non disponibile: servono almeno {ETAS_MIN_EVENTS} eventi "
+            f"M≥{ETAS_MIN_MAGNITUDE:.1f} in archivio nell'ultimo anno."
+        )
+        return
+    
+    columns = st.columns(2 + len(ETAS_FORECAST_MAGNITUDES))
+    columns[0].metric("📈 Tasso prossima ora", f"{forecast['hourly'][0]:.2f} ev/h")
+    columns[1].metric(f"🔮 Attesi 24h (M≥{model['min_magnitude']:.1f})", f"{forecast['expected']:.1f}")
+    for column, (magnitude, probability) in zip(columns[2:], forecast['exceedance'].items()):
+        column.metric(f"🎲 P(M≥{magnitude:.0f}) in 24h", f"{probability:.1%}")
+    st.caption(
+        f"Modello ETAS stimato su {model['events']} eventi in {model['duration']:.0f} giorni: μ {model['mu']:.2f}/giorno, "
+        f"α {model['alpha']:.2f}, c {model['c'] * 1440:.1f} min, p {model['p']:.2f}, b {model['b_value']:.2f}, "
+        f"rapporto di ramificazione {model['branching_ratio']:.2f} • nucleo troncato a {model['kernel_days']:.1f} giorni"
+        + (f", aggregato per celle oltre {model['far_field_days'] * 24:.1f} h" if model['far_field_days'] is not None else "")
+    )
+
+def write_csv_export(chunks, sink):
+    """Scrive i blocchi come CSV compresso gzip"""
+    rows = 0
+    with gzip.GzipFile(fileobj=sink, mode='wb') as gz:
+        for i, chunk in enumerate(chunks):
+            chunk = chunk.assign(time=chunk['time'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+            gz.write(chunk.to_csv(index=False, header=(i == 0)).encode('utf-8'))
+            rows += len(chunk)
+        if rows == 0:
+            gz.write((','.join(EXPORT_COLUMNS) + '\n').encode('utf-8'))
+    return rows
+
+def get_arrow_export_schema():
+    """Schema Arrow comune a Parquet e Arrow IPC"""
+    import pyarrow as pa
+    return pa.schema([
+        ('time', pa.timestamp('ns', tz='UTC')),
+        ('magnitude', pa.float64()),
+        ('depth', pa.float64()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('distance_km', pa.float64()),
+        ('place', pa.string()),
+        ('event_id', pa.string())
+    ])
+
+def write_parquet_export(chunks, sink):
+    """Scrive i blocchi come row group di un file Parquet"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = get_arrow_export_schema()
+    rows = 0
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+def write_arrow_export(chunks, sink):
+    """Scrive i blocchi come record batch di un file Arrow IPC"""
+    import pyarrow as pa
+    schema = get_arrow_export_schema()
+    rows = 0
+    with pa.ipc.new_file(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+def write_quakeml_export(chunks, sink):
+    """Scrive i blocchi come documento QuakeML 1.2 (BED)"""
+    sink.write(
+        b'<?xml version="1.0" encoding="UTF-8"?>\n'
+        b'<q:quakeml xmlns="http://quakeml.org/xmlns/bed/1.2" xmlns:q="http://quakeml.org/xmlns/quakeml/1.2">\n'
+        b'  <eventParameters publicID="smi:local/campi-flegrei-monitor/export">\n'
+    )
+    rows = 0
+    for chunk in chunks:
+        times = chunk['time'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        events = []
+        for event_time, row in zip(times, chunk.itertuples(index=False)):
+            event_id = escape(str(row.event_id))
+            events.append(
+                f'    <event publicID="smi:local/event/{event_id}">\n'
+                f'      <description><text>{escape(str(row.place))}</text><type>region name</type></description>\n'
+                f'      <origin publicID="smi:local/origin/{event_id}">\n'
+                f'        <time><value>{event_time}</value></time>\n'
+                f'        <latitude><value>{row.latitude:.5f}</value></latitude>\n'
+                f'        <longitude><value>{row.longitude:.5f}</value></longitude>\n'
+                f'        <depth><value>{row.depth * 1000:.0f}</value></depth>\n'
+                f'      </origin>\n'
+                f'      <magnitude publicID="smi:local/magnitude/{event_id}">\n'
+                f'        <mag><value>{row.magnitude:.2f}</value></mag>\n'
+                f'        <originID>smi:local/origin/{event_id}</originID>\n'
+                f'      </magnitude>\n'
+                f'      <preferredOriginID>smi:local/origin/{event_id}</preferredOriginID>\n'
+                f'      <preferredMagnitudeID>smi:local/magnitude/{event_id}</preferredMagnitudeID>\n'
+                f'    </event>\n'
+            )
+        sink.write(''.join(events).encode('utf-8'))
+        rows += len(chunk)
+    sink.write(b'  </eventParameters>\n</q:quakeml>\n')
+    return rows
+
+def export_catalog(fmt, sink, start, end, min_magnitude=None, max_depth=None, max_distance=None,
+                   center=(CAMPI_FLEGREI_LAT, CAMPI_FLEGREI_LON)):
+    """Esporta dall'archivio l'intervallo filtrato nel formato richiesto, a blocchi"""
+    writers = {
+        'csv.gz': write_csv_export,
+        'parquet': write_parquet_export,
+        'arrow': write_arrow_export,
+        'xml': write_quakeml_export
+    }
+    if fmt not in writers:
+        raise ValueError(f"Formato export non supportato: {fmt}")
+    
+    chunks = get_catalog_archive().iter_chunks(start, end, min_magnitude, max_depth, max_distance, center)
+    with stage_timer(f"export_{fmt.replace('.', '_')}"):
+        rows = writers[fmt](chunks, sink)
+    count_metric("exported_events_total", rows)
+    logger.info(f"Exported {rows} events as {fmt}")
+    return rows
+
+def create_export_file(fmt, file_name, start, end, min_magnitude=None, max_depth=None, max_distance=None,
+                       center=(CAMPI_FLEGREI_LAT, CAMPI_FLEGREI_LON), directory=EXPORT_DIR):
+    """Scrive l'export in una cartella dedicata e non indovinabile, servita come file statico"""
+    # Il nome della cartella porta l'istante di creazione, usato per la pulizia per età
+    token = f"{utc_now_ns()}_{secrets.token_urlsafe(16)}"
+    folder = os.path.join(directory, token)
+    os.makedirs(folder)
+    path = os.path.join(folder, file_name)
+    try:
+        with open(path, 'wb') as sink:
+            rows = export_catalog(fmt, sink, start, end, min_magnitude, max_depth, max_distance, center)
+    except Exception:
+        shutil.rmtree(folder, ignore_errors=True)
+        raise
+    return {
+        'path': path,
+        'url': f"app/static/exports/{token}/{file_name}",
+        'rows': rows,
+        'size': os.path.getsize(path),
+        'file_name': file_name
+    }
+
+def remove_export_file(export_file):
+    """Elimina un export e la sua cartella"""
+    shutil.rmtree(os.path.dirname(export_file['path']), ignore_errors=True)
+
+def cleanup_exports(max_age=EXPORT_MAX_AGE_SECONDS, directory=EXPORT_DIR):
+    """Rimuove gli export più vecchi di max_age secondi, anche quelli di sessioni abbandonate"""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = utc_now_ns() - int(max_age * 1e9)
+    removed = 0
+    for entry in os.scandir(directory):
+        created, _, _ = entry.name.partition('_')
+        if entry.is_dir() and (not created.isdigit() or int(created) < cutoff):
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} expired exports")
+    return removed
+
+def render_export_panel(period_start, period_end, min_magnitude, max_depth, max_distance, center):
+    """Pannello di export a blocchi dall'archivio locale"""
+    with st.expander("💾 Esporta Dati", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            format_label = st.selectbox("Formato:", list(EXPORT_FORMATS.keys()), key="export_format")
+        with col2:
+            dates = st.date_input(
+                "Intervallo:",
+                value=(period_start.date(), (period_end - pd.Timedelta(seconds=1)).date()),
+                key="export_dates"
+            )
+        st.caption("I filtri di magnitudine, profondità e distanza della sidebar vengono applicati all'export.")
+        
+        if st.button("⚙️ Prepara Export", use_container_width=True):
+            if not (isinstance(dates, (list, tuple)) and len(dates) == 2):
+                st.warning("⚠️ Selezionare data iniziale e finale.")
+                return
+            fmt, _ = EXPORT_FORMATS[format_label]
+            previous = st.session_state.pop('export_file', None)
+            if previous is not None:
+                remove_export_file(previous)
+            cleanup_exports()
+            try:
+                start = pd.Timestamp(dates[0], tz='UTC')
+                end = pd.Timestamp(dates[1], tz='UTC') + pd.Timedelta(days=1)
+                st.session_state.export_file = create_export_file(
+                    fmt, f"campi-flegrei-monitor_{dates[0]:%Y%m%d}-{dates[1]:%Y%m%d}.{fmt}",
+                    start, end, min_magnitude, max_depth, max_distance, center
+                )
+            except Exception as e:
+                st.error(f"Errore export: {str(e)}")
+        
+        # Il file non passa dalla sessione: il browser lo scarica in streaming dal serving statico
+        export_file = st.session_state.get('export_file')
+        if export_file is None or not os.path.exists(export_file['path']):
+            return
+        size_mb = export_file['size'] / 1e6
+        if not st.get_option("server.enableStaticServing"):
+            st.info("ℹ️ Per scaricare dalla dashboard abilitare server.enableStaticServing; "
+                    "in alternativa usare `python campi_flegrei_cli.py export`.")
+        elif export_file['size'] > EXPORT_STATIC_MAX_BYTES:
+            st.info(f"ℹ️ Export di {size_mb:.0f} MB oltre il limite del serving statico: "
+                    "usare `python campi_flegrei_cli.py export`.")
+        else:
+            st.markdown(
+                f'<a class="export-download" href="{escape(export_file["url"])}" '
+                f'download="{escape(export_file["file_name"])}">📥 Scarica {escape(export_file["file_name"])} '
+                f'({export_file["rows"]} eventi, {size_mb:.1f} MB)</a>',
+                unsafe_allow_html=True
+            )
+
+class RateLimiter:
+    """Limita la frequenza delle richieste condivisa tra più worker"""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        """Attende il prossimo slot libero"""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def plan_backfill_chunks(start, end, chunk_days=BACKFILL_CHUNK_DAYS):
+    """Divide [start, end) in blocchi allineati a una griglia fissa, così i checkpoint restano validi"""
+    step = pd.Timedelta(days=chunk_days).value
+    start_ns, end_ns = to_utc_ns(start), to_utc_ns(end)
+    chunks = []
+    boundary = start_ns
+    while boundary < end_ns:
+        next_boundary = min((boundary // step + 1) * step, end_ns)
+        chunks.append((pd.Timestamp(boundary, tz='UTC'), pd.Timestamp(next_boundary, tz='UTC')))
+        boundary = next_boundary
+    return chunks
+
+_backfill_sessions = threading.local()
+
+def fetch_catalog_range(start, end, limiter=None, timeout=60, retries=3, box=None):
+    """Scarica gli eventi di un intervallo, suddividendolo se supera il limite della query"""
+    box = box or get_ingestion_boxes()[0]
+    if not hasattr(_backfill_sessions, 'session'):
+        _backfill_sessions.session = requests.Session()
+    params = {
+        'format': 'geojson',
+        'starttime': fdsn_time(start),
+        'endtime': fdsn_time(end),
+        **box_params(box),
+        'orderby': 'time-asc',
+        'limit': BACKFILL_QUERY_LIMIT
+    }
+    
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.wait()
+        try:
+            with stage_timer("backfill_http"):
+                response = _backfill_sessions.session.get(INGV_EVENT_URL, params=params, timeout=timeout)
+            count_metric("http_requests_total")
+            count_metric("http_response_bytes_total", len(response.content))
+            if response.status_code == 204:
+                return normalize_catalog(pd.DataFrame())
+            response.raise_for_status()
+            features = response.json().get('features', [])
+            break
+        except (requests.RequestException, ValueError) as e:
+            count_metric("http_errors_total")
+            if attempt == retries:
+                raise
+            logger.warning(f"Backfill request failed ({e}), retrying")
+            time.sleep(2 ** attempt)
+    
+    if len(features) >= BACKFILL_QUERY_LIMIT and pd.Timestamp(end) - pd.Timestamp(start) > pd.Timedelta(minutes=1):
+        middle = pd.Timestamp(start) + (pd.Timestamp(end) - pd.Timestamp(start)) / 2
+        return pd.concat([
+            fetch_catalog_range(start, middle, limiter, timeout, retries, box),
+            fetch_catalog_range(middle, end, limiter, timeout, retries, box)
+        ], ignore_index=True)
+    return normalize_catalog(parse_earthquake_features(features))
+
+def backfill_chunk(chunk_start, chunk_end, limiter, archive, stop_event=None):
+    """Scarica un blocco, lo scrive nell'archivio e ne registra il checkpoint"""
+    if stop_event is not None and stop_event.is_set():
+        return None
+    df = pd.concat(
+        [fetch_catalog_range(chunk_start, chunk_end, limiter, box=box) for box in get_ingestion_boxes()],
+        ignore_index=True
+    )
+    df = normalize_catalog(df)
+    archive.upsert(df)
+    rows = len(df)
+    # I blocchi che arrivano a ridosso di oggi restano aperti e vengono riscaricati
+    if chunk_end < utc_now() - pd.Timedelta(days=1):
+        archive.mark_backfill_chunk(chunk_start, chunk_end, rows)
+    return rows
+
+def run_backfill(start, end, chunk_days=BACKFILL_CHUNK_DAYS, workers=BACKFILL_WORKERS,
+                 rate=BACKFILL_RATE, progress=None, stop_event=None, archive=None):
+    """Backfill parallelo e riprendibile di un intervallo storico nell'archivio locale"""
+    archive = archive or get_catalog_archive()
+    chunks = plan_backfill_chunks(start, end, chunk_days)
+    completed = archive.completed_backfill_chunks()
+    pending = [c for c in chunks if (c[0].value, c[1].value) not in completed]
+    limiter = RateLimiter(rate)
+    summary = {'chunks': len(chunks), 'skipped': len(chunks) - len(pending), 'done': 0, 'failed': 0, 'events': 0}
+    logger.info(f"Backfill {start} → {end}: {len(pending)}/{len(chunks)} chunks to fetch")
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as pool:
+        futures = {
+            pool.submit(backfill_chunk, chunk_start, chunk_end, limiter, archive, stop_event): (chunk_start, chunk_end)
+            for chunk_start, chunk_end in pending
+        }
+        for future in as_completed(futures):
+            chunk_start, chunk_end = futures[future]
+            try:
+                rows = future.result()
+                if rows is not None:
+                    summary['done'] += 1
+                    summary['events'] += rows
+            except Exception as e:
+                summary['failed'] += 1
+                logger.error(f"Backfill chunk {chunk_start:%Y-%m-%d} → {chunk_end:%Y-%m-%d} failed: {e}")
+            if progress is not None:
+                progress(summary)
+    
+    count_metric("backfill_events_total", summary['events'])
+    return summary
+
+class BackfillJob:
+    """Backfill eseguito in background per la dashboard"""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.stop_event = threading.Event()
+        self.summary = {'chunks': len(plan_backfill_chunks(start, end)), 'skipped': 0, 'done': 0, 'failed': 0, 'events': 0}
+        self.finished = False
+        self.thread = threading.Thread(target=self.run, name="backfill-job", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.summary = run_backfill(self.start, self.end, progress=self.update, stop_event=self.stop_event)
+        except Exception as e:
+            logger.error(f"Backfill job failed: {e}")
+        finally:
+            self.finished = True
+
+    def update(self, summary):
+        self.summary = dict(summary)
+
+    def progress(self):
+        """Frazione di blocchi completati (0-1)"""
+        summary = self.summary
+        if not summary['chunks']:
+            return 1.0
+        return min(1.0, (summary['skipped'] + summary['done'] + summary['failed']) / summary['chunks'])
+
+@st.cache_resource(show_spinner=False)
+def get_backfill_jobs():
+    """Registro process-wide dei job di backfill avviati dalla dashboard"""
+    return {}
+
+@st.cache_resource(ttl=300, max_entries=8, show_spinner=False)
+def get_archive_catalog_cached(start_ns, end_ns, archive_version):
+    """Catalogo compatto di un intervallo personalizzato letto dall'archivio"""
+    _fetch_state.cache_miss = True
+    with stage_timer("archive_load"):
+        df = get_catalog_archive().load(pd.Timestamp(start_ns, tz='UTC'), pd.Timestamp(end_ns, tz='UTC'))
+    return compact_catalog(df)
+
+def get_archive_range_data(start, end):
+    """Wrapper per il caricamento di un intervallo personalizzato dall'archivio"""
+    _fetch_state.cache_miss = False
+    # La chiave cambia solo se un change set tocca l'intervallo richiesto
+    archive_version = get_catalog_archive().version(start, end)
+    df = get_archive_catalog_cached(to_utc_ns(start), to_utc_ns(end), archive_version)
+    count_metric("catalog_cache_misses_total" if _fetch_state.cache_miss else "catalog_cache_hits_total")
+    set_gauge_metric("catalog_memory_bytes", catalog_memory_bytes(df))
+    return df
+
+def render_custom_range_selector():
+    """Selezione di un intervallo personalizzato servito dall'archivio locale"""
+    today = utc_now().normalize()
+    dates = st.sidebar.date_input(
+        "Intervallo (UTC):",
+        value=((today - pd.Timedelta(days=365)).date(), today.date()),
+        min_value=BACKFILL_MIN_DATE.date(),
+        max_value=today.date(),
+        key="custom_range"
+    )
+    if not (isinstance(dates, (list, tuple)) and len(dates) == 2):
+        dates = (dates[0] if isinstance(dates, (list, tuple)) else dates,) * 2
+    start = pd.Timestamp(dates[0], tz='UTC')
+    end = pd.Timestamp(dates[1], tz='UTC') + pd.Timedelta(days=1)
+    
+    jobs = get_backfill_jobs()
+    job = jobs.get((start.value, end.value))
+    if job is not None and not job.finished:
+        st.sidebar.progress(job.progress(), text=f"⬇️ Backfill in corso: {job.summary['events']} eventi")
+    else:
+        if job is not None:
+            st.sidebar.caption(f"✅ Ultimo backfill: {job.summary['events']} eventi, {job.summary['failed']} blocchi falliti")
+        if st.sidebar.button("⬇️ Scarica intervallo nell'archivio", use_container_width=True):
+            jobs[(start.value, end.value)] = BackfillJob(start, end)
+            st.rerun()
+    return start, end
+
+def get_earthquake_data(days_back, box):
+    """Catalogo del periodo con la sua età: {'catalog', 'fetched_at', 'error'}"""
+    with stage_timer("fetch"):
+        return get_snapshot_store().get(days_back, box)
+
+def combine_catalogs(frames):
+    """Unisce i cataloghi di più riquadri eliminando gli eventi duplicati"""
+    frames = [df for df in frames if df is not None and not df.empty]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(subset='event_id', keep='last')
+    df = df.sort_values('time', kind='stable').reset_index(drop=True)
+    return add_release_prefix(df).astype(COMPACT_DTYPES)
+
+def region_catalog(df, region):
+    """Catalogo con la distanza calcolata dal centro della regione attiva"""
+    if df.empty or (region['lat'], region['lon']) == (CAMPI_FLEGREI_LAT, CAMPI_FLEGREI_LON):
+        return df
+    return df.assign(distance_km=calculate_distances(df['latitude'], df['longitude'], region['lat'], region['lon']).astype('float32'))
+
+def summarize_regions(df, now):
+    """Eventi nelle ultime 24 ore, magnitudo massima e livello di allerta per ogni regione"""
+    recent = catalog_window(df, now - pd.Timedelta(hours=24), now) if not df.empty else df
+    summary = {}
+    for key, region in REGIONS.items():
+        if recent.empty:
+            count, max_magnitude = 0, 0.0
+        else:
+            inside = calculate_distances(recent['latitude'], recent['longitude'], region['lat'], region['lon']) <= region['radius_km']
+            count = int(inside.sum())
+            max_magnitude = float(recent['magnitude'][inside].max()) if count else 0.0
+        thresholds = region['alert']
+        if max_magnitude >= thresholds['high_magnitude']:
+            level = "🔴"
+        elif max_magnitude >= thresholds['medium_magnitude'] or count >= ACTIVE_EVENTS_PER_DAY:
+            level = "🟡"
+        else:
+            level = "🟢"
+        summary[key] = {'count': count, 'max_magnitude': max_magnitude, 'level': level}
+    return summary
+
+@st.cache_resource(show_spinner=False)
+def get_page_io_pool():
+    """Pool condiviso dal processo per le richieste di rete della pagina"""
+    return ThreadPoolExecutor(max_workers=PAGE_IO_WORKERS, thread_name_prefix="page-io")
+
+def fetch_page_io(jobs, timeout=PAGE_IO_TIMEOUT):
+    """Esegue in parallelo le richieste della pagina ({nome: (funzione, *argomenti)}) entro timeout secondi"""
+    if not jobs:
+        return {}
+    pool = get_page_io_pool()
+    with stage_timer("page_io"):
+        futures = {name: pool.submit(func, *args) for name, (func, *args) in jobs.items()}
+        done, _ = wait(futures.values(), timeout=timeout)
+    
+    results = {}
+    for name, future in futures.items():
+        if future not in done:
+            # Il job in ritardo non viene atteso: finisce nel pool e aggiorna lo store per il rerun successivo
+            logger.warning(f"I/O job '{name}' exceeded the {timeout}s page budget")
+            count_metric("io_timeouts_total")
+            results[name] = None
+        elif future.exception() is not None:
+            logger.error(f"I/O job '{name}' failed: {future.exception()}")
+            results[name] = None
+        else:
+            results[name] = future.result()
+    return results
+
+def load_catalog_file(uploaded_file):
+    """Carica un catalogo salvato da file CSV, Parquet o GeoJSON FDSN"""
+    name = getattr(uploaded_file, 'name', str(uploaded_file)).lower()
+    if name.endswith('.csv'):
+        df = pd.read_csv(uploaded_file)
+    elif name.endswith('.csv.gz'):
+        df = pd.read_csv(uploaded_file, compression='gzip')
+    elif name.endswith('.parquet'):
+        df = pd.read_parquet(uploaded_file)
+    else:
+        if hasattr(uploaded_file, 'read'):
+            data = json.load(uploaded_file)
+        else:
+            with open(uploaded_file, encoding='utf-8') as f:
+                data = json.load(f)
+        df = parse_earthquake_features(data.get('features', []))
+    
+    missing = [col for col in ['time', 'magnitude', 'latitude', 'longitude'] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Colonne mancanti nel catalogo: {', '.join(missing)}")
+    return normalize_catalog(df)
+
+def get_app_now():
+    """Restituisce l'istante corrente dell'app (UTC), guidato dal replay se attivo"""
+    replay = st.session_state.get('replay')
+    if replay is not None:
+        return get_replay_now(replay)
+    return utc_now()
+
+def format_local_time(timestamp, fmt):
+    """Formatta un istante UTC nel fuso orario locale"""
+    return pd.Timestamp(timestamp).floor('s').to_pydatetime().astimezone().strftime(fmt)
+
+def start_replay(catalog, start, end, factor):
+    """Avvia il replay di un catalogo salvato con il fattore di accelerazione dato"""
+    catalog = catalog_window(catalog, start, end).reset_index(drop=True)
+    st.session_state.replay = {
+        'catalog': catalog,
+        'times_ns': catalog['time'].array.asi8,
+        'start': pd.Timestamp(start),
+        'end': pd.Timestamp(end),
+        'factor': float(factor),
+        'wall_start_ns': utc_now_ns(),
+        'cursor': 0,
+        'events': compact_catalog(catalog.iloc[:0]),
+        # Il replay arriva già in ordine di tempo: nessuna finestra di riordino
+        'rate_changes': RateChangeMonitor(reorder_seconds=0)
+    }
+    logger.info(f"Replay started: {len(catalog)} events from {start} at {factor}x")
+
+def stop_replay():
+    """Interrompe il replay e torna ai dati live"""
+    st.session_state.pop('replay', None)
+
+def get_replay_now(replay):
+    """Calcola l'istante virtuale del replay dal tempo reale trascorso"""
+    elapsed_ns = (utc_now_ns() - replay['wall_start_ns']) * replay['factor']
+    return min(replay['start'] + pd.Timedelta(int(elapsed_ns), unit='ns'), replay['end'])
+
+def advance_replay(replay, now):
+    """Fa passare nel percorso di ingestione gli eventi arrivati fino a 'now'"""
+    cursor = int(np.searchsorted(replay['times_ns'], now.value, side='right'))
+    if cursor > replay['cursor']:
+        batch = replay['catalog'].iloc[replay['cursor']:cursor]
+        batch = ingest_catalog(batch, archive=False)
+        replay['rate_changes'].observe(batch)
+        replay['events'] = append_catalog(replay['events'], batch)
+        replay['cursor'] = cursor
+    return replay['events']
+
+def iter_replay_batches(catalog, start, end, factor, tick_seconds=1.0):
+    """Genera in modo deterministico (istante virtuale, batch) come farebbe il replay"""
+    times_ns = catalog['time'].array.asi8
+    step = pd.Timedelta(seconds=tick_seconds * factor)
+    now = pd.Timestamp(start)
+    cursor = int(np.searchsorted(times_ns, now.value, side='left'))
+    while now < end:
+        now = min(now + step, pd.Timestamp(end))
+        next_cursor = int(np.searchsorted(times_ns, now.value, side='right'))
+        yield now, catalog.iloc[cursor:next_cursor]
+        cursor = next_cursor
+
+def run_replay_load(catalog, start, end, factor, tick_seconds=1.0):
+    """Spinge un replay nel percorso di ingestione alla massima velocità e misura il throughput"""
+    events = 0
+    ticks = 0
+    started = time.perf_counter()
+    for _, batch in iter_replay_batches(catalog, start, end, factor, tick_seconds):
+        events += len(ingest_catalog(batch, archive=False))
+        ticks += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'events': events,
+        'ticks': ticks,
+        'seconds': elapsed,
+        'events_per_second': events / elapsed if elapsed > 0 else 0.0
+    }
+
+def get_replay_refresh_delay(replay, now):
+    """Ritardo di refresh necessario per far avanzare il replay (None se concluso)"""
+    if replay is not None and now < replay['end']:
+        return 1.0
+    return None
+
+def classify_activity(df, now):
+    """Livello di attività sismica recente: 'swarm', 'active' o 'quiet'"""
+    if df.empty:
+        return 'quiet'
+    if len(catalog_window(df, now - pd.Timedelta(hours=1), now)) >= SWARM_EVENTS_PER_HOUR:
+        return 'swarm'
+    if len(catalog_window(df, now - pd.Timedelta(hours=24), now)) >= ACTIVE_EVENTS_PER_DAY:
+        return 'active'
+    return 'quiet'
+
+def track_interaction():
+    """Aggiorna l'ultima interazione, ignorando i rerun avviati dallo scheduler"""
+    if not st.session_state.pop('scheduled_rerun', False):
+        st.session_state.last_interaction = time.time()
+
+def plan_refresh(df, now, replay, live, seismo_enabled):
+    """Cadenze di refresh per sismografo e pagina in base ad attività e inattività"""
+    idle = time.time() - st.session_state.last_interaction > IDLE_AFTER_SECONDS
+    level = 'idle' if idle else classify_activity(df, now)
+    profile = REFRESH_PROFILES[level]
+    page = profile['page'] if live else None
+    # Il replay avanza solo con rerun completi della pagina
+    replay_delay = get_replay_refresh_delay(replay, now)
+    if replay_delay:
+        page = replay_delay
+    return {
+        'level': level,
+        'seismo': profile['seismo'] if seismo_enabled else None,
+        'page': page
+    }
 
-@st.cache_data(ttl=300, show_spinner=False)
-def get_earthquake_data_cached(days_back, cache_key):
-    """Recupera dati terremoti dall'API INGV con cache che considera il periodo"""
-    try:
-        start_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%dT%H:%M:%S')
-        end_date = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
-        
-        url = "http://webservices.ingv.it/fdsnws/event/1/query"
-        params = {
-            'format': 'geojson',
-            'starttime': start_date,
-            'endtime': end_date,
-            'minlatitude': CAMPI_FLEGREI_LAT - 0.3,
-            'maxlatitude': CAMPI_FLEGREI_LAT + 0.3,
-            'minlongitude': CAMPI_FLEGREI_LON - 0.3,
-            'maxlongitude': CAMPI_FLEGREI_LON + 0.3,
-            'minmagnitude': 0.0,
-            'limit': 1000
-        }
-        
-        logger.info(f"Fetching earthquake data for {days_back} days")
-        response = requests.get(url, params=params, timeout=15)
-        response.raise_for_status()
+def schedule_page_refresh(delay):
+    """Pianifica un rerun completo senza bloccare il thread dello script"""
+    if not delay:
+        return
+    st.session_state.page_refresh_due = time.time() + delay
+
+    @st.fragment(run_every=delay)
+    def page_refresh_timer():
+        if time.time() >= st.session_state.get('page_refresh_due', float('inf')):
+            st.session_state.scheduled_rerun = True
+            st.rerun(scope="app")
+
+    page_refresh_timer()
+
+def render_seismograph_panel(sensitivity, title, key, with_stats, show_spectrogram):
+    """Pannello del sismografo, rieseguito da solo come fragment"""
+    st.markdown('<div class="seismo-container">', unsafe_allow_html=True)
+    st.subheader(title)
+    
+    snapshot = update_seismograph()
+    with stage_timer("figure_seismograph"):
+        figures = get_seismograph_figures(snapshot, sensitivity, st.session_state.dark_mode, show_spectrogram) if snapshot else {}
+        fig_seismo = figures.get('trace') or create_themed_seismograph_plot(None, sensitivity, st.session_state.dark_mode)
+    with stage_timer("render_seismograph"):
+        st.plotly_chart(fig_seismo, use_container_width=True, key=key)
+    
+    if show_spectrogram:
+        fig_spectrogram = figures.get('spectrogram') or create_spectrogram_plot(None, sensitivity, st.session_state.dark_mode)
+        st.plotly_chart(fig_spectrogram, use_container_width=True, key=f"{key}_spectrogram")
+    
+    # Statistiche sismografo
+    if with_stats and snapshot is not None and len(snapshot['data']):
+        samples = snapshot['data']
+        col_s1, col_s2, col_s3, col_s4 = st.columns(4)
         
-        data = response.json()
+        with col_s1:
+            current_amp = samples[-1] * sensitivity
+            st.metric("📊 Ampiezza Attuale", f"{current_amp:.4f}")
         
-        if not data.get('features'):
-            return pd.DataFrame()
+        with col_s2:
+            max_amp = np.abs(samples).max() * sensitivity
+            st.metric("📈 Ampiezza Massima", f"{max_amp:.4f}")
         
-        earthquakes = []
-        for feature in data['features']:
-            try:
-                props = feature['properties']
-                coords = feature['geometry']['coordinates']
-                
-                if not all(k in props for k in ['time', 'mag']) or len(coords) < 2:
-                    continue
-                
-                time_str = props['time']
-                if time_str.endswith('Z'):
-                    time_str = time_str.replace('Z', '+00:00')
-                
-                earthquake = {
-                    'time': datetime.fromisoformat(time_str),
-                    'magnitude': float(props.get('mag', 0)),
-                    'depth': float(coords[2]) if len(coords) > 2 else 0.0,
-                    'latitude': float(coords[1]),
-                    'longitude': float(coords[0]),
-                    'place': str(props.get('place', 'N/A')),
-                    'event_id': str(props.get('eventId', f'unknown_{len(earthquakes)}'))
-                }
-                
-                if (-90 <= earthquake['latitude'] <= 90 and 
-                    -180 <= earthquake['longitude'] <= 180):
-                    earthquakes.append(earthquake)
-                    
-            except Exception as e:
-                logger.warning(f"Error parsing earthquake feature: {e}")
-                continue
+        with col_s3:
+            rms_amp = np.sqrt(np.mean(samples ** 2)) * sensitivity
+            st.metric("📊 Valore RMS", f"{rms_amp:.4f}")
         
-        logger.info(f"Successfully parsed {len(earthquakes)} earthquakes")
-        return pd.DataFrame(earthquakes)
+        with col_s4:
+            st.metric("🎯 STA/LTA", f"{snapshot['ratio']:.2f}", "trigger" if snapshot['triggered'] else None)
     
-    except Exception as e:
-        logger.error(f"API error: {e}")
-        return pd.DataFrame()
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_seismograph(plan, sensitivity, title, key, with_stats=True, show_spectrogram=False):
+    """Mostra il sismografo con la cadenza decisa dallo scheduler"""
+    if plan['seismo'] is None:
+        return
+    st.fragment(render_seismograph_panel, run_every=plan['seismo'])(sensitivity, title, key, with_stats, show_spectrogram)
+
+def apply_sta_lta_settings():
+    """Callback dei cursori STA/LTA (solo amministratore): le impostazioni valgono per il flusso condiviso"""
+    if not STA_LTA_ADMIN:
+        return
+    sta_window = st.session_state.sta_window
+    trigger_on = st.session_state.trigger_on
+    get_seismograph_stream().configure({
+        'sta': sta_window,
+        'lta': max(st.session_state.lta_window, sta_window * 2),
+        'on': trigger_on,
+        'off': min(st.session_state.trigger_off, trigger_on)
+    })
 
-def get_earthquake_data(days_back):
-    """Wrapper per il caricamento dati con gestione periodo"""
-    current_hour = datetime.now().strftime('%Y-%m-%d-%H')
-    cache_key = create_cache_key(days_back, current_hour)
-    return get_earthquake_data_cached(days_back, cache_key)
+def render_replay_controls():
+    """Controlli sidebar per il replay di sequenze storiche"""
+    st.sidebar.subheader("⏪ Replay Storico")
+    replay = st.session_state.get('replay')
+    
+    if replay is not None:
+        now = get_replay_now(replay)
+        st.sidebar.info(
+            f"▶️ Replay {replay['factor']:.0f}× • {format_local_time(now, '%d/%m/%Y %H:%M')}\n\n"
+            f"{replay['cursor']}/{len(replay['catalog'])} eventi riprodotti"
+        )
+        if st.sidebar.button("⏹️ Ferma Replay", use_container_width=True):
+            stop_replay()
+            st.rerun()
+        return
+    
+    with st.sidebar.expander("Configura replay", expanded=False):
+        source = st.radio("Sorgente:", ["🗄️ Archivio locale", "📁 File"], horizontal=True, key="replay_source")
+        catalog = None
+        
+        try:
+            if source == "📁 File":
+                uploaded = st.file_uploader("Catalogo (CSV, Parquet o GeoJSON)", type=['csv', 'gz', 'parquet', 'json', 'geojson'], key="replay_file")
+                if uploaded is not None:
+                    catalog = load_catalog_file(uploaded)
+            else:
+                time_range = get_catalog_archive().time_range()
+                if time_range is None:
+                    st.caption("Archivio locale vuoto")
+                else:
+                    first, last = time_range
+                    dates = st.date_input(
+                        "Intervallo:",
+                        value=(max(first, last - pd.Timedelta(days=7)).date(), last.date()),
+                        min_value=first.date(),
+                        max_value=last.date(),
+                        key="replay_dates"
+                    )
+                    if isinstance(dates, (list, tuple)) and len(dates) == 2:
+                        range_start = pd.Timestamp(dates[0], tz='UTC')
+                        range_end = pd.Timestamp(dates[1], tz='UTC') + pd.Timedelta(days=1)
+                        catalog = get_catalog_archive().load(range_start, range_end)
+        except Exception as e:
+            st.error(f"❌ Errore caricamento catalogo: {str(e)}")
+            catalog = None
+        
+        factor = st.select_slider(
+            "Accelerazione:",
+            options=REPLAY_FACTORS,
+            value=3600,
+            format_func=lambda x: f"{x}×",
+            key="replay_factor"
+        )
+        
+        if catalog is not None and not catalog.empty:
+            st.caption(f"{len(catalog)} eventi • {catalog['time'].iloc[0]:%d/%m/%Y} → {catalog['time'].iloc[-1]:%d/%m/%Y}")
+            if st.button("▶️ Avvia Replay", use_container_width=True):
+                start_replay(catalog, catalog['time'].iloc[0], catalog['time'].iloc[-1], factor)
+                st.rerun()
 
-def generate_seismic_noise(amplitude=0.05):
-    """Genera rumore sismico realistico"""
+def generate_seismic_noise(times, transients, amplitude=0.05):
+    """Genera un blocco di rumore sismico realistico, con eventuali transitori, agli istanti dati"""
     try:
-        t = time.time()
+        t = np.asarray(times, dtype=float)
+        jitter = np.random.random((3, len(t))) * 0.1
         noise = (
-            amplitude * 0.3 * np.sin(2 * np.pi * 0.5 * t + np.random.random() * 0.1) +
-            amplitude * 0.25 * np.sin(2 * np.pi * 1.5 * t + np.random.random() * 0.1) +
-            amplitude * 0.2 * np.sin(2 * np.pi * 4.0 * t + np.random.random() * 0.1) +
-            amplitude * 0.25 * np.random.normal(0, 0.8)
+            amplitude * 0.3 * np.sin(2 * np.pi * 0.5 * t + jitter[0]) +
+            amplitude * 0.25 * np.sin(2 * np.pi * 1.5 * t + jitter[1]) +
+            amplitude * 0.2 * np.sin(2 * np.pi * 4.0 * t + jitter[2]) +
+            amplitude * 0.25 * np.random.normal(0, 0.8, len(t))
         )
         slow_variation = 1 + 0.15 * np.sin(2 * np.pi * t / 1800)
-        return noise * slow_variation
+        signal = noise * slow_variation
+        
+        # Microeventi sintetici: sinusoidi smorzate che possono attraversare più blocchi
+        for onset, peak in transients:
+            lag = t - onset
+            active = lag >= 0
+            signal[active] += peak * np.exp(-lag[active] / SEISMO_EVENT_DECAY) * np.sin(2 * np.pi * 3.0 * lag[active])
+        return signal
     except Exception as e:
         logger.error(f"Error generating seismic noise: {e}")
-        return 0.0
+        return np.zeros(len(times))
+
+def exponential_average(values, state, coeff):
+    """Media ricorsiva y[n] = (1-c)·y[n-1] + c·x[n], vettorizzata su sottoblocchi di lunghezza fissa"""
+    decay = 1.0 - coeff
+    averaged = np.empty(len(values))
+    for start in range(0, len(values), SEISMO_FILTER_BLOCK):
+        block = values[start:start + SEISMO_FILTER_BLOCK]
+        powers = decay ** np.arange(1, len(block) + 1)
+        # Forma chiusa della ricorsione: decay^(n+1)·(y0 + c·Σ x[k]/decay^(k+1))
+        averaged[start:start + len(block)] = powers * (state + coeff * np.cumsum(block / powers))
+        state = averaged[start + len(block) - 1]
+    return averaged, state
+
+def run_sta_lta(samples, times, detector, settings):
+    """Trigger STA/LTA ricorsivo su un blocco di campioni; restituisce i trigger chiusi nel blocco"""
+    energy = np.square(samples)
+    if detector['samples'] == 0 and len(energy):
+        detector['sta'] = detector['lta'] = float(energy[0])
+    sta, detector['sta'] = exponential_average(energy, detector['sta'], 1.0 / (settings['sta'] * SEISMO_SAMPLE_RATE))
+    lta, detector['lta'] = exponential_average(energy, detector['lta'], 1.0 / (settings['lta'] * SEISMO_SAMPLE_RATE))
+    ratio = sta / np.maximum(lta, 1e-12)
+    
+    # Niente trigger finché la LTA non ha visto una finestra intera
+    warmup = max(0, int(settings['lta'] * SEISMO_SAMPLE_RATE) - detector['samples'])
+    detector['samples'] += len(samples)
+    ratio[:warmup] = 0.0
+    
+    # Isteresi: si scorrono solo i punti di transizione, non i singoli campioni
+    closed = []
+    above_on = ratio >= settings['on']
+    below_off = ratio < settings['off']
+    position = 0
+    while position < len(ratio):
+        search = below_off if detector['on_time'] is not None else above_on
+        hits = np.flatnonzero(search[position:])
+        if len(hits) == 0:
+            break
+        position += int(hits[0])
+        if detector['on_time'] is None:
+            detector['on_time'] = float(times[position])
+        else:
+            closed.append({'on': detector['on_time'], 'off': float(times[position])})
+            detector['on_time'] = None
+        position += 1
+    return closed
+
+def new_spectrogram_state():
+    """Stato vuoto della STFT incrementale: coda di campioni non ancora in un frame e colonne già calcolate"""
+    columns = int(SPECTROGRAM_HISTORY_SECONDS * SEISMO_SAMPLE_RATE / SPECTROGRAM_HOP)
+    return {
+        'tail': np.empty(0),
+        'tail_start': None,
+        'columns': deque(maxlen=columns),
+        'times': deque(maxlen=columns)
+    }
+
+def update_spectrogram(state, samples, times):
+    """Trasforma solo i frame completati dai nuovi campioni; le colonne passate restano in cache"""
+    if len(samples) == 0:
+        return
+    if state['tail_start'] is None or len(state['tail']) == 0:
+        state['tail_start'] = float(times[0])
+    buffer = np.concatenate([state['tail'], samples])
+    frames = (len(buffer) - SPECTROGRAM_FRAME) // SPECTROGRAM_HOP + 1
+    if frames > 0:
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, SPECTROGRAM_FRAME)[::SPECTROGRAM_HOP][:frames]
+        spectrum = np.fft.rfft(windows * np.hanning(SPECTROGRAM_FRAME), axis=1)
+        power_db = 10 * np.log10(np.abs(spectrum) ** 2 / SEISMO_SAMPLE_RATE + 1e-12)
+        # Ogni colonna è datata al centro del suo frame
+        centers = state['tail_start'] + (np.arange(frames) * SPECTROGRAM_HOP + SPECTROGRAM_FRAME / 2) / SEISMO_SAMPLE_RATE
+        state['columns'].extend(power_db.astype(np.float32))
+        state['times'].extend(centers.tolist())
+        consumed = frames * SPECTROGRAM_HOP
+        buffer = buffer[consumed:]
+        state['tail_start'] += consumed / SEISMO_SAMPLE_RATE
+    state['tail'] = buffer
+
+class SeismographStream:
+    """Flusso del sismografo condiviso dal processo: campioni, trigger STA/LTA e spettrogramma"""
+
+    def __init__(self):
+        buffer_size = SEISMO_SAMPLE_RATE * SEISMO_WINDOW_SECONDS
+        self.lock = threading.Lock()
+        self.data = deque(maxlen=buffer_size)
+        self.times = deque(maxlen=buffer_size)
+        self.total = 0
+        self.last_update = math.floor(utc_now_ns() / 1e9 / SEISMO_BLOCK_SECONDS) * SEISMO_BLOCK_SECONDS
+        self.transients = []
+        self.settings = dict(STA_LTA_SETTINGS)
+        self.detector = {'sta': 0.0, 'lta': 0.0, 'samples': 0, 'on_time': None}
+        self.triggers = deque(maxlen=STA_LTA_MAX_TRIGGERS)
+        self.spectrogram = new_spectrogram_state()
+
+    def advance(self, current_time=None):
+        """Genera una sola volta, per tutte le sessioni, i blocchi di campioni maturati"""
+        current_time = utc_now_ns() / 1e9 if current_time is None else current_time
+        with self.lock:
+            # Avanzando a blocchi interi le sessioni vicine leggono lo stesso stato (e le stesse figure in cache)
+            horizon = math.floor(current_time / SEISMO_BLOCK_SECONDS) * SEISMO_BLOCK_SECONDS
+            due = int(round((horizon - self.last_update) * SEISMO_SAMPLE_RATE))
+            if due <= 0:
+                return
+            
+            # Dopo una lunga pausa si rigenera solo l'ultima finestra visibile
+            skipped = max(0, due - self.data.maxlen)
+            times = self.last_update + (np.arange(skipped, due) + 1) / SEISMO_SAMPLE_RATE
+            
+            self.transients = [
+                (onset, peak) for onset, peak in self.transients
+                if times[0] - onset < 10 * SEISMO_EVENT_DECAY
+            ]
+            for _ in range(np.random.poisson(SEISMO_EVENT_RATE * len(times) / SEISMO_SAMPLE_RATE)):
+                self.transients.append((float(np.random.uniform(times[0], times[-1])), float(np.random.uniform(0.1, 0.4))))
+            
+            samples = generate_seismic_noise(times, self.transients)
+            self.data.extend(samples.tolist())
+            self.times.extend(times.tolist())
+            self.triggers.extend(run_sta_lta(samples, times, self.detector, self.settings))
+            if skipped:
+                self.spectrogram['tail'] = np.empty(0)
+            update_spectrogram(self.spectrogram, samples, times)
+            self.total += due
+            self.last_update = horizon
+        count_metric("seismo_samples_total", len(samples))
+
+    def configure(self, settings):
+        """Nuove finestre e soglie STA/LTA, valide per tutte le sessioni"""
+        with self.lock:
+            self.settings = dict(settings)
+
+    def trigger_summary(self):
+        """Numero di trigger chiusi e stato del trigger aperto, letti sotto lock"""
+        with self.lock:
+            return {'closed': len(self.triggers), 'triggered': self.detector['on_time'] is not None}
+
+    def snapshot(self):
+        """Copia in sola lettura dello stato corrente, da usare fuori dal lock"""
+        with self.lock:
+            triggers = list(self.triggers)
+            if self.detector['on_time'] is not None and self.times:
+                triggers.append({'on': self.detector['on_time'], 'off': self.times[-1]})
+            return {
+                'total': self.total,
+                'times': np.array(self.times),
+                'data': np.array(self.data),
+                'triggers': triggers,
+                'closed_triggers': len(self.triggers),
+                'triggered': self.detector['on_time'] is not None,
+                'ratio': self.detector['sta'] / self.detector['lta'] if self.detector['lta'] > 0 else 0.0,
+                'spectrogram': np.array(self.spectrogram['columns']),
+                'spectrogram_times': np.array(self.spectrogram['times'])
+            }
+
+@st.cache_resource(show_spinner=False)
+def get_seismograph_stream():
+    """Flusso del sismografo condiviso da tutte le sessioni del processo"""
+    return SeismographStream()
 
 def update_seismograph():
-    """Aggiorna i dati del sismografo"""
+    """Avanza il flusso condiviso e sposta il cursore di lettura della sessione"""
     try:
-        current_time = time.time()
-        if current_time - st.session_state.last_seismo_update >= 0.2:
-            amplitude = generate_seismic_noise()
-            st.session_state.seismo_data.append(amplitude)
-            st.session_state.seismo_time.append(current_time)
-            st.session_state.last_seismo_update = current_time
-            st.session_state.seismo_running = True
+        stream = get_seismograph_stream()
+        stream.advance()
+        snapshot = stream.snapshot()
+        st.session_state.seismo_running = snapshot['total'] > st.session_state.seismo_cursor
+        st.session_state.seismo_cursor = snapshot['total']
+        return snapshot
     except Exception as e:
         logger.error(f"Error updating seismograph: {e}")
         st.session_state.seismo_running = False
+        return None
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _seismograph_figures_cached(total, sensitivity, dark_mode, spectrogram, _snapshot):
+    figures = {'trace': create_themed_seismograph_plot(_snapshot, sensitivity, dark_mode)}
+    if spectrogram:
+        figures['spectrogram'] = create_spectrogram_plot(_snapshot, sensitivity, dark_mode)
+    return figures
+
+def get_seismograph_figures(snapshot, sensitivity, dark_mode, spectrogram=False):
+    """Figure del sismografo costruite una volta per blocco di campioni, sensibilità e tema"""
+    return _seismograph_figures_cached(snapshot['total'], sensitivity, dark_mode, spectrogram, snapshot)
 
-def create_themed_seismograph_plot(sensitivity=1.0):
+def compact_axis(axis, values, step, decimals=2):
+    """Coordinate di un asse per Plotly: origine e passo se regolari, altrimenti valori arrotondati"""
+    if len(values) > 1 and np.allclose(np.diff(values), step):
+        return {f'{axis}0': float(values[0]), f'd{axis}': step}
+    return {axis: np.round(values, decimals)}
+
+def create_themed_seismograph_plot(snapshot, sensitivity=1.0, dark_mode=True):
     """Crea grafico sismografo con tema dinamico"""
     try:
-        if len(st.session_state.seismo_data) < 5:
+        if snapshot is None or len(snapshot['data']) < 5:
             fig = go.Figure()
             
-            text_color = '#00ff88' if st.session_state.dark_mode else '#667eea'
-            bg_color = 'rgba(10, 15, 25, 0.9)' if st.session_state.dark_mode else 'rgba(248, 249, 250, 0.9)'
+            text_color = '#00ff88' if dark_mode else '#667eea'
+            bg_color = 'rgba(10, 15, 25, 0.9)' if dark_mode else 'rgba(248, 249, 250, 0.9)'
             
             fig.add_annotation(
                 text="🌊 Sismografo in avvio...<br>Attendere qualche secondo",
@@ -578,12 +3001,12 @@ def create_themed_seismograph_plot(sensitivity=1.0):
             )
             return fig
         
-        latest_time = st.session_state.seismo_time[-1]
-        relative_times = [(t - latest_time) for t in st.session_state.seismo_time]
-        amplitudes = [amp * sensitivity for amp in st.session_state.seismo_data]
+        latest_time = snapshot['times'][-1]
+        relative_times = snapshot['times'] - latest_time
+        amplitudes = snapshot['data'] * sensitivity
         
         # Colori basati sul tema
-        if st.session_state.dark_mode:
+        if dark_mode:
             line_color = '#00ff88'
             grid_color = 'rgba(255,255,255,0.1)'
             text_color = '#ffffff'
@@ -598,10 +3021,10 @@ def create_themed_seismograph_plot(sensitivity=1.0):
         
         fig = go.Figure()
         
-        # Linea principale
+        # Linea principale: tempi come origine e passo, ampiezze alla precisione del tooltip
         fig.add_trace(go.Scatter(
-            x=relative_times,
-            y=amplitudes,
+            **compact_axis('x', relative_times, 1 / SEISMO_SAMPLE_RATE),
+            y=np.round(amplitudes, 4),
             mode='lines',
             name='Segnale sismico',
             line=dict(color=line_color, width=3),
@@ -613,8 +3036,19 @@ def create_themed_seismograph_plot(sensitivity=1.0):
         # Linea zero
         fig.add_hline(y=0, line_dash="dot", line_color=text_color, line_width=1, opacity=0.5)
         
+        # Trigger STA/LTA nella finestra visibile, compreso quello ancora aperto
+        for trigger in snapshot['triggers']:
+            if trigger['off'] - latest_time < -SEISMO_WINDOW_SECONDS:
+                continue
+            fig.add_vrect(
+                x0=trigger['on'] - latest_time, x1=max(trigger['off'] - latest_time, trigger['on'] - latest_time + 0.2),
+                fillcolor='rgba(254, 202, 87, 0.25)', layer="below", line_width=0,
+                annotation_text="trigger", annotation_position="top left",
+                annotation_font=dict(color=text_color, size=10)
+            )
+        
         # Zone di allerta
-        max_amp = max(abs(min(amplitudes, default=0)), abs(max(amplitudes, default=0)))
+        max_amp = float(np.abs(amplitudes).max())
         if max_amp > 0:
             alert_color = 'rgba(255, 107, 107, 0.1)'
             fig.add_hrect(y0=max_amp*0.7, y1=max_amp*1.2, 
@@ -632,7 +3066,7 @@ def create_themed_seismograph_plot(sensitivity=1.0):
             },
             xaxis=dict(
                 title='Tempo (secondi fa)',
-                range=[-40, 0],
+                range=[-SEISMO_WINDOW_SECONDS, 0],
                 gridcolor=grid_color,
                 color=text_color,
                 tickfont={'color': text_color, 'family': 'Inter'},
@@ -662,11 +3096,60 @@ def create_themed_seismograph_plot(sensitivity=1.0):
         logger.error(f"Error creating seismograph plot: {e}")
         return go.Figure()
 
-def create_themed_earthquake_map(df):
+def create_spectrogram_plot(snapshot, sensitivity=1.0, dark_mode=True):
+    """Spettrogramma scorrevole e PSD media dalla cache di colonne della STFT"""
+    if dark_mode:
+        template = "plotly_dark"
+        colorscale = "Plasma"
+        line_color = '#00ff88'
+    else:
+        template = "plotly_white"
+        colorscale = "Viridis"
+        line_color = '#667eea'
+    
+    fig = make_subplots(rows=1, cols=2, shared_yaxes=True, column_widths=[0.8, 0.2], horizontal_spacing=0.02)
+    if snapshot is None or len(snapshot['spectrogram']) < 2:
+        fig.add_annotation(
+            text="🎼 Spettrogramma in avvio...", xref="paper", yref="paper",
+            x=0.5, y=0.5, showarrow=False, font=dict(size=16, color=line_color)
+        )
+    else:
+        # La sensibilità è un guadagno: in dB diventa una traslazione
+        power_db = snapshot['spectrogram'].T + 20 * np.log10(sensitivity)
+        frequencies = np.fft.rfftfreq(SPECTROGRAM_FRAME, 1 / SEISMO_SAMPLE_RATE)
+        relative_times = snapshot['spectrogram_times'] - snapshot['spectrogram_times'][-1]
+        fig.add_trace(go.Heatmap(
+            **compact_axis('x', relative_times, SPECTROGRAM_HOP / SEISMO_SAMPLE_RATE),
+            **compact_axis('y', frequencies, SEISMO_SAMPLE_RATE / SPECTROGRAM_FRAME),
+            z=np.round(power_db, 1),
+            colorscale=colorscale, showscale=False,
+            hovertemplate='<b>%{x:.1f}s fa</b><br>%{y:.2f} Hz<br>%{z:.1f} dB<extra></extra>'
+        ), row=1, col=1)
+        psd = 10 * np.log10(np.mean(10 ** (power_db / 10), axis=1))
+        fig.add_trace(go.Scatter(
+            x=np.round(psd, 1), **compact_axis('y', frequencies, SEISMO_SAMPLE_RATE / SPECTROGRAM_FRAME),
+            mode='lines', line=dict(color=line_color, width=2),
+            hovertemplate='%{y:.2f} Hz<br>%{x:.1f} dB<extra></extra>'
+        ), row=1, col=2)
+    
+    fig.update_layout(
+        template=template,
+        title="🎼 Spettrogramma • PSD media",
+        height=300,
+        showlegend=False,
+        margin=dict(l=60, r=20, t=50, b=40),
+        font_family="Inter"
+    )
+    fig.update_xaxes(title_text="Tempo (secondi fa)", row=1, col=1)
+    fig.update_xaxes(title_text="dB", row=1, col=2)
+    fig.update_yaxes(title_text="Frequenza (Hz)", row=1, col=1)
+    return fig
+
+def create_themed_earthquake_map(df, color_by_cluster=False, region=REGIONS[DEFAULT_REGION], dark_mode=True):
     """Crea mappa con tema dinamico"""
     try:
         # Stile mappa basato sul tema
-        if st.session_state.dark_mode:
+        if dark_mode:
             mapbox_style = "carto-darkmatter"
             color_scale = "Plasma"
             text_color = '#ffffff'
@@ -678,19 +3161,19 @@ def create_themed_earthquake_map(df):
         if df.empty:
             fig = go.Figure()
             fig.add_trace(go.Scattermapbox(
-                lat=[CAMPI_FLEGREI_LAT],
-                lon=[CAMPI_FLEGREI_LON],
+                lat=[region['lat']],
+                lon=[region['lon']],
                 mode='markers',
                 marker=dict(size=25, color='#ff6b6b', symbol='volcano'),
-                name='🌋 Centro Campi Flegrei',
-                text='Centro Campi Flegrei<br>Nessun terremoto nel periodo',
+                name=f"{region['emoji']} Centro {region['name']}",
+                text=f"Centro {region['name']}<br>Nessun terremoto nel periodo",
                 hoverinfo='text'
             ))
             
             fig.update_layout(
                 mapbox=dict(
                     style=mapbox_style,
-                    center=dict(lat=CAMPI_FLEGREI_LAT, lon=CAMPI_FLEGREI_LON),
+                    center=dict(lat=region['lat'], lon=region['lon']),
                     zoom=10
                 ),
                 height=600,
@@ -719,35 +3202,42 @@ def create_themed_earthquake_map(df):
         if df_clean.empty:
             raise ValueError("Nessun dato valido")
         
+        # Colore per profondità o per ruolo nel cluster
+        hover_data = {
+            "time": "|%Y-%m-%d %H:%M:%S",
+            "magnitude": ":.1f",
+            "depth": ":.1f",
+            "distance_km": ":.1f"
+        }
+        color_args = {'color': "depth", 'color_continuous_scale': color_scale}
+        if color_by_cluster and 'cluster_role' in df_clean.columns:
+            df_clean = df_clean.assign(cluster=cluster_role_labels(df_clean))
+            hover_data['cluster_id'] = True
+            color_args = {'color': "cluster", 'color_discrete_map': CLUSTER_COLOR_MAP}
+        
         # Crea mappa
         fig = px.scatter_mapbox(
             df_clean,
             lat="latitude",
             lon="longitude",
             size="magnitude",
-            color="depth",
             hover_name="place",
-            hover_data={
-                "time": "|%Y-%m-%d %H:%M:%S",
-                "magnitude": ":.1f",
-                "depth": ":.1f",
-                "distance_km": ":.1f"
-            },
-            color_continuous_scale=color_scale,
+            hover_data=hover_data,
+            **color_args,
             size_max=35,
             zoom=9,
             mapbox_style=mapbox_style,
             title="🗺️ Distribuzione Geografica • Real-Time"
         )
         
-        # Centro Campi Flegrei
+        # Centro della regione
         fig.add_trace(go.Scattermapbox(
-            lat=[CAMPI_FLEGREI_LAT],
-            lon=[CAMPI_FLEGREI_LON],
+            lat=[region['lat']],
+            lon=[region['lon']],
             mode='markers',
             marker=dict(size=30, color='#ff6b6b', symbol='volcano'),
-            name='🌋 Centro Campi Flegrei',
-            text=f'🌋 Centro Campi Flegrei<br>📍 {CAMPI_FLEGREI_LAT:.3f}, {CAMPI_FLEGREI_LON:.3f}',
+            name=f"{region['emoji']} Centro {region['name']}",
+            text=f"{region['emoji']} Centro {region['name']}<br>📍 {region['lat']:.3f}, {region['lon']:.3f}",
             hoverinfo='text'
         ))
         
@@ -774,9 +3264,169 @@ def create_themed_earthquake_map(df):
         logger.error(f"Error creating map: {e}")
         return go.Figure()
 
-def create_themed_chart(df, chart_type, period_desc):
+def project_local_km(latitudes, longitudes, lat0=CAMPI_FLEGREI_LAT, lon0=CAMPI_FLEGREI_LON):
+    """Proiezione locale equirettangolare in km (est, nord) rispetto al centro"""
+    east = (np.asarray(longitudes, dtype=np.float64) - lon0) * 111.32 * math.cos(math.radians(lat0))
+    north = (np.asarray(latitudes, dtype=np.float64) - lat0) * 110.57
+    return east, north
+
+def build_hypocenter_geometry(df, region=REGIONS[DEFAULT_REGION], max_points=HYPOCENTER_MAX_POINTS):
+    """Geometria della vista 3D: punti singoli o voxel aggregati se gli eventi sono troppi"""
+    east, north = project_local_km(df['latitude'], df['longitude'], region['lat'], region['lon'])
+    depth = df['depth'].to_numpy(dtype=np.float64)
+    magnitude = df['magnitude'].to_numpy(dtype=np.float64)
+    if len(df) <= max_points:
+        return {
+            'east': east, 'north': north, 'depth': depth, 'magnitude': magnitude,
+            'count': np.ones(len(df), dtype=np.int64), 'voxel_km': None,
+            'latitude': df['latitude'].to_numpy(), 'longitude': df['longitude'].to_numpy()
+        }
+    
+    # Livello di dettaglio: il lato del voxel cresce finché i voxel occupati non rientrano nel budget
+    voxel_km = HYPOCENTER_VOXEL_KM
+    while True:
+        # Indici interi del voxel combinati in un'unica chiave int64
+        key = np.zeros(len(df), dtype=np.int64)
+        for coordinate in (east, north, depth):
+            index = np.floor(coordinate / voxel_km).astype(np.int64)
+            index -= index.min()
+            key = key * (int(index.max()) + 1) + index
+        _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+        if len(counts) <= max_points:
+            break
+        voxel_km *= 1.5
+    
+    # Centroide, magnitudo massima e numero di eventi per voxel
+    def mean(values):
+        return np.bincount(inverse, weights=values) / counts
+    max_magnitude = np.full(len(counts), -np.inf)
+    np.maximum.at(max_magnitude, inverse, magnitude)
+    return {
+        'east': mean(east), 'north': mean(north), 'depth': mean(depth), 'magnitude': max_magnitude,
+        'count': counts, 'voxel_km': voxel_km,
+        'latitude': mean(df['latitude'].to_numpy(dtype=np.float64)),
+        'longitude': mean(df['longitude'].to_numpy(dtype=np.float64))
+    }
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _hypocenter_geometry_cached(_df, fingerprint, region_key, max_points):
+    return build_hypocenter_geometry(_df, REGIONS[region_key], max_points)
+
+def get_hypocenter_geometry(df, region_key=DEFAULT_REGION, max_points=HYPOCENTER_MAX_POINTS):
+    """Geometria 3D ricalcolata solo quando cambiano il contenuto del catalogo o la regione"""
+    return _hypocenter_geometry_cached(df, catalog_fingerprint(df), region_key, max_points)
+
+def create_hypocenter_figure(geometry, region=REGIONS[DEFAULT_REGION], dark_mode=True):
+    """Vista 3D degli ipocentri con tracce WebGL (Scatter3d)"""
+    if dark_mode:
+        template = "plotly_dark"
+        color_scale = "Plasma"
+        text_color = '#ffffff'
+    else:
+        template = "plotly_white"
+        color_scale = "Viridis"
+        text_color = '#2c3e50'
+    
+    binned = geometry['voxel_km'] is not None
+    if binned:
+        sizes = 3 + 3 * np.log2(geometry['count'])
+        hover = "Voxel: %{customdata[2]} eventi<br>Mag max: %{marker.color:.1f}"
+    else:
+        sizes = 2 + 2.5 * np.clip(geometry['magnitude'], 0, None)
+        hover = "Magnitudine: %{marker.color:.1f}"
+    hover += "<br>Lat %{customdata[0]:.4f} • Lon %{customdata[1]:.4f}<br>Profondità: %{customdata[3]:.2f} km<extra></extra>"
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter3d(
+        x=geometry['east'], y=geometry['north'], z=-geometry['depth'],
+        mode='markers',
+        marker=dict(
+            size=np.clip(sizes, 2, 18),
+            color=geometry['magnitude'],
+            colorscale=color_scale,
+            colorbar=dict(title="Mag max" if binned else "Mag"),
+            opacity=0.8,
+            line=dict(width=0)
+        ),
+        customdata=np.column_stack([geometry['latitude'], geometry['longitude'], geometry['count'], geometry['depth']]),
+        hovertemplate=hover,
+        name="Ipocentri"
+    ))
+    
+    # Riferimenti in superficie
+    landmarks = [(f"{region['emoji']} Centro", region['lat'], region['lon'])] + region['landmarks']
+    ref_east, ref_north = project_local_km(
+        [lat for _, lat, _ in landmarks], [lon for _, _, lon in landmarks], region['lat'], region['lon']
+    )
+    fig.add_trace(go.Scatter3d(
+        x=ref_east, y=ref_north, z=np.zeros(len(landmarks)),
+        mode='markers+text',
+        marker=dict(size=6, color=['#ff6b6b'] + ['#feca57'] * (len(landmarks) - 1), symbol='diamond'),
+        text=[name for name, _, _ in landmarks],
+        textfont=dict(color=text_color),
+        hoverinfo='text',
+        name="Riferimenti"
+    ))
+    
+    fig.update_layout(
+        template=template,
+        height=650,
+        margin=dict(l=0, r=0, t=40, b=0),
+        showlegend=False,
+        title={
+            'text': "🧊 Ipocentri 3D" + (f" • voxel {geometry['voxel_km']:.2g} km" if binned else ""),
+            'x': 0.5, 'xanchor': 'center',
+            'font': {'color': text_color, 'family': 'Inter', 'size': 18}
+        },
+        scene=dict(
+            xaxis_title="Est (km)",
+            yaxis_title="Nord (km)",
+            zaxis_title="Quota (km)",
+            aspectmode='data'
+        ),
+        # Mantiene la camera tra un refresh e l'altro
+        uirevision="hypocenters"
+    )
+    return fig
+
+def create_release_chart(curves, period_desc, dark_mode=True):
+    """Momento sismico cumulativo e strain di Benioff cumulativo, su assi separati"""
+    if dark_mode:
+        template = "plotly_dark"
+        colors = ['#ff6b6b', '#48dbfb']
+    else:
+        template = "plotly_white"
+        colors = ['#764ba2', '#4facfe']
+    
+    # Oltre qualche migliaio di punti le tracce passano a WebGL
+    scatter = go.Scattergl if len(curves) > 5000 else go.Scatter
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(scatter(
+        x=curves['time'], y=curves['cum_moment'],
+        mode='lines', line=dict(color=colors[0], width=2, shape='hv'),
+        name="Momento cumulativo (N·m)"
+    ), secondary_y=False)
+    fig.add_trace(scatter(
+        x=curves['time'], y=curves['cum_benioff'],
+        mode='lines', line=dict(color=colors[1], width=2, shape='hv', dash='dot'),
+        name="Strain di Benioff (√J)"
+    ), secondary_y=True)
+    fig.update_layout(
+        template=template,
+        title=f"Rilascio di Energia Cumulativo ({period_desc})",
+        height=380,
+        margin=dict(l=0, r=0, t=50, b=0),
+        legend=dict(orientation='h', yanchor='bottom', y=1.0, xanchor='right', x=1),
+        font_family="Inter",
+        hovermode='x unified'
+    )
+    fig.update_yaxes(title_text="Momento (N·m)", exponentformat='e', secondary_y=False)
+    fig.update_yaxes(title_text="Benioff (√J)", exponentformat='e', secondary_y=True)
+    return fig
+
+def create_themed_chart(df, chart_type, period_desc, color_by_cluster=False, dark_mode=True):
     """Crea grafici con tema dinamico"""
-    if st.session_state.dark_mode:
+    if dark_mode:
         template = "plotly_dark"
         color_discrete = ['#ff6b6b', '#feca57', '#48dbfb', '#ff9ff3', '#54a0ff']
         color_continuous = "Plasma"
@@ -785,6 +3435,10 @@ def create_themed_chart(df, chart_type, period_desc):
         color_discrete = ['#667eea', '#764ba2', '#f093fb', '#f5576c', '#4facfe']
         color_continuous = "Viridis"
     
+    color_by_cluster = color_by_cluster and 'cluster_role' in df.columns
+    if color_by_cluster:
+        df = df.assign(cluster=cluster_role_labels(df))
+    
     try:
         if chart_type == "histogram":
             fig = px.histogram(
@@ -798,8 +3452,9 @@ def create_themed_chart(df, chart_type, period_desc):
         elif chart_type == "scatter":
             fig = px.scatter(
                 df, x="depth", y="magnitude",
-                size="magnitude", color="distance_km",
+                size="magnitude", color="cluster" if color_by_cluster else "distance_km",
                 hover_data=["place", "time"],
+                color_discrete_map=CLUSTER_COLOR_MAP,
                 title=f"Profondità vs Magnitudine ({period_desc})",
                 labels={
                     "depth": "Profondità (km)",
@@ -827,8 +3482,9 @@ def create_themed_chart(df, chart_type, period_desc):
         elif chart_type == "timeline_scatter":
             fig = px.scatter(
                 df, x="time", y="magnitude",
-                size="magnitude", color="depth",
+                size="magnitude", color="cluster" if color_by_cluster else "depth",
                 hover_data=["place", "distance_km"],
+                color_discrete_map=CLUSTER_COLOR_MAP,
                 title=f"Timeline Terremoti ({period_desc})",
                 labels={
                     "time": "Tempo",
@@ -845,6 +3501,360 @@ def create_themed_chart(df, chart_type, period_desc):
         logger.error(f"Error creating {chart_type} chart: {e}")
         return go.Figure()
 
+def figure_fingerprint(df):
+    """Impronta dei valori effettivamente disegnati, inclusi ruoli di cluster e revisioni"""
+    if df.empty:
+        return (0, 0)
+    columns = [col for col in ['event_id', 'time', 'magnitude', 'depth', 'latitude', 'longitude', 'cluster_role'] if col in df.columns]
+    return (len(df), tuple(columns), int(pd.util.hash_pandas_object(df[columns], index=False).sum()))
+
+def build_catalog_figure(kind, df, period_desc, dark_mode, color_by_cluster=False, region_key=DEFAULT_REGION, rate_changes=()):
+    """Costruisce una delle figure del catalogo (mappa, istogramma, scatter, timeline, rilascio)"""
+    if kind == 'map':
+        return create_themed_earthquake_map(df, color_by_cluster, REGIONS[region_key], dark_mode)
+    if kind == 'timeline':
+        if len(df) > 50:
+            timeline_data = df.groupby(df['time'].dt.round('h')).agg(
+                max_magnitude=('magnitude', 'max'),
+                event_count=('event_id', 'count')
+            ).reset_index()
+            fig = create_themed_chart(timeline_data, "timeline_bar", period_desc, dark_mode=dark_mode)
+        else:
+            fig = create_themed_chart(df, "timeline_scatter", period_desc, color_by_cluster, dark_mode)
+        return add_rate_change_markers(fig, rate_changes, df['time'].min(), df['time'].max())
+    if kind == 'release':
+        return create_release_chart(release_curves(df), period_desc, dark_mode)
+    return create_themed_chart(df, kind, period_desc, color_by_cluster and kind == 'scatter', dark_mode)
+
+@st.cache_resource(ttl=WARM_INTERVAL_SECONDS * 3, max_entries=64, show_spinner=False)
+def _catalog_figure_cached(kind, _df, fingerprint, period_desc, dark_mode, color_by_cluster, region_key, rate_changes):
+    return build_catalog_figure(kind, _df, period_desc, dark_mode, color_by_cluster, region_key, rate_changes)
+
+def get_catalog_figure(kind, df, period_desc, dark_mode, color_by_cluster=False, region_key=DEFAULT_REGION, rate_changes=()):
+    """Figura del catalogo condivisa fra sessioni, ricostruita solo quando cambiano dati o vista"""
+    return _catalog_figure_cached(kind, df, figure_fingerprint(df), period_desc, dark_mode, color_by_cluster, region_key, rate_changes)
+
+def build_hypocenter_panel(df, region_key, dark_mode):
+    """Figura 3D degli ipocentri (la geometria resta in cache per la didascalia)"""
+    return create_hypocenter_figure(get_hypocenter_geometry(df, region_key), REGIONS[region_key], dark_mode)
+
+@st.cache_resource(show_spinner=False)
+def get_figure_pool():
+    """Pool condiviso dal processo per costruire le figure dei pannelli"""
+    return ThreadPoolExecutor(max_workers=FIGURE_WORKERS, thread_name_prefix="figure-build")
+
+def run_figure_job(name, func, *args, started=None):
+    if started is not None:
+        started[name] = time.perf_counter()
+    with stage_timer(f"figure_{name}"):
+        return func(*args)
+
+def render_panel_figures(jobs, placeholders, budget=FIGURE_BUDGET_SECONDS):
+    """Costruisce le figure in parallelo e mostra ciascuna appena pronta, ognuna entro il proprio budget"""
+    # jobs: {nome: (funzione, *argomenti)}, placeholders: {nome: (st.empty(), messaggio di errore)}
+    pool = get_figure_pool()
+    started = {}
+    submitted = time.perf_counter()
+    futures = {
+        pool.submit(run_figure_job, name, func, *args, started=started): name
+        for name, (func, *args) in jobs.items()
+    }
+    
+    def deadline(future):
+        # Il budget di un pannello parte quando il suo calcolo inizia (o dall'invio, finché resta in coda)
+        return started.get(futures[future], submitted) + budget
+    
+    rendered = set()
+    pending = set(futures)
+    while pending:
+        timeout = max(0.0, min(deadline(future) for future in pending) - time.perf_counter())
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            name = futures[future]
+            placeholder, error_label = placeholders[name]
+            try:
+                fig = future.result()
+            except Exception as e:
+                placeholder.error(f"{error_label}: {str(e)}")
+                continue
+            with stage_timer(f"render_{name}"):
+                placeholder.plotly_chart(fig, use_container_width=True)
+            rendered.add(name)
+        
+        now = time.perf_counter()
+        for future in [future for future in pending if deadline(future) <= now and not future.done()]:
+            # La figura in ritardo finisce comunque in cache per il prossimo aggiornamento
+            pending.discard(future)
+            name = futures[future]
+            count_metric("figure_budget_exceeded_total")
+            logger.warning(f"Panel '{name}' exceeded the {budget}s figure budget")
+            placeholders[name][0].info("⏳ Grafico in preparazione: comparirà al prossimo aggiornamento.")
+    return rendered
+
+def apply_catalog_filters(df, min_magnitude, max_depth, max_distance, cluster_filter=None):
+    """Filtri della sidebar (le distanze sono calcolate una volta in ingestione)"""
+    # Una sola maschera su array NumPy: se passa tutto si restituisce il catalogo stesso, senza copia
+    mask = (
+        (df['magnitude'].to_numpy() >= min_magnitude) &
+        (df['depth'].to_numpy() <= max_depth) &
+        (df['distance_km'].to_numpy() <= max_distance)
+    )
+    roles = cluster_mask(df, cluster_filter)
+    if roles is not None:
+        mask &= roles
+    if mask.all():
+        return df
+    # Altrimenti un'unica selezione per posizione, che resta ordinata per tempo
+    return df.iloc[np.flatnonzero(mask)]
+
+def warm_standard_views(cycle, dark_mode=True):
+    """Aggiorna cataloghi e figure delle viste standard per un ciclo di ingestione"""
+    region = REGIONS[DEFAULT_REGION]
+    boxes = get_ingestion_boxes()
+    store = get_snapshot_store()
+    futures = {days: [(box, store.revalidate(days, box)) for box in boxes] for days in WARM_PERIODS}
+    catalogs = {}
+    for days, batch in futures.items():
+        frames = []
+        for box, future in batch:
+            try:
+                frames.append(future.result()['catalog'])
+            except Exception as e:
+                # INGV non disponibile: si riscaldano comunque le figure dell'ultima copia valida
+                logger.warning(f"Cycle {cycle}: keeping last snapshot for {days} days ({e})")
+                entry = store.load(days, box)
+                frames.append(entry['catalog'] if entry is not None else None)
+        catalogs[days] = combine_catalogs(frames)
+    
+    for days, df in catalogs.items():
+        if df is None:
+            continue
+        # Stessa pipeline della dashboard con i filtri di default
+        filtered_df = apply_catalog_filters(region_catalog(df, region), 0.0, 50, region['radius_km'])
+        if filtered_df.empty:
+            continue
+        for kind in ['map', 'histogram', 'scatter', 'release']:
+            get_catalog_figure(kind, filtered_df, get_period_description(days), dark_mode)
+        get_catalog_figure('timeline', filtered_df, get_period_description(days), dark_mode,
+                           rate_changes=get_rate_change_monitor().markers(DEFAULT_REGION))
+    
+    # La stima ETAS giornaliera non deve pesare sulla prima pagina della giornata
+    try:
+        get_etas_model(DEFAULT_REGION, utc_now())
+    except Exception as e:
+        logger.warning(f"Cycle {cycle}: ETAS fit failed ({e})")
+
+class CacheWarmer:
+    """Riscalda in background le viste standard a ogni ciclo di ingestione"""
+
+    def __init__(self, interval=WARM_INTERVAL_SECONDS):
+        self.interval = interval
+        self.cycle = 0
+        self.wake = threading.Event()
+        self.done = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="cache-warmer", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        # Le sessioni arrivate durante il primo ciclo condividono gli stessi download
+        self.warm(self.cycle)
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.warm(self.cycle + 1)
+            with self.done:
+                self.cycle += 1
+                self.done.notify_all()
+
+    def warm(self, cycle):
+        try:
+            with stage_timer("cache_warm"):
+                warm_standard_views(cycle)
+            count_metric("cache_warm_cycles_total")
+        except Exception as e:
+            count_metric("cache_warm_errors_total")
+            logger.error(f"Cache warm-up failed for cycle {cycle}: {e}")
+        try:
+            cleanup_exports()
+        except OSError as e:
+            logger.warning(f"Export cleanup failed: {e}")
+
+    def refresh_now(self, timeout=PAGE_IO_TIMEOUT):
+        """Anticipa il prossimo ciclo e attende che sia pubblicato"""
+        with self.done:
+            target = self.cycle + 1
+            self.wake.set()
+            self.done.wait_for(lambda: self.cycle >= target, timeout)
+
+@st.cache_resource(show_spinner=False)
+def prepare_plotly_templates():
+    """Materializza una volta i template Plotly condivisi: la creazione pigra dei figli non è thread-safe"""
+    for name in ["plotly_dark", "plotly_white"]:
+        template = pio.templates[name]
+        for bar in template.data.bar:
+            bar.marker.pattern.shape
+        for scatter in template.data.scatter:
+            scatter.marker.symbol, scatter.line.dash
+        template.layout.colorscale.sequential, template.layout.colorway
+    return True
+
+@st.cache_resource(show_spinner=False)
+def get_cache_warmer():
+    """Warmer condiviso dal processo, avviato alla prima esecuzione dello script"""
+    return CacheWarmer()
+
+def paginate_frame(df, sort_by='time', ascending=False, search=None, page=0, page_size=50):
+    """Pagina un catalogo in memoria ordinando solo gli indici (usato in replay e con i filtri per cluster)"""
+    if search:
+        mask = df['place'].str.contains(search, case=False, regex=False) | (df['event_id'] == search)
+        df = df[mask]
+    values = df[sort_by].to_numpy()
+    if sort_by == 'time':
+        values = df['time'].array.asi8
+    order = np.argsort(values, kind='stable')
+    if not ascending:
+        order = order[::-1]
+    page_index = order[page * page_size:(page + 1) * page_size]
+    return df.iloc[page_index], len(df)
+
+def query_table_page(filtered_df, replay, cluster_filter, period_start, period_end, min_magnitude, max_depth, max_distance,
+                     center, sort_by='time', ascending=False, search=None, page=0, page_size=50, archive=None):
+    """Pagina della tabella: da SQLite, o dal catalogo filtrato quando l'archivio non ne ha i filtri (replay, cluster)"""
+    # I ruoli nei cluster non sono nell'archivio: con un filtro per cluster si pagina il catalogo filtrato
+    if replay is not None or cluster_filter is not None:
+        return paginate_frame(filtered_df, sort_by, ascending, search, page, page_size)
+    return (get_catalog_archive() if archive is None else archive).query_page(
+        period_start, period_end, min_magnitude, max_depth, max_distance,
+        sort_by, ascending, search, page, page_size, center
+    )
+
+def format_table_page(page_df):
+    """Formatta per la visualizzazione solo le righe della pagina corrente"""
+    display_df = page_df[['time', 'magnitude', 'depth', 'distance_km', 'place']].copy()
+    display_df['time'] = display_df['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    display_df['magnitude'] = display_df['magnitude'].round(1)
+    display_df['depth'] = display_df['depth'].round(1)
+    display_df['distance_km'] = display_df['distance_km'].round(1)
+    return display_df
+
+def render_catalog_table(filtered_df, replay, period_start, period_end, min_magnitude, max_depth, max_distance, center,
+                         cluster_filter=None):
+    """Tabella dettagliata paginata con ordinamento e ricerca lato server"""
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        search = st.text_input("🔎 Cerca località o ID evento:", key="table_search").strip()
+    with col2:
+        sort_label = st.selectbox("Ordina per:", list(TABLE_SORT_OPTIONS.keys()), key="table_sort")
+    with col3:
+        ascending = st.selectbox("Ordine:", ["⬇️ Decr.", "⬆️ Cresc."], key="table_order") == "⬆️ Cresc."
+    with col4:
+        page_size = st.selectbox("Righe:", TABLE_PAGE_SIZES, index=1, key="table_page_size")
+    
+    sort_by = TABLE_SORT_OPTIONS[sort_label]
+    
+    def query_page(page):
+        with stage_timer("table_query"):
+            return query_table_page(
+                filtered_df, replay, cluster_filter, period_start, period_end, min_magnitude, max_depth, max_distance, center,
+                sort_by, ascending, search, page, page_size
+            )
+    
+    page = st.session_state.get('table_page', 1) - 1
+    page_df, total = query_page(page)
+    n_pages = max(1, math.ceil(total / page_size))
+    if page >= n_pages:
+        # Filtri o ricerca hanno ridotto le pagine: torna all'ultima disponibile
+        page = n_pages - 1
+        st.session_state.table_page = n_pages
+        page_df, total = query_page(page)
+    
+    with stage_timer("table_format"):
+        display_df = format_table_page(page_df)
+    
+    st.dataframe(
+        display_df,
+        column_config={
+            "time": "🕐 Data/Ora",
+            "magnitude": "📊 Magnitudine",
+            "depth": "📏 Profondità (km)",
+            "distance_km": "📍 Distanza (km)",
+            "place": "🏠 Località"
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.number_input("Pagina:", min_value=1, max_value=n_pages, step=1, key="table_page")
+    with col2:
+        st.caption(f"Pagina {page + 1} di {n_pages} • {total} eventi • {page_size} per pagina")
+
+def assess_alert(df, now, region, rate_change=None):
+    """Livello di allerta della regione per il catalogo filtrato, come nel pannello della dashboard"""
+    recent_df = catalog_window(df, now - pd.Timedelta(hours=24))
+    recent_24h = len(recent_df)
+    # Con il declustering uno sciame conta come una sola sequenza
+    recent_sequences = recent_df['cluster_id'].nunique() if 'cluster_id' in recent_df.columns else None
+    max_magnitude = df['magnitude'].max()
+    shallow_count = len(df[df['depth'] < 5])
+    
+    # Logica di allerta migliorata
+    risk_score = (
+        (max_magnitude * 25) +
+        ((recent_24h if recent_sequences is None else recent_sequences) * 2) +
+        (shallow_count * 5)
+    )
+    
+    thresholds = region['alert']
+    if risk_score >= thresholds['high_score'] or max_magnitude >= thresholds['high_magnitude']:
+        level, text, emoji = "high", "🔴 ALLERTA ALTA", "🚨"
+        recommendations = "⚠️ **Azione Immediata Richiesta:** Monitorare comunicazioni ufficiali Protezione Civile. Attività sismica elevata rilevata."
+    elif risk_score >= thresholds['medium_score'] or max_magnitude >= thresholds['medium_magnitude'] or rate_change:
+        level, text, emoji = "medium", "🟡 ALLERTA MEDIA", "⚠️"
+        recommendations = "⚠️ **Attenzione Richiesta:** Aumento dell'attività sismica. Rimanere informati sui sviluppi."
+    else:
+        level, text, emoji = "low", "🟢 CONDIZIONI NORMALI", "✅"
+        recommendations = f"✅ **Tutto OK:** Attività sismica nei parametri normali per l'area monitorata ({region['name']})."
+    
+    return {
+        'level': level,
+        'text': text,
+        'emoji': emoji,
+        'recommendations': recommendations,
+        'risk_score': risk_score,
+        'recent_24h': recent_24h,
+        'recent_sequences': recent_sequences,
+        'max_magnitude': max_magnitude,
+        'shallow_count': shallow_count,
+        'rate_change': rate_change
+    }
+
+def alert_card_html(alert, period_desc):
+    """Riquadro HTML del livello di allerta (dashboard e report)"""
+    sequences = f" in {alert['recent_sequences']} sequenze indipendenti" if alert['recent_sequences'] is not None else ""
+    rate_change = alert['rate_change']
+    rate_change_line = ""
+    if rate_change:
+        rate_change_line = (
+            f"<p><strong>Cambio di tasso:</strong> aumento dalle "
+            f"{format_local_time(pd.Timestamp(rate_change['onset'], tz='UTC'), '%d/%m %H:%M')}, "
+            f"{rate_change['rate']:.1f} eventi/giorno contro {rate_change['baseline_rate']:.1f} di fondo</p>"
+        )
+    
+    return f"""
+        <div class="alert-{alert['level']}">
+            <h2>{alert['emoji']} {alert['text']}</h2>
+            <p><strong>Punteggio Rischio AI:</strong> {alert['risk_score']:.0f}/150</p>
+            <p><strong>Periodo Analisi:</strong> {period_desc}</p>
+            <p><strong>Eventi (24h):</strong> {alert['recent_24h']}{sequences}</p>
+            <p><strong>Magnitudine Max:</strong> {alert['max_magnitude']:.1f}</p>
+            <p><strong>Eventi Superficiali (&lt;5km):</strong> {alert['shallow_count']}</p>
+            {rate_change_line}
+        </div>
+        """
+
 def get_period_description(days):
     """Restituisce una descrizione user-friendly del periodo"""
     period_descriptions = {
@@ -855,11 +3865,178 @@ def get_period_description(days):
     }
     return period_descriptions.get(days, f"Ultimi {days} giorni")
 
+_report_state = {}
+
+def init_report_worker(catalog_path):
+    """Inizializza un processo del pool: il catalogo condiviso si legge una volta per processo"""
+    _report_state['catalog'] = pd.read_pickle(catalog_path)
+
+def report_name(report_end, days, region_key):
+    """Nome dei file di un report: regione, giorno coperto e periodo"""
+    return f"{region_key}_{(report_end - pd.Timedelta(days=1)):%Y-%m-%d}_{days}d"
+
+def render_report_html(title, subtitle, alert, period_desc, figures):
+    """Pagina HTML statica di un report (plotly.min.js condiviso nella stessa cartella)"""
+    if alert is None:
+        summary = "<p>ℹ️ Nessun terremoto registrato nel periodo.</p>"
+    else:
+        recommendations = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", escape(alert['recommendations']))
+        summary = alert_card_html(alert, period_desc) + f"<p>{recommendations}</p>"
+    charts = "\n".join(
+        f'<section>{pio.to_html(fig, full_html=False, include_plotlyjs=False, config={"displaylogo": False})}</section>'
+        for fig in figures.values()
+    )
+    return f"""<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="utf-8">
+<title>{escape(title)}</title>
+<script src="plotly.min.js"></script>
+<style>
+{load_theme_css('light')}
+body {{ font-family: 'Inter', sans-serif; max-width: 1200px; margin: 0 auto; padding: 1rem 2rem; color: #2c3e50; }}
+</style>
+</head>
+<body>
+<h1>🌋 {escape(title)}</h1>
+<p>{escape(subtitle)}</p>
+{summary}
+{charts}
+<footer><p>Generato il {format_local_time(utc_now(), '%d/%m/%Y %H:%M')} dall'archivio locale • Dati INGV</p></footer>
+</body>
+</html>
+"""
+
+def render_report(report_end_ns, days, region_key, output_dir, formats):
+    """Costruisce un report (figure, allerta, file) nel processo del pool"""
+    catalog = _report_state['catalog']
+    region = REGIONS[region_key]
+    report_end = pd.Timestamp(report_end_ns, tz='UTC')
+    period_desc = get_period_description(days)
+    df = apply_catalog_filters(catalog_window(catalog, report_end - pd.Timedelta(days=days), report_end), 0.0, 50, region['radius_km'])
+    
+    # Stato del rilevatore di cambio di tasso alla fine del periodo, ricostruito dalla storia recente
+    monitor = RateChangeMonitor()
+    monitor.feed(catalog_window(catalog, report_end - pd.Timedelta(days=CHANGEPOINT_HISTORY_DAYS), report_end))
+    
+    figures = {}
+    alert = None
+    if not df.empty:
+        alert = assess_alert(df, report_end, region, monitor.status(region_key)['active'])
+        for kind in REPORT_FIGURES:
+            rate_changes = monitor.markers(region_key) if kind == 'timeline' else ()
+            figures[kind] = get_catalog_figure(kind, df, period_desc, False, False, region_key, rate_changes)
+    
+    name = report_name(report_end, days, region_key)
+    files = []
+    if 'html' in formats:
+        path = os.path.join(output_dir, f"{name}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render_report_html(
+                f"Campi Flegrei Monitor • {region['name']}",
+                f"{period_desc} fino al {report_end - pd.Timedelta(days=1):%d/%m/%Y} (UTC) • {len(df)} eventi",
+                alert, period_desc, figures
+            ))
+        files.append(path)
+    if 'png' in formats:
+        for kind, fig in figures.items():
+            path = os.path.join(output_dir, f"{name}_{kind}.png")
+            fig.write_image(path, width=1200, height=fig.layout.height or 500)
+            files.append(path)
+    return {'name': name, 'days': days, 'events': len(df), 'alert': alert['text'] if alert else None, 'files': files}
+
+def write_report_index(output_dir, reports):
+    """Indice HTML dei report generati, dal più recente"""
+    rows = "\n".join(
+        f'<tr><td><a href="{escape(r["name"])}.html">{escape(r["name"])}</a></td><td>{r["days"]}</td>'
+        f'<td>{r["events"]}</td><td>{escape(r["alert"] or "-")}</td></tr>'
+        for r in sorted(reports, key=lambda r: r['name'], reverse=True)
+    )
+    with open(os.path.join(output_dir, "index.html"), 'w', encoding='utf-8') as f:
+        f.write(f"""<!DOCTYPE html>
+<html lang="it">
+<head><meta charset="utf-8"><title>Report • Campi Flegrei Monitor</title></head>
+<body style="font-family: sans-serif">
+<h1>🌋 Report • Campi Flegrei Monitor</h1>
+<table>
+<tr><th>Report</th><th>Giorni</th><th>Eventi</th><th>Allerta</th></tr>
+{rows}
+</table>
+</body>
+</html>
+""")
+
+def run_report_batch(start, end, periods=REPORT_PERIODS, output_dir="reports", formats=('html',),
+                     workers=REPORT_WORKERS, region_key=DEFAULT_REGION, progress=None):
+    """Genera i report giornalieri di un intervallo di date distribuendoli su un pool di processi"""
+    region = REGIONS[region_key]
+    report_ends = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D') + pd.Timedelta(days=1)
+    jobs = [(report_end, days) for report_end in report_ends for days in periods]
+    summary = {'reports': len(jobs), 'done': 0, 'failed': 0, 'files': 0}
+    os.makedirs(output_dir, exist_ok=True)
+    if 'html' in formats:
+        with open(os.path.join(output_dir, "plotly.min.js"), 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+    
+    # Il catalogo della regione si legge una volta dall'archivio e si passa ai processi via file
+    history_start = report_ends[0] - pd.Timedelta(days=max(max(periods), CHANGEPOINT_HISTORY_DAYS))
+    frames = list(get_catalog_archive().iter_chunks(
+        history_start, report_ends[-1], max_distance=region['radius_km'], center=(region['lat'], region['lon'])
+    ))
+    catalog = compact_catalog(pd.concat(frames, ignore_index=True) if frames else CatalogArchive.rows_to_frame([]))
+    logger.info(f"Report batch: {len(jobs)} reports from {len(catalog)} archived events, {workers} processes")
+    
+    reports = []
+    fd, catalog_path = tempfile.mkstemp(suffix=".pkl", dir=output_dir)
+    os.close(fd)
+    try:
+        catalog.to_pickle(catalog_path)
+        with stage_timer("report_batch"), ProcessPoolExecutor(
+            max_workers=workers, initializer=init_report_worker, initargs=(catalog_path,)
+        ) as pool:
+            futures = {
+                pool.submit(render_report, report_end.value, days, region_key, output_dir, tuple(formats)): (report_end, days)
+                for report_end, days in jobs
+            }
+            for future in as_completed(futures):
+                report_end, days = futures[future]
+                try:
+                    report = future.result()
+                    reports.append(report)
+                    summary['done'] += 1
+                    summary['files'] += len(report['files'])
+                except Exception as e:
+                    summary['failed'] += 1
+                    logger.error(f"Report {report_name(report_end, days, region_key)} failed: {e}")
+                if progress:
+                    progress(summary)
+    finally:
+        os.remove(catalog_path)
+    
+    if 'html' in formats:
+        write_report_index(output_dir, reports)
+    return summary
+
 def main():
     """Funzione principale dell'applicazione"""
+    if METRICS_PORT:
+        start_metrics_exporter(METRICS_PORT)
+    # Warm-up delle viste standard: parte con il primo rerun del processo e poi segue l'ingestione
+    prepare_plotly_templates()
+    get_cache_warmer()
+    
+    with stage_timer("rerun"):
+        refresh_delay = render_dashboard()
+    
+    # Auto-refresh: timer lato client, nessuno sleep nel thread dello script
+    schedule_page_refresh(refresh_delay)
+
+def render_dashboard():
+    """Costruisce la pagina e restituisce il ritardo di auto-refresh (o None)"""
     
     # Inizializza stato sessione
     initialize_session_state()
+    track_interaction()
     
     # Applica tema dinamico
     apply_dynamic_theme()
@@ -886,19 +4063,13 @@ def main():
                 st.session_state.dark_mode = False
                 st.rerun()
     
-    # Header
-    st.markdown('<h1 class="modern-header">🌋 Campi Flegrei Monitor</h1>', 
-                unsafe_allow_html=True)
-    
-    st.markdown('''
-    <div class="author-badge">
-        👨‍💻 Developed by <strong>Luigi Oliviero</strong> • 2025 • Fixed Themes
-    </div>
-    ''', unsafe_allow_html=True)
+    # Header e badge autore
+    render_static_block('page_header')
     
     # Theme indicator
-    theme_emoji = "🌙" if st.session_state.dark_mode else "☀️"
-    theme_name = "Dark Mode" if st.session_state.dark_mode else "Light Mode"
+    dark_mode = st.session_state.dark_mode
+    theme_emoji = "🌙" if dark_mode else "☀️"
+    theme_name = "Dark Mode" if dark_mode else "Light Mode"
     st.info(f"{theme_emoji} **Modalità attiva:** {theme_name}")
     
     # Sidebar controlli
@@ -914,13 +4085,24 @@ def main():
     ---
     """)
     
+    # Area monitorata
+    st.sidebar.subheader("🗺️ Area Monitorata")
+    region_key = st.sidebar.selectbox(
+        "Regione:",
+        list(REGIONS.keys()),
+        format_func=lambda key: f"{REGIONS[key]['emoji']} {REGIONS[key]['name']}",
+        key="region_selector"
+    )
+    region = REGIONS[region_key]
+    
     # Periodo
     st.sidebar.subheader("📅 Periodo Temporale")
     days_options = {
         "🕐 Ultime 24 ore": 1,
         "📅 Ultimi 3 giorni": 3,
         "📊 Ultima settimana": 7,
-        "📈 Ultimo mese": 30
+        "📈 Ultimo mese": 30,
+        "📆 Intervallo personalizzato": None
     }
     
     selected_period = st.sidebar.selectbox(
@@ -930,18 +4112,22 @@ def main():
         key="period_selector"
     )
     days_back = days_options[selected_period]
+    custom_range = render_custom_range_selector() if days_back is None else None
+    if custom_range is not None:
+        period_desc = f"{custom_range[0]:%d/%m/%Y} – {(custom_range[1] - pd.Timedelta(days=1)):%d/%m/%Y}"
+    else:
+        period_desc = get_period_description(days_back)
     
-    # Controllo cambio periodo
+    # Controllo cambio periodo (le cache restano: gli altri periodi sono già caldi)
     if days_back != st.session_state.current_period:
         st.session_state.current_period = days_back
         st.session_state.last_period_change = time.time()
-        st.cache_data.clear()
-        logger.info(f"Period changed to {days_back} days")
+        logger.info(f"Period changed to {period_desc}")
     
     # Indicatore periodo
     st.sidebar.markdown(f"""
     <div class="period-indicator">
-        📊 Attivo: <strong>{get_period_description(days_back)}</strong>
+        📊 Attivo: <strong>{period_desc}</strong>
     </div>
     """, unsafe_allow_html=True)
     
@@ -949,28 +4135,74 @@ def main():
     st.sidebar.subheader("🔍 Filtri Avanzati")
     min_magnitude = st.sidebar.slider("🔢 Magnitudine minima:", 0.0, 5.0, 0.0, 0.1)
     max_depth = st.sidebar.slider("📏 Profondità max (km):", 0, 50, 50, 1)
-    max_distance = st.sidebar.slider("📍 Distanza max (km):", 1, 50, 15, 1)
+    max_distance = st.sidebar.slider("📍 Distanza max (km):", 1, 50, region['radius_km'], 1)
+    
+    # Declustering
+    st.sidebar.subheader("🧩 Declustering")
+    decluster_method = DECLUSTER_METHODS[st.sidebar.selectbox("Metodo:", list(DECLUSTER_METHODS.keys()), key="decluster_method")]
+    cluster_filter = None
+    color_by_cluster = False
+    if decluster_method is not None:
+        cluster_filter = CLUSTER_FILTERS[st.sidebar.selectbox("Mostra:", list(CLUSTER_FILTERS.keys()), key="cluster_filter")]
+        color_by_cluster = st.sidebar.checkbox("🎨 Colora per cluster", value=True, key="color_by_cluster")
     
     # Sismografo
     st.sidebar.subheader("🌊 Sismografo")
     seismo_enabled = st.sidebar.checkbox("🟢 Abilita Real-time", value=True)
     seismo_sensitivity = st.sidebar.slider("📈 Sensibilità:", 0.1, 5.0, 1.0, 0.1)
+    show_spectrogram = st.sidebar.checkbox("🎼 Spettrogramma", value=False, key="show_spectrogram")
+    with st.sidebar.expander("🎯 Trigger STA/LTA", expanded=False):
+        current = get_seismograph_stream().settings
+        if STA_LTA_ADMIN:
+            # I cursori partono dalle impostazioni correnti del flusso condiviso e le modificano solo al cambio
+            st.caption("Impostazioni condivise da tutti gli utenti collegati (amministratore)")
+            st.slider("Finestra STA (s):", 0.2, 5.0, current['sta'], 0.1, key="sta_window", on_change=apply_sta_lta_settings)
+            st.slider("Finestra LTA (s):", 5.0, 60.0, current['lta'], 1.0, key="lta_window", on_change=apply_sta_lta_settings)
+            st.slider("Soglia attivazione:", 1.5, 10.0, current['on'], 0.1, key="trigger_on", on_change=apply_sta_lta_settings)
+            st.slider("Soglia disattivazione:", 0.5, 5.0, current['off'], 0.1, key="trigger_off", on_change=apply_sta_lta_settings)
+        else:
+            # Un visitatore non può cambiare il trigger delle altre sessioni: impostazioni in sola lettura
+            st.caption(
+                f"STA {current['sta']:.1f} s • LTA {current['lta']:.0f} s • "
+                f"soglie {current['on']:.1f} / {current['off']:.1f}"
+            )
+            st.caption("🔒 Impostazioni condivise, configurate dal server")
     
     # Aggiornamenti
     st.sidebar.subheader("🔄 Aggiornamenti") 
     if st.sidebar.button("🚀 Forza Refresh", use_container_width=True):
-        st.cache_data.clear()
+        # Nuovo ciclo di ingestione invece di svuotare le cache: chi arriva dopo trova tutto pronto
+        with st.spinner("🔄 Aggiornamento cache in corso..."):
+            get_cache_warmer().refresh_now()
         st.session_state.last_period_change = time.time()
         st.rerun()
     
-    auto_refresh = st.sidebar.checkbox("⚡ Auto-refresh (30s)", value=False)
+    auto_refresh = st.sidebar.checkbox("⚡ Auto-refresh adattivo", value=False)
+    
+    # Replay storico
+    render_replay_controls()
+    replay = st.session_state.get('replay')
+    now = get_app_now()
+    
+    # Debug prestazioni
+    if st.sidebar.checkbox("🐞 Debug prestazioni", value=False, key="debug_panel"):
+        render_debug_panel()
+    
+    # Richieste di rete della pagina, in parallelo (con copie valide non si attende INGV)
+    io_jobs = {}
+    if replay is None and custom_range is None:
+        # Una sola richiesta per riquadro unito, condivisa da tutte le regioni
+        for i, box in enumerate(get_ingestion_boxes()):
+            io_jobs[f'catalog_{i}'] = (get_earthquake_data, days_back, box)
+    with st.spinner(f"🔄 Caricamento dati terremoti ({period_desc})..."):
+        io_results = fetch_page_io(io_jobs)
+    api_status = get_snapshot_store().api_status()
     
     # Status bar
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        api_status = test_api_connection()
-        status_text = "🟢 Online" if api_status else "🔴 Offline"
+        status_text = "⚪ Verifica..." if api_status is None else "🟢 Online" if api_status else "🔴 Offline"
         st.markdown(f'''
         <div class="status-indicator">
             🌐 INGV API: {status_text}
@@ -979,76 +4211,115 @@ def main():
     
     with col2:
         seismo_status = "🟢 Attivo" if st.session_state.seismo_running else "⚪ Inattivo"
+        stream = get_seismograph_stream()
+        triggers = stream.trigger_summary()
+        trigger_count = triggers['closed'] + triggers['triggered']
         st.markdown(f'''
         <div class="status-indicator">
-            📊 Sismografo: {seismo_status}
+            📊 Sismografo: {seismo_status} • 🎯 {trigger_count} trigger
         </div>
         ''', unsafe_allow_html=True)
     
     with col3:
         st.markdown(f'''
         <div class="status-indicator">
-            📅 {get_period_description(days_back)}
+            📅 {period_desc}
         </div>
         ''', unsafe_allow_html=True)
     
     with col4:
         st.markdown(f'''
         <div class="status-indicator">
-            🔄 {datetime.now().strftime('%H:%M:%S')}
+            {'⏪' if replay is not None else '🔄'} {format_local_time(now, '%H:%M:%S')}
         </div>
         ''', unsafe_allow_html=True)
     
     st.markdown("---")
     
     # Caricamento dati
-    with st.spinner(f"🔄 Caricamento dati terremoti ({get_period_description(days_back)})..."):
-        df = get_earthquake_data(days_back)
+    if custom_range is not None:
+        period_start, period_end = custom_range
+    else:
+        period_start, period_end = now - pd.Timedelta(days=days_back), now
+    data_age = None
+    if replay is not None:
+        df = catalog_window(advance_replay(replay, now), period_start, period_end)
+        st.info(f"⏪ **Replay {replay['factor']:.0f}×** • tempo simulato {format_local_time(now, '%d/%m/%Y %H:%M:%S')}")
+    elif custom_range is not None:
+        with st.spinner(f"📦 Caricamento dall'archivio locale ({period_desc})..."):
+            df = get_archive_range_data(period_start, period_end)
+    else:
+        entries = [result for name, result in io_results.items() if name.startswith('catalog_')]
+        # None: nessuna risposta entro il budget; catalog None: download fallito senza copie salvate
+        available = [entry for entry in entries if entry is not None and entry['catalog'] is not None]
+        failed = [entry for entry in entries if entry is not None and entry['catalog'] is None]
+        df = combine_catalogs(entry['catalog'] for entry in available)
+        if failed:
+            st.error(f"🔴 Problema di connessione con API INGV, nessun dato salvato disponibile: {failed[0]['error']}")
+        elif df is None and len(available) < len(entries):
+            st.warning("⏳ INGV non ha risposto in tempo: i dati verranno mostrati al prossimo aggiornamento.")
+        if df is None:
+            df = pd.DataFrame()
+        if entries and len(available) == len(entries):
+            fetched_at = min(entry['fetched_at'] for entry in entries)
+            data_age = (utc_now() - fetched_at).total_seconds()
+            if any(entry['error'] for entry in entries) or data_age > SNAPSHOT_STALE_WARNING_SECONDS:
+                st.warning(
+                    f"📦 INGV non raggiungibile: mostrati i dati salvati alle {format_local_time(fetched_at, '%H:%M')} "
+                    f"({data_age / 60:.0f} min fa). L'aggiornamento prosegue in background."
+                )
+        set_gauge_metric("catalog_memory_bytes", catalog_memory_bytes(df))
+    
+    # Riepilogo di tutte le regioni, poi distanze rispetto alla regione attiva
+    region_summary = summarize_regions(df, now)
+    for col, (key, info) in zip(st.columns(len(REGIONS)), region_summary.items()):
+        with col:
+            active = " • <strong>attiva</strong>" if key == region_key else ""
+            st.markdown(f'''
+            <div class="status-indicator">
+                {info['level']} {REGIONS[key]['emoji']} {REGIONS[key]['name']}: {info['count']} eventi/24h • Mmax {info['max_magnitude']:.1f}{active}
+            </div>
+            ''', unsafe_allow_html=True)
+    df = region_catalog(df, region)
+    
+    # Cadenze di refresh adattive
+    live = custom_range is None and (auto_refresh or seismo_enabled)
+    refresh_plan = plan_refresh(df, now, replay, live, seismo_enabled)
+    cadence = [f"sismografo {refresh_plan['seismo']:g}s"] if refresh_plan['seismo'] else []
+    cadence += [f"dati {refresh_plan['page']:g}s"] if refresh_plan['page'] else []
+    st.sidebar.caption(f"⏱️ {REFRESH_PROFILES[refresh_plan['level']]['label']} • {' • '.join(cadence) or 'refresh manuale'}")
     
     # Messaggio informativo
     if not df.empty:
-        period_start = (datetime.now() - timedelta(days=days_back))
-        st.success(f"📊 **Dati caricati:** {len(df)} terremoti dal {period_start.strftime('%d/%m/%Y %H:%M')} ad oggi ({get_period_description(days_back)})")
+        freshness = f" • aggiornati {data_age / 60:.0f} min fa" if data_age is not None else ""
+        st.success(f"📊 **Dati caricati:** {len(df)} terremoti dal {format_local_time(period_start, '%d/%m/%Y %H:%M')} {'al ' + format_local_time(period_end, '%d/%m/%Y %H:%M') if custom_range is not None else 'ad oggi'} ({period_desc}){freshness}")
     
     # Controllo dati vuoti
     if df.empty:
-        st.warning(f"⚠️ Nessun dato disponibile per il periodo selezionato ({get_period_description(days_back)}).")
-        if not api_status:
+        st.warning(f"⚠️ Nessun dato disponibile per il periodo selezionato ({period_desc}).")
+        if custom_range is not None:
+            st.info("📦 L'intervallo non è ancora nell'archivio locale: avvia il backfill dalla barra laterale.")
+        if api_status is False:
             st.error("🔴 Problema di connessione con API INGV. Riprovare più tardi.")
         
         # Sismografo anche senza dati
-        if seismo_enabled:
-            st.markdown('<div class="seismo-container">', unsafe_allow_html=True)
-            st.subheader("🌊 Sismografo Real-Time")
-            update_seismograph()
-            fig_seismo = create_themed_seismograph_plot(seismo_sensitivity)
-            st.plotly_chart(fig_seismo, use_container_width=True, key="seismo_empty")
-            st.markdown('</div>', unsafe_allow_html=True)
+        render_seismograph(refresh_plan, seismo_sensitivity, "🌊 Sismografo Real-Time", "seismo_empty", with_stats=False)
         
-        return
+        return refresh_plan['page']
     
-    # Calcola distanze
+    # Declustering sull'intero periodo, prima dei filtri
     try:
-        df['distance_km'] = df.apply(
-            lambda row: calculate_distance(
-                CAMPI_FLEGREI_LAT, CAMPI_FLEGREI_LON,
-                row['latitude'], row['longitude']
-            ), axis=1
-        )
+        df = get_declustered_catalog(df, decluster_method)
     except Exception as e:
-        logger.error(f"Error calculating distances: {e}")
-        df['distance_km'] = 0
+        logger.error(f"Error declustering catalog: {e}")
     
     # Applica filtri
     try:
-        filtered_df = df[
-            (df['magnitude'] >= min_magnitude) &
-            (df['depth'] <= max_depth) &
-            (df['distance_km'] <= max_distance)
-        ].copy()
+        with stage_timer("filter"):
+            filtered_df = apply_catalog_filters(df, min_magnitude, max_depth, max_distance, cluster_filter)
     except Exception as e:
         logger.error(f"Error applying filters: {e}")
-        filtered_df = df.copy()
+        filtered_df = df
     
     # Info filtri
     if len(filtered_df) != len(df):
@@ -1073,7 +4344,7 @@ def main():
         <div class="metric-card">
             <h3>{mag_emoji} Magnitudine Max</h3>
             <h1>{max_mag:.1f}</h1>
-            <small>{get_period_description(days_back)}</small>
+            <small>{period_desc}</small>
         </div>
         """, unsafe_allow_html=True)
     
@@ -1083,13 +4354,13 @@ def main():
         <div class="metric-card">
             <h3>📏 Profondità Media</h3>
             <h1>{avg_depth:.1f} km</h1>
-            <small>{get_period_description(days_back)}</small>
+            <small>{period_desc}</small>
         </div>
         """, unsafe_allow_html=True)
     
     with col4:
         if not filtered_df.empty:
-            recent_count = len(filtered_df[filtered_df['time'] >= datetime.now() - timedelta(hours=24)])
+            recent_count = len(catalog_window(filtered_df, now - pd.Timedelta(hours=24)))
         else:
             recent_count = 0
         recent_emoji = "🔴" if recent_count >= 10 else "🟡" if recent_count >= 5 else "🟢"
@@ -1102,186 +4373,108 @@ def main():
         """, unsafe_allow_html=True)
     
     # Sismografo
-    if seismo_enabled:
-        st.markdown('<div class="seismo-container">', unsafe_allow_html=True)
-        st.subheader("🌊 Sismografo Real-Time • AI Enhanced")
-        
-        update_seismograph()
-        fig_seismo = create_themed_seismograph_plot(seismo_sensitivity)
-        st.plotly_chart(fig_seismo, use_container_width=True, key="seismo_main")
-        
-        # Statistiche sismografo
-        if st.session_state.seismo_data:
-            col_s1, col_s2, col_s3 = st.columns(3)
-            
-            with col_s1:
-                current_amp = list(st.session_state.seismo_data)[-1] * seismo_sensitivity
-                st.metric("📊 Ampiezza Attuale", f"{current_amp:.4f}")
-            
-            with col_s2:
-                max_amp = max([abs(x) for x in st.session_state.seismo_data]) * seismo_sensitivity
-                st.metric("📈 Ampiezza Massima", f"{max_amp:.4f}")
-            
-            with col_s3:
-                rms_amp = np.sqrt(np.mean([x**2 for x in st.session_state.seismo_data])) * seismo_sensitivity
-                st.metric("📊 Valore RMS", f"{rms_amp:.4f}")
-        
-        st.markdown('</div>', unsafe_allow_html=True)
+    render_seismograph(refresh_plan, seismo_sensitivity, "🌊 Sismografo Real-Time • AI Enhanced", "seismo_main", show_spectrogram=show_spectrogram)
     
     # Controllo dati filtrati vuoti
     if filtered_df.empty:
         st.info("ℹ️ Nessun terremoto trovato con i filtri applicati.")
-        return
+        return refresh_plan['page']
+    
+    # Pannelli grafici: segnaposto nell'ordine della pagina, figure costruite in parallelo
+    rate_monitor = get_active_rate_monitor()
+    figure_jobs = {
+        'map': (get_catalog_figure, 'map', filtered_df, period_desc, dark_mode, color_by_cluster, region_key),
+        'histogram': (get_catalog_figure, 'histogram', filtered_df, period_desc, dark_mode),
+        'scatter': (get_catalog_figure, 'scatter', filtered_df, period_desc, dark_mode, color_by_cluster),
+        'timeline': (get_catalog_figure, 'timeline', filtered_df, period_desc, dark_mode, color_by_cluster, region_key,
+                     rate_monitor.markers(region_key)),
+        'release': (get_catalog_figure, 'release', filtered_df, period_desc, dark_mode)
+    }
+    placeholders = {}
     
     # Mappa
-    st.subheader(f"🗺️ Mappa Interattiva • {get_period_description(days_back)}")
-    try:
-        fig_map = create_themed_earthquake_map(filtered_df)
-        st.plotly_chart(fig_map, use_container_width=True)
-    except Exception as e:
-        st.error(f"❌ Errore visualizzazione mappa: {str(e)}")
+    st.subheader(f"🗺️ Mappa Interattiva • {period_desc}")
+    placeholders['map'] = (st.empty(), "❌ Errore visualizzazione mappa")
+    
+    # Vista 3D degli ipocentri (su richiesta: la scena WebGL è pesante)
+    show_hypocenters = st.toggle("🧊 Mostra ipocentri in 3D", value=False, key="show_hypocenters")
+    if show_hypocenters:
+        figure_jobs['hypocenters'] = (build_hypocenter_panel, filtered_df, region_key, dark_mode)
+        placeholders['hypocenters'] = (st.empty(), "❌ Errore vista 3D")
+        hypocenter_caption = st.empty()
     
     # Grafici analisi
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📊 Distribuzione Magnitudini")
-        fig_mag = create_themed_chart(filtered_df, "histogram", get_period_description(days_back))
-        st.plotly_chart(fig_mag, use_container_width=True)
+        placeholders['histogram'] = (st.empty(), "❌ Errore istogramma")
     
     with col2:
         st.subheader("📈 Profondità vs Magnitudine")
-        fig_scatter = create_themed_chart(filtered_df, "scatter", get_period_description(days_back))
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        placeholders['scatter'] = (st.empty(), "❌ Errore grafico profondità")
     
     # Timeline
-    st.subheader(f"⏰ Analisi Timeline • {get_period_description(days_back)}")
-    try:
-        if len(filtered_df) > 50:
-            df_timeline = filtered_df.copy()
-            df_timeline['time_rounded'] = df_timeline['time'].dt.round('H')
-            timeline_data = df_timeline.groupby('time_rounded').agg({
-                'magnitude': 'max',
-                'event_id': 'count'
-            }).reset_index()
-            timeline_data.columns = ['time', 'max_magnitude', 'event_count']
-            
-            fig_timeline = create_themed_chart(timeline_data, "timeline_bar", get_period_description(days_back))
-        else:
-            fig_timeline = create_themed_chart(filtered_df, "timeline_scatter", get_period_description(days_back))
-        
-        st.plotly_chart(fig_timeline, use_container_width=True)
+    st.subheader(f"⏰ Analisi Timeline • {period_desc}")
+    placeholders['timeline'] = (st.empty(), "Errore timeline")
     
+    # Rilascio di energia
+    placeholders['release'] = (st.empty(), "Errore curve di rilascio")
+    try:
+        total_moment = float(filtered_df['moment'].to_numpy(dtype=np.float64).sum())
+        last_day = release_between(filtered_df, now - pd.Timedelta(hours=24), now)
+        st.caption(
+            f"⚡ Momento cumulativo {total_moment:.2e} N·m, pari a un singolo evento Mw {moment_to_magnitude(total_moment):.1f} • "
+            f"ultime 24h: {last_day['moment']:.2e} N·m da {last_day['events']} eventi"
+        )
     except Exception as e:
-        st.error(f"Errore timeline: {str(e)}")
+        st.error(f"Errore curve di rilascio: {str(e)}")
+    
+    rendered = render_panel_figures(figure_jobs, placeholders)
+    if 'hypocenters' in rendered:
+        geometry = get_hypocenter_geometry(filtered_df, region_key)
+        if geometry['voxel_km'] is not None:
+            hypocenter_caption.caption(
+                f"🔍 {len(filtered_df)} eventi aggregati in {len(geometry['count'])} voxel da "
+                f"{geometry['voxel_km']:.2g} km: riduci periodo o profondità per più dettaglio."
+            )
     
     # Sistema di allerta
-    st.subheader("⚠️ Sistema di Allerta Smart")
+    st.subheader(f"⚠️ Sistema di Allerta Smart • {region['name']}")
     try:
-        recent_24h = len(filtered_df[filtered_df['time'] >= datetime.now() - timedelta(hours=24)])
-        max_magnitude = filtered_df['magnitude'].max()
-        shallow_count = len(filtered_df[filtered_df['depth'] < 5])
-        
-        # Logica di allerta migliorata
-        risk_score = (
-            (max_magnitude * 25) +
-            (recent_24h * 2) +
-            (shallow_count * 5)
-        )
+        # Aumento di tasso statisticamente significativo (CUSUM online sui tempi di interarrivo)
+        alert = assess_alert(filtered_df, now, region, rate_monitor.status(region_key)['active'])
+        st.markdown(alert_card_html(alert, period_desc), unsafe_allow_html=True)
         
-        if risk_score >= 120 or max_magnitude >= 4.0:
-            alert_class = "alert-high"
-            alert_text = "🔴 ALLERTA ALTA"
-            alert_emoji = "🚨"
-            recommendations = "⚠️ **Azione Immediata Richiesta:** Monitorare comunicazioni ufficiali Protezione Civile. Attività sismica elevata rilevata."
-        elif risk_score >= 60 or max_magnitude >= 3.0:
-            alert_class = "alert-medium"
-            alert_text = "🟡 ALLERTA MEDIA" 
-            alert_emoji = "⚠️"
-            recommendations = "⚠️ **Attenzione Richiesta:** Aumento dell'attività sismica. Rimanere informati sui sviluppi."
+        if alert['level'] == "high":
+            st.error(alert['recommendations'])
+        elif alert['level'] == "medium":
+            st.warning(alert['recommendations'])
         else:
-            alert_class = "alert-low"
-            alert_text = "🟢 CONDIZIONI NORMALI"
-            alert_emoji = "✅"
-            recommendations = "✅ **Tutto OK:** Attività sismica nei parametri normali per l'area dei Campi Flegrei."
-        
-        st.markdown(f"""
-        <div class="{alert_class}">
-            <h2>{alert_emoji} {alert_text}</h2>
-            <p><strong>Punteggio Rischio AI:</strong> {risk_score:.0f}/150</p>
-            <p><strong>Periodo Analisi:</strong> {get_period_description(days_back)}</p>
-            <p><strong>Eventi (24h):</strong> {recent_24h}</p>
-            <p><strong>Magnitudine Max:</strong> {max_magnitude:.1f}</p>
-            <p><strong>Eventi Superficiali (&lt;5km):</strong> {shallow_count}</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        if alert_class == "alert-high":
-            st.error(recommendations)
-        elif alert_class == "alert-medium":
-            st.warning(recommendations)
-        else:
-            st.success(recommendations)
+            st.success(alert['recommendations'])
     
     except Exception as e:
         st.error(f"Errore sistema allerta: {str(e)}")
     
+    # Previsione a breve termine dal modello ETAS stimato sull'archivio
+    render_etas_forecast(region_key, now)
+    
     # Tabella dettagliata
-    st.subheader(f"📋 Analisi Dettagliata • {get_period_description(days_back)}")
+    st.subheader(f"📋 Analisi Dettagliata • {period_desc}")
     try:
-        display_df = filtered_df.sort_values('time', ascending=False).copy()
-        display_df['time'] = display_df['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        display_df['magnitude'] = display_df['magnitude'].round(1)
-        display_df['depth'] = display_df['depth'].round(1)
-        display_df['distance_km'] = display_df['distance_km'].round(1)
-        
-        st.dataframe(
-            display_df[['time', 'magnitude', 'depth', 'distance_km', 'place']],
-            column_config={
-                "time": "🕐 Data/Ora",
-                "magnitude": "📊 Magnitudine",
-                "depth": "📏 Profondità (km)",
-                "distance_km": "📍 Distanza (km)",
-                "place": "🏠 Località"
-            },
-            use_container_width=True,
-            hide_index=True
-        )
+        render_catalog_table(filtered_df, replay, period_start, period_end, min_magnitude, max_depth, max_distance,
+                             (region['lat'], region['lon']), cluster_filter)
     except Exception as e:
         st.error(f"Errore tabella: {str(e)}")
     
     # Export
-    if st.button("💾 Esporta Dati", use_container_width=True):
-        try:
-            csv = display_df.to_csv(index=False)
-            filename = f"campi-flegrei-monitor_{get_period_description(days_back).lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-            st.download_button(
-                label="📥 Scarica File CSV",
-                data=csv,
-                file_name=filename,
-                mime="text/csv",
-                use_container_width=True
-            )
-        except Exception as e:
-            st.error(f"Errore export: {str(e)}")
+    render_export_panel(period_start, period_end, min_magnitude, max_depth, max_distance, (region['lat'], region['lon']))
     
     # Footer
     st.markdown("---")
-    st.markdown("""
-    <div class="footer-author">
-        <h3>👨‍💻 Luigi Oliviero</h3>
-        <p><strong>Campi Flegrei Monitor</strong> • Fixed Themes v3.1 (2025)</p>
-        <p>🌊 Monitoraggio sismico real-time con analisi AI-enhanced</p>
-        <p>📊 Dati forniti da INGV (Istituto Nazionale di Geofisica e Vulcanologia)</p>
-        <p>🔬 Visualizzazione avanzata e esperienza utente moderna</p>
-        <p>🎨 Temi Dark/Light completamente funzionanti • Design responsive</p>
-    </div>
-    """, unsafe_allow_html=True)
+    render_static_block('page_footer')
     
-    # Auto-refresh
-    if seismo_enabled or auto_refresh:
-        time.sleep(0.5 if seismo_enabled else 30)
-        st.rerun()
+    return refresh_plan['page']
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,583 @@
+"""
+Load Test Multi-Sessione - Campi Flegrei Monitor
+Avvia uno stub FDSN locale e un'istanza Streamlit della dashboard, simula
+N sessioni concorrenti via WebSocket e misura latenza dei rerun, CPU,
+memoria per sessione, frequenza delle richieste upstream e byte inviati al
+browser per tipo di rerun e di elemento.
+
+Uso:
+    python campi_flegrei_loadtest.py --sessions 1 5 10 25 50 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import requests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "campi_flegrei_fixed.py")
+FDSN_PATH = "/fdsnws/event/1/query"
+STAGE_METRIC = "campi_flegrei_stage_duration_seconds"
+STATIC_BLOCK_CLASSES = ('modern-header', 'author-badge', 'footer-author')
+
+def find_free_port():
+    """Restituisce una porta TCP libera su localhost"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def build_stub_catalog(n_events=2000, days=30, seed=42):
+    """Genera un catalogo sintetico deterministico attorno ai Campi Flegrei"""
+    rng = random.Random(seed)
+    end = datetime.now(timezone.utc)
+    features = []
+    for i in range(n_events):
+        event_time = end - timedelta(seconds=rng.uniform(0, days * 86400))
+        features.append({
+            'type': 'Feature',
+            'properties': {
+                'eventId': 40000000 + i,
+                'time': event_time.strftime('%Y-%m-%dT%H:%M:%S.%f'),
+                'mag': round(rng.expovariate(1 / 0.7), 1),
+                'magType': 'Md',
+                'place': 'Campi Flegrei (NA)'
+            },
+            'geometry': {
+                'type': 'Point',
+                'coordinates': [
+                    14.139 + rng.gauss(0, 0.02),
+                    40.827 + rng.gauss(0, 0.02),
+                    abs(rng.gauss(2.5, 1.2))
+                ]
+            }
+        })
+    features.sort(key=lambda f: f['properties']['time'])
+    return features
+
+def load_stub_catalog(path):
+    """Carica le feature di un file GeoJSON FDSN da servire con lo stub"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('features', [])
+
+class FdsnStubStats:
+    """Contatori thread-safe delle richieste ricevute dallo stub"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def record(self, size):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def snapshot(self):
+        with self.lock:
+            return self.requests, self.bytes_sent
+
+def start_fdsn_stub(port, features, latency=0.0):
+    """Avvia uno stub del web service FDSN event di INGV in un thread"""
+    stats = FdsnStubStats()
+
+    class FdsnStubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path != FDSN_PATH:
+                self.send_error(404)
+                return
+            params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+            selected = [f for f in features if self.matches(f, params)]
+            if 'limit' in params:
+                selected = selected[:int(params['limit'])]
+            body = json.dumps({'type': 'FeatureCollection', 'features': selected}).encode('utf-8')
+
+            if latency:
+                time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            stats.record(len(body))
+
+        @staticmethod
+        def matches(feature, params):
+            props = feature['properties']
+            lon, lat = feature['geometry']['coordinates'][:2]
+            event_time = props['time'][:19]
+            return (
+                params.get('starttime', '')[:19] <= event_time
+                and event_time <= params.get('endtime', '9999')[:19]
+                and float(params.get('minlatitude', -90)) <= lat <= float(params.get('maxlatitude', 90))
+                and float(params.get('minlongitude', -180)) <= lon <= float(params.get('maxlongitude', 180))
+                and props['mag'] >= float(params.get('minmagnitude', -10))
+            )
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), FdsnStubHandler)
+    threading.Thread(target=server.serve_forever, name="fdsn-stub", daemon=True).start()
+    logger.info(f"FDSN stub serving {len(features)} events on port {port}")
+    return server, stats
+
+def start_app(app_port, fdsn_url, metrics_port, data_dir):
+    """Avvia la dashboard con Streamlit puntata sullo stub FDSN, con archivio e snapshot in data_dir"""
+    env = dict(os.environ)
+    env.update({
+        'CF_FDSN_URL': fdsn_url,
+        'CF_METRICS_PORT': str(metrics_port),
+        'CF_ARCHIVE_DB': os.path.join(data_dir, "archive.db"),
+        'CF_SNAPSHOT_DIR': os.path.join(data_dir, "snapshots")
+    })
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'streamlit', 'run', APP_SCRIPT,
+            '--server.headless', 'true',
+            '--server.port', str(app_port),
+            '--server.enableStaticServing', 'true',
+            '--browser.gatherUsageStats', 'false'
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Streamlit terminato durante l'avvio")
+        try:
+            if requests.get(f"http://127.0.0.1:{app_port}/_stcore/health", timeout=1).ok:
+                logger.info(f"Dashboard ready on port {app_port} (pid {process.pid})")
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Timeout avvio Streamlit")
+
+def read_process_usage(pid):
+    """Restituisce (secondi CPU, RSS in byte) del processo server"""
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        cpu = proc.cpu_times()
+        return cpu.user + cpu.system, proc.memory_info().rss
+    except ImportError:
+        pass
+
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    with open(f"/proc/{pid}/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+    return cpu_seconds, rss_kb * 1024
+
+def scrape_stage_histogram(metrics_url, stage='rerun'):
+    """Legge i bucket cumulativi dell'istogramma di una fase dall'exporter"""
+    buckets = {}
+    try:
+        text = requests.get(metrics_url, timeout=5).text
+    except requests.RequestException as e:
+        logger.warning(f"Metrics scrape failed: {e}")
+        return buckets
+
+    prefix = f'{STAGE_METRIC}_bucket{{stage="{stage}",le="'
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            bound, value = line[len(prefix):].split('"} ')
+            buckets[float('inf') if bound == '+Inf' else float(bound)] = float(value)
+    return buckets
+
+def histogram_quantile(q, before, after):
+    """Stima un quantile dalla differenza di due letture dell'istogramma"""
+    bounds = sorted(after)
+    counts = [after[b] - before.get(b, 0.0) for b in bounds]
+    if not counts or counts[-1] <= 0:
+        return None
+
+    rank = q * counts[-1]
+    previous_bound, previous_count = 0.0, 0.0
+    for bound, count in zip(bounds, counts):
+        if count >= rank:
+            if bound == float('inf'):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+class SessionStats:
+    """Misure raccolte lato client per una sessione simulata"""
+
+    def __init__(self):
+        self.run_started = None
+        self.run_latencies = []
+        self.finished_at = []
+        self.bytes_received = 0
+        self.run_kind = None
+        self.run_bytes = 0
+        self.payload_runs = []
+        self.last_page_bytes = None
+        self.run_static_bytes = 0
+        self.last_page_static_bytes = None
+        self.element_bytes = {}
+        self.errors = 0
+
+    def reset(self):
+        self.run_latencies = []
+        self.finished_at = []
+        self.bytes_received = 0
+        self.payload_runs = []
+        self.element_bytes = {}
+
+def delta_label(delta):
+    """Etichetta un delta del ForwardMsg con il tipo di elemento trasportato"""
+    kind = delta.WhichOneof('type')
+    if kind != 'new_element':
+        return kind
+    element = delta.new_element.WhichOneof('type')
+    if element == 'markdown' and delta.new_element.markdown.body.lstrip().startswith('<style'):
+        return 'markdown (css)'
+    # Intestazione, badge autore e footer: iframe verso i file statici o markdown se il serving statico è spento
+    if element == 'iframe' and 'app/static/page_' in delta.new_element.iframe.src:
+        return 'iframe (blocchi fissi)'
+    if element == 'markdown' and any(cls in delta.new_element.markdown.body for cls in STATIC_BLOCK_CLASSES):
+        return 'markdown (blocchi fissi)'
+    return element
+
+async def simulate_session(app_port, stats, stop_event):
+    """Apre una sessione WebSocket come un browser e segue i rerun dello script
+
+    Come il frontend, riesegue i fragment con run_every alla cadenza annunciata
+    dal server (messaggi auto_rerun).
+    """
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    def rerun_message(fragment_id=''):
+        back_msg = BackMsg()
+        back_msg.rerun_script.query_string = ''
+        back_msg.rerun_script.page_script_hash = ''
+        if fragment_id:
+            back_msg.rerun_script.fragment_id = fragment_id
+            back_msg.rerun_script.is_auto_rerun = True
+        return back_msg.SerializeToString()
+
+    url = f"ws://127.0.0.1:{app_port}/_stcore/stream"
+    timers = {}
+    try:
+        async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as ws:
+            await ws.send(rerun_message())
+
+            while not stop_event.is_set():
+                now = time.perf_counter()
+                for fragment_id, (interval, due) in list(timers.items()):
+                    if now >= due:
+                        timers[fragment_id] = (interval, now + interval)
+                        await ws.send(rerun_message(fragment_id))
+                next_due = min((due for _, due in timers.values()), default=now + 1.0)
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=min(1.0, max(next_due - now, 0.01)))
+                except asyncio.TimeoutError:
+                    continue
+                stats.bytes_received += len(raw)
+                stats.run_bytes += len(raw)
+                msg = ForwardMsg()
+                msg.ParseFromString(raw)
+                kind = msg.WhichOneof('type')
+                now = time.perf_counter()
+                if kind == 'delta':
+                    label = delta_label(msg.delta)
+                    stats.element_bytes[label] = stats.element_bytes.get(label, 0) + len(raw)
+                    if label.endswith('(blocchi fissi)'):
+                        stats.run_static_bytes += len(raw)
+                if kind == 'new_session':
+                    stats.run_started = now
+                    stats.run_kind = 'fragment' if msg.new_session.fragment_ids_this_run else 'page'
+                    stats.run_bytes = len(raw)
+                    stats.run_static_bytes = 0
+                    if not msg.new_session.fragment_ids_this_run:
+                        timers.clear()
+                elif kind == 'auto_rerun':
+                    interval = msg.auto_rerun.interval
+                    timers[msg.auto_rerun.fragment_id] = (interval, now + interval)
+                elif kind == 'stop_auto_rerun':
+                    timers.clear()
+                elif kind == 'script_finished' and stats.run_started is not None:
+                    stats.run_latencies.append(now - stats.run_started)
+                    stats.finished_at.append(now)
+                    stats.payload_runs.append((stats.run_kind, stats.run_bytes))
+                    if stats.run_kind == 'page':
+                        stats.last_page_bytes = stats.run_bytes
+                        stats.last_page_static_bytes = stats.run_static_bytes
+                    stats.run_started = None
+    except Exception as e:
+        stats.errors += 1
+        logger.warning(f"Session error: {e}")
+
+def run_load_step(loop, sessions, target, app_port, stop_event):
+    """Porta il numero di sessioni attive al valore richiesto"""
+    while len(sessions) < target:
+        stats = SessionStats()
+        task = asyncio.run_coroutine_threadsafe(simulate_session(app_port, stats, stop_event), loop)
+        sessions.append((stats, task))
+
+def summarize_payload(sessions, elapsed):
+    """Riassume i byte inviati al client per tipo di rerun e per tipo di elemento"""
+    n_sessions = max(len(sessions), 1)
+    runs = {'page': [], 'fragment': []}
+    elements = {}
+    for stats, _ in sessions:
+        for kind, size in stats.payload_runs:
+            runs.setdefault(kind, []).append(size)
+        for label, size in stats.element_bytes.items():
+            elements[label] = elements.get(label, 0) + size
+
+    def mean_kb(sizes):
+        return sum(sizes) / len(sizes) / 1e3 if sizes else None
+
+    page_runs = len(runs['page'])
+    # Senza rerun completi nella finestra vale l'ultimo visto (di solito il primo caricamento)
+    if not runs['page']:
+        runs['page'] = [stats.last_page_bytes for stats, _ in sessions if stats.last_page_bytes is not None]
+
+    total_bytes = sum(stats.bytes_received for stats, _ in sessions)
+    static_bytes = sum(size for label, size in elements.items() if label.endswith('(blocchi fissi)'))
+    page_static = [stats.last_page_static_bytes for stats, _ in sessions if stats.last_page_static_bytes is not None]
+    return {
+        'static_blocks_share': static_bytes / total_bytes if total_bytes else None,
+        'page_static_kb_per_run': mean_kb(page_static),
+        'page_runs': page_runs,
+        'page_kb_per_run': mean_kb(runs['page']),
+        'fragment_runs': len(runs['fragment']),
+        'fragment_kb_per_run': mean_kb(runs['fragment']),
+        'kb_per_minute_per_session': sum(stats.bytes_received for stats, _ in sessions) / 1e3 / elapsed * 60 / n_sessions,
+        'elements_kb_per_minute': {
+            label: size / 1e3 / elapsed * 60 / n_sessions
+            for label, size in sorted(elements.items(), key=lambda item: -item[1])
+        }
+    }
+
+def measure_step(n_sessions, sessions, pid, stub_stats, metrics_url, duration, baseline_rss):
+    """Misura una finestra di carico con n sessioni attive"""
+    for stats, _ in sessions:
+        stats.reset()
+    cpu_before, _ = read_process_usage(pid)
+    stub_before, bytes_before = stub_stats.snapshot()
+    hist_before = scrape_stage_histogram(metrics_url)
+    started = time.perf_counter()
+
+    time.sleep(duration)
+
+    elapsed = time.perf_counter() - started
+    cpu_after, rss = read_process_usage(pid)
+    stub_after, bytes_after = stub_stats.snapshot()
+    hist_after = scrape_stage_histogram(metrics_url)
+
+    latencies = np.array([lat for stats, _ in sessions for lat in stats.run_latencies])
+    runs = sum(len(stats.finished_at) for stats, _ in sessions)
+    client_bytes = sum(stats.bytes_received for stats, _ in sessions)
+
+    return {
+        'sessions': n_sessions,
+        'runs_per_second': runs / elapsed,
+        'runs_per_session_per_second': runs / elapsed / n_sessions,
+        'client_run_p50_s': float(np.percentile(latencies, 50)) if latencies.size else None,
+        'client_run_p99_s': float(np.percentile(latencies, 99)) if latencies.size else None,
+        'server_rerun_p50_s': histogram_quantile(0.5, hist_before, hist_after),
+        'server_rerun_p99_s': histogram_quantile(0.99, hist_before, hist_after),
+        'cpu_percent': 100 * (cpu_after - cpu_before) / elapsed,
+        'rss_mb': rss / 1e6,
+        'rss_per_session_mb': max(rss - baseline_rss, 0) / 1e6 / n_sessions,
+        'upstream_requests_per_second': (stub_after - stub_before) / elapsed,
+        'upstream_kb_per_second': (bytes_after - bytes_before) / 1e3 / elapsed,
+        'client_kb_per_session_per_second': client_bytes / 1e3 / elapsed / n_sessions,
+        'session_errors': sum(stats.errors for stats, _ in sessions),
+        'payload': summarize_payload(sessions, elapsed)
+    }
+
+def find_breaking_point(results, latency_budget, cpu_limit):
+    """Individua il primo passo in cui la dashboard smette di scalare"""
+    if not results:
+        return None
+    baseline_rate = results[0]['runs_per_session_per_second']
+    for row in results:
+        reasons = []
+        p99 = row['server_rerun_p99_s']
+        if p99 is not None and p99 > latency_budget:
+            reasons.append(f"p99 rerun {p99:.2f}s > budget {latency_budget:.2f}s")
+        if row['cpu_percent'] > cpu_limit:
+            reasons.append(f"CPU {row['cpu_percent']:.0f}% > {cpu_limit:.0f}%")
+        if baseline_rate and row['runs_per_session_per_second'] < 0.5 * baseline_rate:
+            reasons.append("cadenza rerun per sessione dimezzata rispetto a 1 sessione")
+        if row['session_errors']:
+            reasons.append(f"{row['session_errors']} sessioni in errore")
+        if reasons:
+            return row['sessions'], reasons
+    return None
+
+def format_report(results, breaking_point, settings):
+    """Produce il report Markdown dei risultati"""
+    def fmt(value, pattern="{:.3f}"):
+        return "-" if value is None else pattern.format(value)
+
+    lines = [
+        "# Load Test • Campi Flegrei Monitor",
+        "",
+        f"Eseguito il {datetime.now().strftime('%Y-%m-%d %H:%M')} • "
+        f"durata per passo {settings['duration']}s • warm-up {settings['warmup']}s • "
+        f"eventi stub {settings['events']} • latenza stub {settings['stub_latency']}s",
+        "",
+        "| Sessioni | Rerun/s | Rerun/s per sessione | p50 rerun server (s) | p99 rerun server (s) "
+        "| p99 ciclo client (s) | CPU (%) | RSS (MB) | MB per sessione aggiuntiva | Richieste upstream/s | kB/s per sessione |",
+        "|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|"
+    ]
+    for row in results:
+        lines.append(
+            f"| {row['sessions']} | {row['runs_per_second']:.2f} | {row['runs_per_session_per_second']:.2f} "
+            f"| {fmt(row['server_rerun_p50_s'])} | {fmt(row['server_rerun_p99_s'])} "
+            f"| {fmt(row['client_run_p99_s'])} | {row['cpu_percent']:.0f} | {row['rss_mb']:.0f} "
+            f"| {row['marginal_mb_per_session']:.1f} | {row['upstream_requests_per_second']:.2f} "
+            f"| {row['client_kb_per_session_per_second']:.1f} |"
+        )
+
+    payload = results[0]['payload'] if results else None
+    if payload:
+        static_share = None if payload['static_blocks_share'] is None else payload['static_blocks_share'] * 100
+        page_static_share = (
+            payload['page_static_kb_per_run'] / payload['page_kb_per_run'] * 100
+            if payload['page_static_kb_per_run'] is not None and payload['page_kb_per_run'] else None
+        )
+        lines += [
+            "",
+            f"## Payload verso il browser ({results[0]['sessions']} sessioni)",
+            "",
+            f"{fmt(payload['kb_per_minute_per_session'], '{:.0f}')} kB/min per sessione • "
+            f"rerun completi {payload['page_runs']} da {fmt(payload['page_kb_per_run'], '{:.1f}')} kB • "
+            f"rerun fragment {payload['fragment_runs']} da {fmt(payload['fragment_kb_per_run'], '{:.1f}')} kB",
+            "",
+            f"Intestazione, badge autore e footer: {fmt(payload['page_static_kb_per_run'], '{:.2f}')} kB per rerun completo "
+            f"({fmt(page_static_share, '{:.2f}')}%) • {fmt(static_share, '{:.2f}')}% del payload",
+            "",
+            "| Elemento | kB/min per sessione |",
+            "|---|---:|"
+        ]
+        for label, kb in payload['elements_kb_per_minute'].items():
+            lines.append(f"| {label} | {kb:.1f} |")
+
+    lines.append("")
+    if breaking_point is None:
+        lines.append("✅ Nessun punto di rottura entro il carico testato.")
+    else:
+        sessions, reasons = breaking_point
+        lines.append(f"⚠️ **La scalabilità si interrompe a {sessions} sessioni:** " + "; ".join(reasons))
+    return "\n".join(lines) + "\n"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test multi-sessione della dashboard Campi Flegrei")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 5, 10, 25, 50],
+                        help="numero di sessioni concorrenti per ogni passo")
+    parser.add_argument('--duration', type=float, default=30.0, help="secondi di misura per passo")
+    parser.add_argument('--warmup', type=float, default=10.0, help="secondi di assestamento per passo")
+    parser.add_argument('--events', type=int, default=2000, help="eventi sintetici serviti dallo stub")
+    parser.add_argument('--catalog', help="file GeoJSON FDSN da servire al posto del catalogo sintetico")
+    parser.add_argument('--stub-latency', type=float, default=0.0, help="latenza simulata dello stub (s)")
+    parser.add_argument('--latency-budget', type=float, default=0.5,
+                        help="p99 massimo accettabile del rerun lato server (s)")
+    parser.add_argument('--cpu-limit', type=float, default=90.0,
+                        help="CPU massima accettabile del processo server (%%)")
+    parser.add_argument('--report', help="percorso del report Markdown")
+    parser.add_argument('--json', help="percorso dei risultati in JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        sys.exit("Il load test richiede il pacchetto 'websockets' (pip install websockets)")
+
+    features = load_stub_catalog(args.catalog) if args.catalog else build_stub_catalog(args.events)
+    stub_port, app_port, metrics_port = find_free_port(), find_free_port(), find_free_port()
+    stub_server, stub_stats = start_fdsn_stub(stub_port, features, args.stub_latency)
+    data_dir = tempfile.mkdtemp(prefix="cf_loadtest_")
+    process = start_app(app_port, f"http://127.0.0.1:{stub_port}{FDSN_PATH}", metrics_port, data_dir)
+    metrics_url = f"http://127.0.0.1:{metrics_port}/metrics"
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="loadtest-sessions", daemon=True).start()
+    stop_event = threading.Event()
+    sessions = []
+    results = []
+
+    try:
+        time.sleep(2)
+        _, baseline_rss = read_process_usage(process.pid)
+        for target in sorted(set(args.sessions)):
+            run_load_step(loop, sessions, target, app_port, stop_event)
+            logger.info(f"Step {target} sessions: warming up {args.warmup}s")
+            time.sleep(args.warmup)
+            row = measure_step(target, sessions, process.pid, stub_stats, metrics_url, args.duration, baseline_rss)
+            if results and target > results[0]['sessions']:
+                first = results[0]
+                row['marginal_mb_per_session'] = (row['rss_mb'] - first['rss_mb']) / (target - first['sessions'])
+            else:
+                row['marginal_mb_per_session'] = row['rss_per_session_mb']
+            results.append(row)
+            logger.info(
+                f"{target} sessions: {row['runs_per_second']:.1f} runs/s, "
+                f"server p99 {row['server_rerun_p99_s']}, CPU {row['cpu_percent']:.0f}%"
+            )
+            if process.poll() is not None:
+                logger.error("Streamlit process exited during the test")
+                break
+    finally:
+        stop_event.set()
+        time.sleep(1.5)
+        loop.call_soon_threadsafe(loop.stop)
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stub_server.shutdown()
+
+    breaking_point = find_breaking_point(results, args.latency_budget, args.cpu_limit)
+    report = format_report(results, breaking_point, {
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'events': len(features),
+        'stub_latency': args.stub_latency
+    })
+    print(report)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'breaking_point': breaking_point}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
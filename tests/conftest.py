@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Archivio e snapshot dei test fuori dalla cartella del progetto
+_TEST_DIR = tempfile.mkdtemp(prefix='cf_tests_')
+os.environ.setdefault('CF_ARCHIVE_DB', os.path.join(_TEST_DIR, 'archive.db'))
+os.environ.setdefault('CF_SNAPSHOT_DIR', os.path.join(_TEST_DIR, 'snapshots'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import campi_flegrei_fixed as monitor  # noqa: E402
+
+def make_catalog(times, magnitudes=None):
+    """Catalogo normalizzato con eventi agli istanti dati, vicino al centro dei Campi Flegrei"""
+    times = pd.to_datetime(pd.Series(times), utc=True)
+    n = len(times)
+    magnitudes = np.full(n, 1.5) if magnitudes is None else np.asarray(magnitudes, dtype=float)
+    return monitor.normalize_catalog(pd.DataFrame({
+        'time': times,
+        'magnitude': magnitudes,
+        'depth': np.full(n, 2.0),
+        'latitude': np.full(n, monitor.CAMPI_FLEGREI_LAT),
+        'longitude': np.full(n, monitor.CAMPI_FLEGREI_LON),
+        'place': ['Campi Flegrei'] * n,
+        'event_id': [f'ev{i}' for i in range(n)]
+    }))
+
+@pytest.fixture
+def fixed_clock():
+    """Orologio dell'app fermo al 2024-05-20 12:00 UTC per la durata del test"""
+    clock = monitor.FixedClock('2024-05-20 12:00')
+    previous = monitor.set_clock(clock)
+    yield clock
+    monitor.set_clock(previous)
+
+@pytest.fixture
+def archive(tmp_path):
+    return monitor.CatalogArchive(str(tmp_path / 'archive.db'))
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import campi_flegrei_fixed as monitor
+from conftest import make_catalog
+
+NOW = pd.Timestamp('2024-05-20 12:00', tz='UTC')
+
+def test_fixed_clock_drives_app_time(fixed_clock):
+    assert monitor.utc_now() == NOW
+    assert monitor.utc_now_ns() == NOW.value
+    fixed_clock.advance(90.5)
+    assert monitor.utc_now() == NOW + pd.Timedelta(seconds=90.5)
+    # Gli istanti senza fuso sono già in UTC
+    assert monitor.to_utc_ns('2024-05-20 12:00') == NOW.value
+    assert monitor.to_utc_ns(pd.Timestamp('2024-05-20 14:00', tz='Europe/Rome')) == NOW.value
+
+def test_set_clock_returns_previous():
+    clock = monitor.FixedClock(NOW)
+    previous = monitor.set_clock(clock)
+    try:
+        assert monitor.get_clock() is clock
+    finally:
+        assert monitor.set_clock(previous) is clock
+    assert monitor.get_clock() is previous
+
+def test_replay_advances_with_the_clock(fixed_clock):
+    start = NOW - pd.Timedelta(days=2)
+    end = start + pd.Timedelta(hours=3)
+    catalog = make_catalog(start + pd.to_timedelta(np.arange(0, 6 * 3600, 600), unit='s'))
+    monitor.start_replay(catalog, start, end, factor=60)
+    replay = st.session_state.replay
+    try:
+        assert monitor.get_replay_now(replay) == start
+        assert monitor.get_app_now() == start
+
+        # Un minuto reale a 60x è un'ora virtuale
+        fixed_clock.advance(60)
+        now = monitor.get_replay_now(replay)
+        assert now == start + pd.Timedelta(hours=1)
+        events = monitor.advance_replay(replay, now)
+        assert len(events) == 7
+        assert events['time'].max() <= now
+
+        # Oltre la fine il replay si ferma all'ultimo evento dell'intervallo
+        fixed_clock.advance(3600)
+        now = monitor.get_replay_now(replay)
+        assert now == end
+        events = monitor.advance_replay(replay, now)
+        assert len(events) == 19
+        assert events['time'].is_monotonic_increasing
+    finally:
+        monitor.stop_replay()
+    assert monitor.get_app_now() == monitor.utc_now()
+
+def test_rate_change_episode_relative_to_clock(fixed_clock):
+    # 20 giorni a 10 eventi/giorno, poi 2 giorni a 40 eventi/giorno fino all'istante dell'app
+    rng = np.random.default_rng(5)
+    change = NOW - pd.Timedelta(days=2)
+    before = np.cumsum(rng.exponential(1 / 10, 400))
+    after = np.cumsum(rng.exponential(1 / 40, 200))
+    offsets = np.concatenate([before[before < 20] - 20, after[after < 2]])
+    catalog = make_catalog(change + pd.to_timedelta(offsets, unit='D'))
+
+    rate_changes = monitor.RateChangeMonitor()
+    rate_changes.observe(catalog)
+    active = rate_changes.status('campi_flegrei')['active']
+    assert active is not None
+    onset = pd.Timestamp(active['onset'], tz='UTC')
+    detected = pd.Timestamp(active['detected'], tz='UTC')
+    assert abs(onset - change) < pd.Timedelta(hours=12)
+    assert change < detected <= monitor.utc_now()
+
+    alert = monitor.assess_alert(catalog, monitor.utc_now(), monitor.REGIONS['campi_flegrei'], active)
+    assert alert['level'] in ('medium', 'high')
+
+def test_report_period_bounds(fixed_clock, tmp_path):
+    report_end = monitor.utc_now().normalize()
+    catalog = make_catalog([report_end - pd.Timedelta(days=d) for d in (10, 6.5, 2.5, 1, 0.5, 0)])
+    monitor._report_state['catalog'] = monitor.compact_catalog(catalog)
+    try:
+        daily = monitor.render_report(report_end.value, 1, 'campi_flegrei', str(tmp_path), ('html',))
+        weekly = monitor.render_report(report_end.value, 7, 'campi_flegrei', str(tmp_path), ('html',))
+    finally:
+        monitor._report_state.clear()
+
+    # Il report del giorno D copre [D, D + 1], estremi inclusi
+    assert daily['name'] == 'campi_flegrei_2024-05-19_1d'
+    assert daily['events'] == 3
+    assert weekly['name'] == 'campi_flegrei_2024-05-19_7d'
+    assert weekly['events'] == 5
+    with open(daily['files'][0], encoding='utf-8') as f:
+        html = f.read()
+    assert monitor.format_local_time(monitor.utc_now(), '%d/%m/%Y %H:%M') in html
+    assert "fino al 19/05/2024" in html
@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+import pytest
+
+import campi_flegrei_fixed as monitor
+
+def simulate_etas(duration, mu, k, alpha, c, p, seed, min_magnitude=1.0, b=1.0, kernel_days=10.0):
+    """Catalogo ETAS sintetico (tempi in giorni, magnitudo Gutenberg–Richter) per generazioni"""
+    rng = np.random.default_rng(seed)
+    beta = b * math.log(10)
+    omori = (c ** (1 - p) - (c + kernel_days) ** (1 - p)) / (p - 1)
+    times = [rng.uniform(0, duration, rng.poisson(mu * duration))]
+    magnitudes = [min_magnitude + rng.exponential(1 / beta, len(times[0]))]
+    while len(times[-1]):
+        offspring = rng.poisson(k * np.exp(alpha * (magnitudes[-1] - min_magnitude)) * omori)
+        u = rng.uniform(size=offspring.sum())
+        head, tail = c ** (1 - p), (c + kernel_days) ** (1 - p)
+        children = np.repeat(times[-1], offspring) + (head - u * (head - tail)) ** (1 / (1 - p)) - c
+        children = children[children < duration]
+        times.append(children)
+        magnitudes.append(min_magnitude + rng.exponential(1 / beta, len(children)))
+    times, magnitudes = np.concatenate(times), np.concatenate(magnitudes)
+    order = np.argsort(times)
+    return times[order], magnitudes[order]
+
+def objective_data(times, magnitudes, duration, max_pairs):
+    pairs = monitor.etas_pairs(times, monitor.ETAS_KERNEL_DAYS, max_pairs)
+    far = pairs['far']
+    return {
+        'n': len(times),
+        'excess': magnitudes - 1.0,
+        'parent_excess': magnitudes[pairs['parents']] - 1.0,
+        'children': pairs['children'] if far is None else np.concatenate([pairs['children'], far['children']]),
+        'delays': pairs['delays'],
+        'far': far,
+        'spans': np.minimum(duration - times, monitor.ETAS_KERNEL_DAYS),
+        'duration': duration
+    }
+
+@pytest.fixture(scope='module')
+def catalog():
+    return simulate_etas(120.0, mu=20.0, k=0.03, alpha=1.2, c=0.01, p=1.15, seed=7)
+
+X = np.array([math.log(20.0), math.log(0.03), 1.2, math.log(0.01), math.log(0.15)])
+
+def test_far_field_matches_exact_likelihood(catalog):
+    times, magnitudes = catalog
+    exact = objective_data(times, magnitudes, 120.0, 10 ** 9)
+    approximate = objective_data(times, magnitudes, 120.0, len(exact['children']) // 20)
+    assert exact['far'] is None and approximate['far'] is not None
+    value, _ = monitor.etas_objective(X, exact)
+    approximate_value, _ = monitor.etas_objective(X, approximate)
+    assert abs(approximate_value - value) < 1e-5 * abs(value)
+
+def test_far_field_gradient_is_analytic(catalog):
+    times, magnitudes = catalog
+    data = objective_data(times, magnitudes, 120.0, 50_000)
+    _, gradient = monitor.etas_objective(X, data)
+    numeric = [
+        (monitor.etas_objective(X + step, data)[0] - monitor.etas_objective(X - step, data)[0]) / 2e-6
+        for step in np.eye(5) * 1e-6
+    ]
+    np.testing.assert_allclose(gradient, numeric, rtol=1e-4, atol=1e-3)
+
+def test_pair_budget_keeps_the_full_kernel(catalog, monkeypatch):
+    times, magnitudes = catalog
+    budget_pairs = monitor.etas_pairs
+    monkeypatch.setattr(monitor, 'etas_pairs', lambda times, kernel_days: budget_pairs(times, kernel_days, 10 ** 9))
+    exact = monitor.fit_etas(times, magnitudes, 120.0)
+    budget = exact['pairs'] // 20
+    monkeypatch.setattr(monitor, 'etas_pairs', lambda times, kernel_days: budget_pairs(times, kernel_days, budget))
+    approximate = monitor.fit_etas(times, magnitudes, 120.0)
+
+    assert exact['far_field_days'] is None
+    # Il budget aggrega il campo lontano invece di accorciare il nucleo
+    assert approximate['kernel_days'] == monitor.ETAS_KERNEL_DAYS
+    assert approximate['far_field_days'] < 0.1 * monitor.ETAS_KERNEL_DAYS
+    assert approximate['mu'] == pytest.approx(exact['mu'], rel=0.01)
+    assert approximate['p'] == pytest.approx(exact['p'], abs=0.01)
+    assert approximate['alpha'] == pytest.approx(exact['alpha'], abs=0.01)
+    assert approximate['branching_ratio'] == pytest.approx(exact['branching_ratio'], abs=0.01)
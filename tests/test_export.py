@@ -0,0 +1,40 @@
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import campi_flegrei_fixed as monitor
+from conftest import make_catalog
+
+START = pd.Timestamp('2024-05-01', tz='UTC')
+
+@pytest.fixture
+def filled_archive(archive, monkeypatch):
+    archive.upsert(make_catalog(START + pd.to_timedelta(np.arange(30) * 3600, unit='s')))
+    monkeypatch.setattr(monitor, 'get_catalog_archive', lambda: archive)
+    return archive
+
+def test_export_is_written_to_a_served_folder(filled_archive, tmp_path):
+    export_file = monitor.create_export_file('csv.gz', 'out.csv.gz', START, START + pd.Timedelta(days=1),
+                                             directory=str(tmp_path / 'exports'))
+    assert export_file['rows'] == 25
+    assert export_file['url'] == 'app/static/exports/' + os.path.relpath(export_file['path'], tmp_path / 'exports')
+    with gzip.open(export_file['path'], 'rt') as f:
+        assert len(f.read().splitlines()) == 26
+
+def test_failed_export_leaves_nothing_behind(filled_archive, tmp_path):
+    with pytest.raises(ValueError):
+        monitor.create_export_file('xls', 'out.xls', START, START + pd.Timedelta(days=1), directory=str(tmp_path / 'exports'))
+    assert os.listdir(tmp_path / 'exports') == []
+
+def test_expired_exports_are_removed(filled_archive, tmp_path, fixed_clock):
+    old = monitor.create_export_file('xml', 'old.xml', START, START + pd.Timedelta(days=1), directory=str(tmp_path / 'exports'))
+    fixed_clock.advance(monitor.EXPORT_MAX_AGE_SECONDS - 60)
+    recent = monitor.create_export_file('xml', 'new.xml', START, START + pd.Timedelta(days=1), directory=str(tmp_path / 'exports'))
+    fixed_clock.advance(120)
+
+    assert monitor.cleanup_exports(directory=str(tmp_path / 'exports')) == 1
+    assert not os.path.exists(old['path'])
+    assert os.path.exists(recent['path'])
@@ -0,0 +1,27 @@
+import threading
+import time
+
+import campi_flegrei_fixed as monitor
+
+def test_slow_job_does_not_delay_the_page():
+    finished = threading.Event()
+
+    def slow():
+        time.sleep(2.0)
+        finished.set()
+        return 'slow'
+
+    def broken():
+        raise RuntimeError("INGV down")
+
+    started = time.perf_counter()
+    results = monitor.fetch_page_io({'fast': (lambda x: x * 2, 21), 'slow': (slow,), 'broken': (broken,)}, timeout=0.3)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.0
+    assert results == {'fast': 42, 'slow': None, 'broken': None}
+    # Il job abbandonato prosegue nel pool condiviso
+    assert finished.wait(5)
+
+def test_no_jobs_returns_immediately():
+    assert monitor.fetch_page_io({}) == {}
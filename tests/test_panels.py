@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import campi_flegrei_fixed as monitor
+
+class FakePlaceholder:
+    def __init__(self):
+        self.shown = None
+
+    def plotly_chart(self, fig, **kwargs):
+        self.shown = ('chart', fig)
+
+    def info(self, text):
+        self.shown = ('info', text)
+
+    def error(self, text):
+        self.shown = ('error', text)
+
+def sleeper(seconds, value):
+    time.sleep(seconds)
+    return value
+
+def test_each_panel_gets_its_own_budget(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(monitor, 'get_figure_pool', lambda: pool)
+    placeholders = {name: (FakePlaceholder(), "Errore") for name in ('first', 'slow', 'queued')}
+    jobs = {
+        'first': (sleeper, 0.6, 'a'),
+        'slow': (sleeper, 3.0, 'c'),
+        # Parte quando 'first' libera il worker: con un budget comune scadrebbe prima di finire
+        'queued': (sleeper, 0.6, 'b')
+    }
+    started = time.perf_counter()
+    rendered = monitor.render_panel_figures(jobs, placeholders, budget=1.0)
+    elapsed = time.perf_counter() - started
+    pool.shutdown(wait=False)
+
+    assert rendered == {'first', 'queued'}
+    assert placeholders['first'][0].shown == ('chart', 'a')
+    assert placeholders['queued'][0].shown == ('chart', 'b')
+    assert placeholders['slow'][0].shown[0] == 'info'
+    assert 1.1 < elapsed < 1.6
+
+def test_failed_panel_shows_its_error(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(monitor, 'get_figure_pool', lambda: pool)
+    placeholders = {'ok': (FakePlaceholder(), "Errore ok"), 'broken': (FakePlaceholder(), "Errore grafico")}
+
+    def broken():
+        raise RuntimeError("dati mancanti")
+
+    rendered = monitor.render_panel_figures({'ok': (sleeper, 0.0, 'a'), 'broken': (broken,)}, placeholders, budget=1.0)
+    pool.shutdown(wait=False)
+
+    assert rendered == {'ok'}
+    assert placeholders['broken'][0].shown == ('error', "Errore grafico: dati mancanti")
@@ -0,0 +1,37 @@
+import pandas as pd
+
+import campi_flegrei_fixed as monitor
+
+def feature(time, mag=1.2, lon=14.14, lat=40.83, depth=2.5, event_id=None):
+    props = {'time': time, 'mag': mag, 'place': 'Campi Flegrei'}
+    if event_id is not None:
+        props['eventId'] = event_id
+    return {'properties': props, 'geometry': {'coordinates': [lon, lat, depth]}}
+
+def test_times_parsed_once_to_utc_nanoseconds():
+    df = monitor.parse_earthquake_features([
+        feature('2024-05-20T03:12:34.123456Z', event_id=1),
+        feature('2024-05-20T05:12:34+02:00', event_id=2),
+        feature('2024-05-20T03:12:35.5', event_id=3),
+        feature('non una data', event_id=4),
+        feature('2024-05-20T03:12:36', lat=95.0, event_id=5),
+    ])
+
+    assert str(df['time'].dtype) == 'datetime64[ns, UTC]'
+    assert df['event_id'].tolist() == ['1', '2', '3']
+    assert df['time'].tolist() == [
+        pd.Timestamp('2024-05-20 03:12:34.123456', tz='UTC'),
+        pd.Timestamp('2024-05-20 03:12:34', tz='UTC'),
+        pd.Timestamp('2024-05-20 03:12:35.5', tz='UTC'),
+    ]
+
+def test_missing_event_id_is_stable():
+    first = monitor.parse_earthquake_features([feature('2024-05-20T03:12:34.1Z')])
+    second = monitor.parse_earthquake_features([feature('2024-05-20T03:12:34.9Z')])
+    assert first['event_id'].iloc[0].startswith('h')
+    assert first['event_id'].iloc[0] == second['event_id'].iloc[0]
+
+def test_no_features_gives_normalizable_frame():
+    df = monitor.parse_earthquake_features([])
+    assert df.empty
+    assert monitor.normalize_catalog(df).empty
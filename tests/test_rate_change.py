@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+import campi_flegrei_fixed as monitor
+from conftest import make_catalog
+
+DAY_NS = 86400 * 10**9
+
+def poisson_times(segments, seed):
+    """Tempi (ns) di un processo di Poisson a tratti: segments = [(giorni, eventi al giorno), ...]"""
+    rng = np.random.default_rng(seed)
+    times, start = [], 0.0
+    for days, rate in segments:
+        arrivals = start + np.cumsum(rng.exponential(1 / rate, int(days * rate * 2) + 50))
+        times.append(arrivals[arrivals < start + days])
+        start += days
+    return (np.concatenate(times) * DAY_NS).astype(np.int64)
+
+def run_detector(times):
+    detector = monitor.RateChangeDetector()
+    for time_ns in times:
+        detector.update(int(time_ns))
+    return detector
+
+def test_step_change_onset_close_to_true_change():
+    change = 60 * DAY_NS
+    onset_errors, delays = [], []
+    for seed in range(10):
+        detector = run_detector(poisson_times([(60, 10), (10, 40)], seed))
+        assert any(e['end'] is None or e['end'] >= change for e in detector.episodes)
+        episode = next((e for e in detector.episodes if e['detected'] >= change), None)
+        if episode is None:
+            # Un falso allarme ancora aperto copre già il cambio
+            continue
+        onset_errors.append((episode['onset'] - change) / 3600e9)
+        delays.append((episode['detected'] - change) / 3600e9)
+        assert 7 < episode['baseline_rate'] < 14
+        assert episode['rate'] > 25
+    assert len(onset_errors) >= 8
+    assert np.median(np.abs(onset_errors)) < 3
+    assert max(np.abs(onset_errors)) < 24
+    assert max(delays) < 24
+
+def test_steady_rate_has_few_false_alarms():
+    alarms = [len(run_detector(poisson_times([(300, 10)], 100 + seed)).episodes) for seed in range(10)]
+    assert sum(alarms) <= 5
+
+def test_baseline_frozen_while_statistic_positive():
+    detector = run_detector(poisson_times([(30, 10)], 3))
+    interval_ns = DAY_NS // 1000
+    time_ns = int(detector.last_time)
+    while detector.statistic == 0:
+        time_ns += interval_ns
+        detector.update(time_ns)
+    baseline = detector.baseline_rate()
+    while detector.statistic > 0 and detector.episode is None:
+        time_ns += interval_ns
+        detector.update(time_ns)
+    assert detector.baseline_rate() == baseline
+
+def step_catalog(seed):
+    """Catalogo con 20 giorni a 10 eventi/giorno e poi 3 giorni a 40 eventi/giorno"""
+    times = pd.to_datetime(poisson_times([(20, 10), (3, 40)], seed), utc=True)
+    return make_catalog(pd.Timestamp('2024-05-01', tz='UTC') + (times - pd.Timestamp(0, tz='UTC')))
+
+def test_late_events_within_reorder_window_are_merged():
+    catalog = step_catalog(4)
+    in_order = monitor.RateChangeMonitor()
+    in_order.observe(catalog)
+
+    # Batch da 20 eventi, ognuno rimescolato e con gli ultimi 3 eventi consegnati nel batch successivo
+    rng = np.random.default_rng(0)
+    shuffled = monitor.RateChangeMonitor()
+    detections, carry = [], catalog.iloc[:0]
+    for start in range(0, len(catalog), 20):
+        batch = pd.concat([carry, catalog.iloc[start:start + 20]])
+        carry, batch = batch.iloc[-3:], batch.iloc[:-3]
+        detections += shuffled.observe(batch.iloc[rng.permutation(len(batch))])
+    detections += shuffled.observe(carry)
+
+    expected = in_order.status('campi_flegrei')['episodes']
+    assert expected
+    assert shuffled.status('campi_flegrei')['episodes'] == expected
+    # Gli episodi segnalati sono copie al momento del rilevamento
+    reported = [(e['onset'], e['detected']) for key, e in detections if key == 'campi_flegrei']
+    assert reported == [(e['onset'], e['detected']) for e in expected]
+
+def test_event_older_than_window_rebuilds_and_reports_new_episode(archive):
+    catalog = step_catalog(4)
+    change = pd.Timestamp('2024-05-21', tz='UTC')
+    before = catalog[catalog['time'] < change]
+    # La parte finale del fondo arriva subito, l'aumento di tasso arriva in ritardo di un giorno
+    burst = catalog[(catalog['time'] >= change) & (catalog['time'] < change + pd.Timedelta(days=1))]
+    after = catalog[catalog['time'] >= change + pd.Timedelta(days=1)].iloc[:5]
+
+    rate_changes = monitor.RateChangeMonitor(archive)
+    for part in (before, after):
+        archive.upsert(part)
+        assert rate_changes.observe(part) == []
+
+    archive.upsert(burst)
+    detections = rate_changes.observe(burst)
+    assert [key for key, _ in detections] == ['campi_flegrei']
+    onset = pd.Timestamp(detections[0][1]['onset'], tz='UTC')
+    assert abs(onset - change) < pd.Timedelta(hours=12)
+    # Una seconda consegna dello stesso ritardo non riporta di nuovo l'episodio
+    assert rate_changes.observe(burst.iloc[:1]) == []
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+import campi_flegrei_fixed as monitor
+from conftest import make_catalog
+
+START = pd.Timestamp('2024-05-18', tz='UTC')
+
+def test_filtered_window_matches_direct_sum():
+    rng = np.random.default_rng(3)
+    times = START + pd.to_timedelta(np.sort(rng.uniform(0, 3 * 86400, 300)), unit='s')
+    catalog = monitor.compact_catalog(make_catalog(times, rng.uniform(0.0, 3.5, 300)))
+    filtered = monitor.apply_catalog_filters(catalog, 1.5, 50, 100)
+    assert 0 < len(filtered) < len(catalog)
+
+    now = START + pd.Timedelta(days=3)
+    for start in (now - pd.Timedelta(hours=24), START - pd.Timedelta(days=1)):
+        expected = filtered[(filtered['time'] >= start) & (filtered['time'] <= now)]
+        release = monitor.release_between(filtered, start, now)
+        assert release['events'] == len(expected)
+        assert np.isclose(release['moment'], expected['moment'].astype(np.float64).sum())
+        assert np.isclose(release['benioff'], np.sqrt(expected['energy'].astype(np.float64)).sum())
+
+def test_empty_window_releases_nothing():
+    catalog = monitor.compact_catalog(make_catalog([START]))
+    release = monitor.release_between(catalog, START + pd.Timedelta(hours=1), START + pd.Timedelta(hours=2))
+    assert release == {'events': 0, 'moment': 0.0, 'benioff': 0.0}
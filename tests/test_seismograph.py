@@ -0,0 +1,30 @@
+import streamlit as st
+
+import campi_flegrei_fixed as monitor
+
+def test_trigger_summary_matches_snapshot(fixed_clock):
+    stream = monitor.SeismographStream()
+    stream.configure({'sta': 0.5, 'lta': 5.0, 'on': 1.5, 'off': 1.2})
+    stream.advance(fixed_clock.now_ns() / 1e9 + 600)
+
+    summary = stream.trigger_summary()
+    snapshot = stream.snapshot()
+    assert summary['closed'] == snapshot['closed_triggers']
+    assert summary['triggered'] == snapshot['triggered']
+
+def test_sliders_cannot_change_shared_trigger_without_admin(monkeypatch):
+    stream = monitor.get_seismograph_stream()
+    before = dict(stream.settings)
+    for key, value in {'sta_window': 0.5, 'lta_window': 30.0, 'trigger_on': 6.0, 'trigger_off': 2.0}.items():
+        st.session_state[key] = value
+
+    monkeypatch.setattr(monitor, 'STA_LTA_ADMIN', False)
+    monitor.apply_sta_lta_settings()
+    assert stream.settings == before
+
+    monkeypatch.setattr(monitor, 'STA_LTA_ADMIN', True)
+    try:
+        monitor.apply_sta_lta_settings()
+        assert stream.settings == {'sta': 0.5, 'lta': 30.0, 'on': 6.0, 'off': 2.0}
+    finally:
+        stream.configure(before)
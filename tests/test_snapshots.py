@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+import campi_flegrei_fixed as monitor
+from conftest import make_catalog
+
+BOX = (40.5, 41.1, 13.8, 14.5)
+
+@pytest.fixture
+def store(tmp_path):
+    return monitor.CatalogSnapshotStore(str(tmp_path / 'snapshots'))
+
+@pytest.fixture
+def ingv(monkeypatch):
+    """INGV finto: restituisce il catalogo in 'catalog' o solleva 'error'"""
+    state = {'catalog': make_catalog(['2024-05-20 10:00', '2024-05-20 11:00']), 'error': None, 'calls': 0}
+
+    def fetch(days_back, box):
+        state['calls'] += 1
+        if state['error'] is not None:
+            raise state['error']
+        return state['catalog']
+
+    monkeypatch.setattr(monitor, 'fetch_earthquake_data', fetch)
+    return state
+
+def test_snapshot_keeps_fetch_time_across_restarts(store, ingv, fixed_clock):
+    store.get(1, BOX)
+    fixed_clock.advance(3600)
+
+    # Un nuovo processo legge la copia su disco con l'istante del download, non l'mtime del file
+    restarted = monitor.CatalogSnapshotStore(store.directory)
+    entry = restarted.load(1, BOX)
+    assert entry['fetched_at'] == pd.Timestamp('2024-05-20 12:00', tz='UTC')
+    assert len(entry['catalog']) == 2
+
+def test_stale_snapshot_is_served_and_revalidated(store, ingv, fixed_clock):
+    first = store.get(1, BOX)
+    fixed_clock.advance(monitor.SNAPSHOT_MAX_AGE_SECONDS - 1)
+    assert store.get(1, BOX) is first
+    assert ingv['calls'] == 1
+
+    fixed_clock.advance(2)
+    assert store.get(1, BOX) is first
+    store.pending[(1, BOX)].result(timeout=5)
+    assert ingv['calls'] == 2
+    assert store.load(1, BOX)['fetched_at'] == monitor.utc_now()
+
+def test_failed_refresh_marks_the_served_copy(store, ingv, fixed_clock):
+    store.get(1, BOX)
+    ingv['error'] = RuntimeError("503")
+    fixed_clock.advance(monitor.SNAPSHOT_MAX_AGE_SECONDS + 1)
+    store.get(1, BOX)
+    with pytest.raises(RuntimeError):
+        store.pending[(1, BOX)].result(timeout=5)
+    entry = store.get(1, BOX)
+    assert entry['error'] == "503"
+    assert entry['fetched_at'] == pd.Timestamp('2024-05-20 12:00', tz='UTC')
+
+def test_cold_start_failure_is_reported_not_raised(store, ingv):
+    ingv['error'] = RuntimeError("connection refused")
+    entry = store.get(1, BOX)
+    assert entry['catalog'] is None
+    assert entry['error'] == "connection refused"
+
+def test_snapshot_without_fetch_time_is_ignored(store):
+    make_catalog(['2024-05-20 10:00']).to_parquet(store.path(1, BOX), index=False)
+    assert store.load(1, BOX) is None
@@ -0,0 +1,14 @@
+import campi_flegrei_fixed as monitor
+
+def test_fallback_markup_comes_from_the_static_files():
+    header = monitor.load_static_block('page_header')
+    footer = monitor.load_static_block('page_footer')
+    assert 'modern-header' in header and 'author-badge' in header
+    assert 'footer-author' in footer
+    # Nel markdown di ripiego non finiscono script né fogli di stile dell'iframe
+    for markup in (header, footer):
+        assert '<script' not in markup and '<link' not in markup
+
+def test_every_static_block_has_a_height():
+    for name in monitor.STATIC_BLOCK_HEIGHTS:
+        assert monitor.load_static_block(name).strip()
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+import campi_flegrei_fixed as monitor
+from conftest import make_catalog
+
+START = pd.Timestamp('2024-05-01', tz='UTC')
+END = START + pd.Timedelta(days=10)
+CENTER = (monitor.CAMPI_FLEGREI_LAT, monitor.CAMPI_FLEGREI_LON)
+
+def sequence_catalog():
+    """Fondo di eventi isolati più una sequenza M3.5 con repliche ravvicinate"""
+    background = START + pd.to_timedelta(np.arange(1, 10) * 86400, unit='s')
+    mainshock = START + pd.Timedelta(days=4, hours=6)
+    aftershocks = mainshock + pd.to_timedelta(np.arange(1, 21) * 600, unit='s')
+    times = np.concatenate([background.values, [mainshock.to_datetime64()], aftershocks.values])
+    magnitudes = np.concatenate([np.full(9, 1.0), [3.5], np.full(20, 1.2)])
+    order = np.argsort(times)
+    return make_catalog(times[order], magnitudes[order])
+
+def test_cluster_filter_pages_the_filtered_catalog(archive):
+    catalog = sequence_catalog()
+    archive.upsert(catalog)
+    declustered = monitor.decluster_catalog(monitor.compact_catalog(catalog), 'gardner_knopoff')
+    filtered = monitor.apply_catalog_filters(declustered, 0.0, 50, 50, 'independent')
+    assert len(filtered) < len(catalog)
+
+    args = (START, END, 0.0, 50, 50, CENTER)
+    # Senza filtri per cluster la tabella interroga l'archivio
+    _, total = monitor.query_table_page(filtered, None, None, *args, archive=archive)
+    assert total == len(catalog)
+    # Con il filtro la tabella elenca gli stessi eventi di schede e grafici
+    page_df, total = monitor.query_table_page(filtered, None, 'independent', *args, page_size=100, archive=archive)
+    assert total == len(filtered)
+    assert sorted(page_df['event_id']) == sorted(filtered['event_id'])
+    assert page_df['time'].is_monotonic_decreasing
+
+def test_filters_without_effect_return_the_catalog_itself():
+    catalog = monitor.compact_catalog(sequence_catalog())
+    assert monitor.apply_catalog_filters(catalog, 0.0, 50, 50) is catalog
+
+    filtered = monitor.apply_catalog_filters(catalog, 1.1, 50, 50)
+    expected = catalog[catalog['magnitude'] >= 1.1]
+    assert filtered['event_id'].tolist() == expected['event_id'].tolist()
+    assert filtered['time'].is_monotonic_increasing